@@ -1,15 +1,29 @@
+import argparse
+import array
 import asyncio
+import codecs
+import collections
+import contextlib
+import copy
 import csv
+import glob
+import hashlib
+import heapq
+import io
+import itertools
+import json
 import os
-import zlib
+import random
+import sqlite3
+import sys
 import threading
+import zlib
 import tempfile
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
-import edge_tts
-import genanki
 import shutil
 import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURAÇÃO GLOBAL DE VOZES ---
 VOICES = {
@@ -22,60 +36,2456 @@ VOICES = {
     "Alemão - Conrad (M)": "de-DE-ConradNeural"
 }
 
+# --- CONFIGURAÇÃO DO CACHE DE ÁUDIO ---
+CACHE_DIR = os.environ.get(
+    "ANKI_STUDIO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "anki_studio", "tts")
+)
+CACHE_MAX_BYTES = int(os.environ.get("ANKI_STUDIO_CACHE_MAX_MB", "2048")) * 1_000_000
+# PERF-014: Áudio retido em memória até entrar no pacote; acima do teto vai para o disco (0 = sempre disco)
+AUDIO_MEMORY_BYTES = int(os.environ.get("ANKI_STUDIO_AUDIO_MEMORY_MB", "256")) * 1_000_000
+# PERF-023: Vazão dos últimos builds (caracteres/s por motor), base do ETA da pré-verificação
+THROUGHPUT_HISTORY = os.environ.get(
+    "ANKI_STUDIO_HISTORY_FILE",
+    os.path.join(CACHE_DIR, "throughput.jsonl")
+)
+THROUGHPUT_HISTORY_SIZE = 20
+THROUGHPUT_MIN_CHARS = 500  # builds quase todo em cache não entram no histórico
+
+# --- CACHE ---
+
+class AudioCache:
+    """Cache persistente de áudios TTS, endereçado por conteúdo (texto, voz, velocidade).
+
+    Os arquivos ficam em CACHE_DIR/<2 primeiros hex>/<sha256>.<ext>, com a extensão
+    do formato que o motor produziu (mp3, wav...). O mtime de cada arquivo marca o
+    último uso e a remoção (LRU) acontece quando o tamanho total passa de max_bytes.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index = None  # {chave: [tamanho, último_uso, extensão]}
+        self._total_bytes = 0
+
+    @staticmethod
+    def make_key(text, voice, rate):
+        payload = "\x1f".join((voice, rate, text)).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def path_for(self, key, extension=None):
+        """Caminho do áudio; sem extension, a do item já em cache (ou mp3)"""
+        if extension is None:
+            entry = (self._index or {}).get(key)
+            extension = entry[2] if entry else "mp3"
+        return os.path.join(self.directory, key[:2], f"{key}.{extension}")
+
+    def _load_index(self):
+        """Varre o diretório uma única vez por processo"""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.directory):
+            return
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                key, _, extension = entry.name.partition('.')
+                if not extension or extension.endswith('.tmp'):
+                    continue
+                st = entry.stat()
+                self._index[key] = [st.st_size, st.st_mtime, extension]
+                self._total_bytes += st.st_size
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def __contains__(self, key):
+        self._load_index()
+        return key in self._index
+
+    def read(self, key):
+        """Conteúdo do áudio em cache, ou None se não houver"""
+        self._load_index()
+        if key not in self._index:
+            self.misses += 1
+            return None
+        src = self.path_for(key)
+        try:
+            with open(src, 'rb') as f:
+                data = f.read()
+            now = time.time()
+            os.utime(src, (now, now))
+            self._index[key][1] = now
+        except (IOError, OSError):
+            # Arquivo removido por fora: tratar como falta
+            self._forget(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def store(self, key, data, extension="mp3"):
+        """Adiciona um áudio recém-gerado ao cache (escrita atômica)"""
+        self._load_index()
+        dest = self.path_for(key, extension)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, dest)
+        size = len(data)
+        old = self._index.get(key)
+        if old is not None:
+            self._total_bytes -= old[0]
+            if old[2] != extension:
+                # Mesma chave em outro formato: o arquivo antigo sairia do índice mas não do disco
+                with contextlib.suppress(OSError):
+                    os.remove(self.path_for(key, old[2]))
+        self._index[key] = [size, time.time(), extension]
+        self._total_bytes += size
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _forget(self, key):
+        entry = self._index.pop(key, None)
+        if entry:
+            self._total_bytes -= entry[0]
+
+    def _evict(self):
+        """Remove os itens menos usados até voltar ao limite"""
+        for key, _ in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+            self._forget(key)
+
+# --- MOTORES TTS ---
+
+class TTSEngine:
+    """Contrato dos motores de síntese.
+
+    stream(text, voice, rate) entrega o áudio em pedaços à medida que chega e
+    synthesize(text, voice, rate) devolve o áudio completo em bytes. Motores
+    novos só precisam implementar stream().
+    """
+    name = "base"
+    extension = "mp3"
+    # Prefixo da voz na chave do cache, para não misturar áudios de motores diferentes
+    cache_namespace = ""
+    # PERF-023: Para a estimativa da pré-verificação (MP3 de 48 kbps do Edge)
+    bytes_per_second = 6000
+
+    def estimate_bytes(self, chars, seconds):
+        return int(seconds * self.bytes_per_second)
+
+    async def stream(self, text, voice, rate):
+        raise NotImplementedError
+        yield b""
+
+    async def synthesize(self, text, voice, rate):
+        chunks = []
+        async for chunk in self.stream(text, voice, rate):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+class EdgeTTSEngine(TTSEngine):
+    """Microsoft Edge TTS (requer internet)"""
+    name = "edge"
+
+    async def stream(self, text, voice, rate):
+        # Import tardio: o edge-tts (aiohttp) pesa ~0,3 s na inicialização do CLI
+        import edge_tts
+        communicate = edge_tts.Communicate(text=text, voice=voice, rate=rate)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+
+class FakeTTSError(RuntimeError):
+    """Falha injetada pelo FakeTTSEngine"""
+
+
+class FakeTTSEngine(TTSEngine):
+    """Motor local e determinístico para benchmarks e testes de carga, sem rede.
+
+    latency: mediana em segundos; tail_alpha: cauda Pareto (None = latência fixa);
+    error_rate: fração de tentativas que falham; output_size: bytes por áudio
+    (None = proporcional ao texto, ~400 B/caractere como o perfil de 48 kbps);
+    capacity: requisições simultâneas aceitas antes de recusar (throttling);
+    outage: (início, duração) em segundos desde a primeira chamada, janela em
+    que toda requisição falha como um serviço fora do ar; per_char: segundos
+    extras por caractere (áudio longo demora mais).
+    A latência e as falhas dependem só de (seed, texto, voz, velocidade, tentativa),
+    portanto a mesma execução se repete independentemente do escalonamento.
+    """
+    name = "fake"
+    cache_namespace = "fake:"
+
+    def __init__(self, latency=0.05, tail_alpha=None, max_latency=10.0, error_rate=0.0,
+                 output_size=None, capacity=None, throttle_delay=0.5, outage=None, per_char=0.0, seed=0):
+        self.latency = latency
+        self.tail_alpha = tail_alpha
+        self.max_latency = max_latency
+        self.error_rate = error_rate
+        self.output_size = output_size
+        self.capacity = capacity
+        self.throttle_delay = throttle_delay
+        self.outage = outage
+        self.per_char = per_char
+        self.seed = seed
+        self._first_call = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+        self._attempts = collections.Counter()
+
+    def _rng(self, text, voice, rate):
+        attempt_key = (text, voice, rate)
+        self._attempts[attempt_key] += 1
+        return random.Random(f"{self.seed}|{voice}|{rate}|{text}|{self._attempts[attempt_key]}")
+
+    def estimate_bytes(self, chars, seconds):
+        return self.output_size if self.output_size is not None else max(chars, 1) * 400
+
+    def _audio_bytes(self, text, voice, rate):
+        size = self.output_size if self.output_size is not None else max(len(text), 1) * 400
+        digest = hashlib.sha256(f"{voice}|{rate}|{text}".encode('utf-8')).digest()
+        # Cabeçalho de quadro MP3 (MPEG-2 Layer III) seguido de conteúdo derivado do texto
+        body = (digest * (size // len(digest) + 1))[:max(size - 2, 0)]
+        return b"\xff\xf3" + body
+
+    async def stream(self, text, voice, rate):
+        rng = self._rng(text, voice, rate)
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.capacity is not None and self.in_flight > self.capacity:
+                await asyncio.sleep(self.throttle_delay)
+                raise FakeTTSError("429 Too Many Requests (simulado)")
+            now = time.monotonic()
+            if self._first_call is None:
+                self._first_call = now
+            if self.outage and 0 <= now - self._first_call - self.outage[0] < self.outage[1]:
+                await asyncio.sleep(self.latency)
+                raise FakeTTSError("503 Service Unavailable (simulado)")
+            if self.tail_alpha:
+                # Pareto com mediana ajustada: x_m * 2 ** (1 / alpha) = mediana
+                scale = self.latency / 2 ** (1 / self.tail_alpha)
+                delay = min(scale * rng.paretovariate(self.tail_alpha), self.max_latency)
+            else:
+                delay = self.latency
+            await asyncio.sleep(delay + self.per_char * len(text))
+            if rng.random() < self.error_rate:
+                raise FakeTTSError("falha simulada")
+            audio = self._audio_bytes(text, voice, rate)
+        finally:
+            self.in_flight -= 1
+        for start in range(0, len(audio), 4096):
+            yield audio[start:start + 4096]
+
+
+class EspeakEngine(TTSEngine):
+    """Motor offline via espeak-ng/espeak, se instalado. Gera WAV."""
+    name = "espeak"
+    extension = "wav"
+    cache_namespace = "espeak:"
+    # WAV PCM 16 bits, mono, 22,05 kHz
+    bytes_per_second = 44100
+
+    def __init__(self, binary=None):
+        self.binary = binary or shutil.which("espeak-ng") or shutil.which("espeak")
+        if not self.binary:
+            raise RuntimeError("espeak-ng/espeak não encontrado no PATH")
+
+    @staticmethod
+    def _espeak_args(voice, rate):
+        # en-US-ChristopherNeural -> en-us; +20% -> 175 * 1.2 palavras/min
+        language = "-".join(voice.split("-")[:2]).lower()
+        try:
+            speed = int(175 * (1 + int(rate.rstrip('%')) / 100))
+        except ValueError:
+            speed = 175
+        return ["-v", language, "-s", str(speed)]
+
+    async def stream(self, text, voice, rate):
+        process = await asyncio.create_subprocess_exec(
+            self.binary, *self._espeak_args(voice, rate), "--stdout", text,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        while True:
+            chunk = await process.stdout.read(65536)
+            if not chunk:
+                break
+            yield chunk
+        stderr = await process.stderr.read()
+        if await process.wait() != 0:
+            raise RuntimeError(f"espeak falhou: {stderr.decode(errors='replace').strip()}")
+
+
+TTS_ENGINES = {
+    "edge": EdgeTTSEngine,
+    "fake": FakeTTSEngine,
+    "espeak": EspeakEngine,
+}
+
+
+def create_engine(name="edge", **options):
+    """Instancia um motor pelo nome registrado em TTS_ENGINES"""
+    try:
+        engine_cls = TTS_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Motor TTS desconhecido: {name}") from None
+    return engine_cls(**options)
+
+# --- PÓS-PROCESSAMENTO ---
+
+# Perfis de saída: codec do ffmpeg, formato do contêiner e extensão da mídia
+AUDIO_CODECS = {
+    "mp3": ("libmp3lame", "mp3", "mp3"),
+    "opus": ("libopus", "ogg", "ogg"),
+}
+
+
+class AudioPostProcessor:
+    """PERF-015: Recodifica e normaliza o volume de cada áudio com o ffmpeg.
+
+    Cada clipe passa por um processo ffmpeg próprio (entrada e saída por pipe),
+    então a codificação usa outros núcleos e corre em paralelo com a síntese sem
+    bloquear o loop. workers limita quantos ffmpeg rodam ao mesmo tempo.
+    loudness: alvo em LUFS para o filtro loudnorm (None = sem normalização).
+    """
+
+    def __init__(self, codec="opus", bitrate="32k", sample_rate=24000, loudness=-16.0,
+                 workers=None, binary=None):
+        if codec not in AUDIO_CODECS:
+            raise ValueError(f"Codec desconhecido: {codec} (use {', '.join(AUDIO_CODECS)})")
+        self.binary = binary or shutil.which("ffmpeg")
+        if not self.binary:
+            raise RuntimeError("ffmpeg não encontrado no PATH")
+        self.codec = codec
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.loudness = loudness
+        self.extension = AUDIO_CODECS[codec][2]
+        self.workers = workers or os.cpu_count() or 2
+        self._semaphore = None
+        self._loop = None
+
+    @property
+    def signature(self):
+        """Identifica o perfil; entra no nome da mídia para o build incremental"""
+        return f"{self.codec}/{self.bitrate}/{self.sample_rate}/{self.loudness}"
+
+    @property
+    def bytes_per_second(self):
+        """PERF-023: Tamanho esperado da saída ('32k' -> 4000 B/s)"""
+        bitrate = self.bitrate.lower()
+        scale = 1000 if bitrate.endswith('k') else 1
+        return int(float(bitrate.rstrip('k')) * scale / 8)
+
+    def _ffmpeg_args(self):
+        encoder, container, _ = AUDIO_CODECS[self.codec]
+        args = ["-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-map_metadata", "-1"]
+        if self.loudness is not None:
+            args += ["-af", f"loudnorm=I={self.loudness}:TP=-1.5:LRA=11"]
+        # loudnorm trabalha em 192 kHz; sem -ar a saída ficaria nessa taxa
+        if self.sample_rate:
+            args += ["-ar", str(self.sample_rate)]
+        args += ["-c:a", encoder, "-b:a", self.bitrate, "-f", container, "pipe:1"]
+        return args
+
+    async def process(self, audio):
+        """Devolve o áudio recodificado; RuntimeError se o ffmpeg falhar"""
+        # Um semáforo por loop: a GUI roda cada build num loop novo
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(
+                self.binary, *self._ffmpeg_args(),
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            )
+            output, stderr = await process.communicate(audio)
+        if process.returncode != 0 or not output:
+            raise RuntimeError(f"ffmpeg falhou: {stderr.decode(errors='replace').strip()[-200:]}")
+        return output
+
+# --- INSPEÇÃO DE CSV ---
+
+# PERF-021: Amostra do Sniffer; 1 KB costuma pegar só o cabeçalho e errar o delimitador
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = ",;\t|"
+# Excel em português exporta em cp1252; latin-1 decodifica qualquer byte
+CSV_ENCODINGS = ('utf-8-sig', 'cp1252', 'latin-1')
+
+
+# PERF-022: Leitor das linhas: auto (pyarrow se instalado), pyarrow ou stdlib
+CSV_READER = os.environ.get("ANKI_STUDIO_CSV_READER", "auto").lower()
+# Extensão -> formato; o resto é tratado como CSV
+TABLE_FORMATS = {'.tsv': 'tsv', '.tab': 'tsv', '.xlsx': 'xlsx', '.xlsm': 'xlsx'}
+# Arquivos aceitos pela GUI e pelos diretórios do modo batch: CSV e tudo o que TABLE_FORMATS lê
+TABLE_PATTERNS = ('*.csv', *(f"*{extension}" for extension in TABLE_FORMATS))
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _load_pyarrow():
+    if CSV_READER == 'stdlib':
+        return None
+    try:
+        import pyarrow
+        import pyarrow.csv
+    except ImportError:
+        if CSV_READER == 'pyarrow':
+            raise RuntimeError("ANKI_STUDIO_CSV_READER=pyarrow, mas o pacote 'pyarrow' não está instalado") from None
+        return None
+    return pyarrow
+
+
+def _xlsx_column(ref):
+    """'C12' -> 2"""
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _xlsx_records(path):
+    """PERF-022: Linhas da primeira planilha de um .xlsx como listas de texto, só com a stdlib.
+
+    A planilha é lida em streaming (iterparse, cada <row> descartado depois de
+    usado); só a tabela de strings compartilhadas fica inteira em memória.
+    Números e datas saem como o valor bruto gravado pelo Excel.
+    """
+    from xml.etree import ElementTree
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        shared = []
+        if 'xl/sharedStrings.xml' in names:
+            with archive.open('xl/sharedStrings.xml') as f:
+                for _, elem in ElementTree.iterparse(f):
+                    if elem.tag == f"{_XLSX_NS}si":
+                        shared.append("".join(node.text or "" for node in elem.iter(f"{_XLSX_NS}t")))
+                        elem.clear()
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        first = workbook.find(f"{_XLSX_NS}sheets/{_XLSX_NS}sheet")
+        if first is None:
+            return
+        sheet_path = 'xl/worksheets/sheet1.xml'
+        if 'xl/_rels/workbook.xml.rels' in names:
+            rel_id = first.get(f"{_XLSX_REL_NS}id")
+            for rel in ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels')):
+                if rel.get('Id') == rel_id:
+                    target = rel.get('Target')
+                    sheet_path = target.lstrip('/') if target.startswith('/') else f"xl/{target}"
+        with archive.open(sheet_path) as f:
+            for _, elem in ElementTree.iterparse(f):
+                if elem.tag != f"{_XLSX_NS}row":
+                    continue
+                record = []
+                for cell in elem.iter(f"{_XLSX_NS}c"):
+                    kind = cell.get('t')
+                    if kind == 'inlineStr':
+                        value = "".join(node.text or "" for node in cell.iter(f"{_XLSX_NS}t"))
+                    else:
+                        value = cell.findtext(f"{_XLSX_NS}v") or ""
+                        if kind == 's' and value:
+                            value = shared[int(value)]
+                    ref = cell.get('r')
+                    column = _xlsx_column(ref) if ref else len(record)
+                    record.extend([""] * (column - len(record)))
+                    record.append(value)
+                elem.clear()
+                # Como o csv.reader: linha sem nenhuma célula é uma lista vazia
+                yield record if any(record) else []
+
+
+class _HashingReader(io.RawIOBase):
+    """Arquivo binário que alimenta digest com tudo o que é lido"""
+
+    def __init__(self, path, digest):
+        self._raw = open(path, 'rb')
+        self._digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self._raw.readinto(buffer)
+        if size:
+            self._digest.update(memoryview(buffer)[:size])
+        return size
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class CsvSchema:
+    """PERF-021: Encoding, dialeto e cabeçalho de um CSV, detectados uma vez.
+
+    A contagem de linhas (com as colisões da coluna-chave) e a impressão
+    digital exigem ler o arquivo inteiro; saem sob demanda e ficam guardadas,
+    então o diálogo da GUI não paga por elas e um novo build do mesmo arquivo
+    não relê nada. Use inspect_csv() para obter a instância em cache.
+
+    PERF-022: Também aceita TSV e XLSX (format = 'csv', 'tsv' ou 'xlsx'); rows()
+    entrega só as colunas pedidas, pelo pyarrow quando disponível.
+
+    PERF-023: A mesma varredura de scan() calcula a impressão digital e as
+    estatísticas da coluna de áudio para a pré-verificação, então um build lê o
+    arquivo duas vezes: scan() e rows().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = TABLE_FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+        self._scans = {}
+        self._text_stats = {}  # {coluna: TextColumnStats}
+        self._fingerprint = None
+        if self.format == 'xlsx':
+            self.encoding = self.dialect = None
+            with contextlib.closing(self._records()) as records:
+                self.fieldnames = next((record for record in records if record), [])
+            return
+        with open(path, 'rb') as f:
+            sample = f.read(CSV_SNIFF_BYTES)
+        self.encoding, text = self._decode(sample)
+        if len(sample) == CSV_SNIFF_BYTES:
+            # Só linhas completas na amostra
+            text = text[:text.rfind('\n') + 1] or text
+        if self.format == 'tsv':
+            self.dialect = 'excel-tab'
+        else:
+            try:
+                self.dialect = csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS)
+            except csv.Error:
+                self.dialect = 'excel'
+        records = csv.reader(io.StringIO(text), dialect=self.dialect)
+        # Como o DictReader: o cabeçalho é o primeiro registro não vazio
+        self.fieldnames = next((record for record in records if record), [])
+
+    @staticmethod
+    def _decode(sample):
+        for encoding in CSV_ENCODINGS:
+            try:
+                # Incremental: um caractere cortado no fim da amostra não conta como erro
+                return encoding, codecs.getincrementaldecoder(encoding)().decode(sample)
+            except UnicodeDecodeError:
+                continue
+        raise ValueError("encoding do CSV não reconhecido")
+
+    def _records(self, digest=None):
+        """Registros brutos (listas), cabeçalho incluído; digest recebe os bytes lidos"""
+        if self.format == 'xlsx':
+            yield from _xlsx_records(self.path)
+            return
+        if digest is None:
+            f = open(self.path, encoding=self.encoding, newline='')
+        else:
+            f = io.TextIOWrapper(io.BufferedReader(_HashingReader(self.path, digest)),
+                                 encoding=self.encoding, newline='')
+        with f:
+            yield from csv.reader(f, dialect=self.dialect)
+
+    def rows(self, columns=None):
+        """PERF-022: Linhas como dicts só com as colunas pedidas (None = todas), na ordem do arquivo.
+
+        Colunas do cabeçalho faltando no fim de uma linha valem ''. Linhas em
+        branco são puladas, como no DictReader. Com um nome repetido no
+        cabeçalho vale a primeira coluna, com ou sem pyarrow.
+        """
+        columns = list(dict.fromkeys(self.fieldnames if columns is None else columns))
+        dialect = csv.get_dialect(self.dialect) if isinstance(self.dialect, str) else self.dialect
+        # O pyarrow não tem skipinitialspace; com ele (ou sem colunas) fica a stdlib
+        if self.format != 'xlsx' and not dialect.skipinitialspace and set(columns) & set(self.fieldnames):
+            pyarrow = _load_pyarrow()
+            if pyarrow is not None:
+                return self._arrow_rows(pyarrow, dialect, columns)
+        return self._python_rows(columns)
+
+    def _python_rows(self, columns, skip=0):
+        with contextlib.closing(self._records()) as records:
+            header = next((record for record in records if record), [])
+            # Nomes repetidos no cabeçalho: vale a primeira coluna, como no leitor do pyarrow
+            positions = {}
+            for index, name in enumerate(header):
+                positions.setdefault(name, index)
+            wanted = [(name, positions[name]) for name in columns if name in positions]
+            for record in records:
+                if not record:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                width = len(record)
+                yield {name: record[index] if index < width else '' for name, index in wanted}
+
+    def _arrow_rows(self, pyarrow, dialect, columns):
+        """Blocos de ~1 MB decodificados em C; só as colunas pedidas viram objetos Python"""
+        wanted = [name for name in columns if name in self.fieldnames]
+        yielded = 0
+        try:
+            reader = pyarrow.csv.open_csv(
+                self.path,
+                read_options=pyarrow.csv.ReadOptions(
+                    encoding='utf8' if self.encoding == 'utf-8-sig' else self.encoding, block_size=1 << 20),
+                parse_options=pyarrow.csv.ParseOptions(
+                    delimiter=dialect.delimiter, quote_char=dialect.quotechar or False,
+                    double_quote=dialect.doublequote, escape_char=dialect.escapechar or False,
+                    newlines_in_values=True),
+                convert_options=pyarrow.csv.ConvertOptions(
+                    include_columns=wanted, column_types={name: pyarrow.string() for name in wanted},
+                    strings_can_be_null=False, quoted_strings_can_be_null=False),
+            )
+            for batch in reader:
+                values = [batch.column(index).to_pylist() for index in range(len(wanted))]
+                for record in zip(*values):
+                    yield dict(zip(wanted, record))
+                    yielded += 1
+        except pyarrow.ArrowInvalid:
+            # Linhas irregulares (colunas a menos, aspas soltas...): o csv da stdlib
+            # tolera; segue por ele a partir da primeira linha não entregue
+            yield from self._python_rows(columns, skip=yielded)
+
+    def scan(self, key_column=None, text_column=None):
+        """Pré-varredura barata (sem montar dicts) para o progresso.
+
+        Também conta os valores da coluna-chave, para acusar colisões antes de
+        qualquer síntese. Retorna (total de linhas, {chave repetida: vezes}, chaves vazias).
+        Com text_column, a mesma passada acumula as estatísticas de text_stats().
+        """
+        if key_column in self._scans and (text_column is None or text_column in self._text_stats):
+            return self._scans[key_column]
+        keys = RowKeys()
+        empty_keys = 0
+        total = 0
+        text = TextColumnStats() if text_column is not None else None
+        digest = hashlib.sha256() if self._fingerprint is None and self.format != 'xlsx' else None
+        with contextlib.closing(self._records(digest)) as records:
+            header = next((record for record in records if record), [])
+            key_index = header.index(key_column) if key_column in header else None
+            text_index = header.index(text_column) if text_column in header else None
+            for record in records:
+                # Linhas em branco são ignoradas pelo DictReader
+                if not record:
+                    continue
+                total += 1
+                width = len(record)
+                if text is not None:
+                    text.add(record[text_index] if text_index is not None and text_index < width else '')
+                if key_index is None:
+                    continue
+                key = record[key_index].strip() if key_index < width else ''
+                keys.assign(key, total)
+                if not key:
+                    empty_keys += 1
+        if digest is not None:
+            # O csv.reader leu o arquivo até o fim: é o mesmo hash de BuildJob.fingerprint()
+            self._fingerprint = digest.hexdigest()
+        # Chave gerada que coincide com um valor do CSV conta como repetição dele
+        duplicates = {key: count for key, count in keys.seen.items() if count > 1}
+        for key, count in keys.clashes.items():
+            duplicates[key] = duplicates.get(key, 1) + count
+        self._scans[key_column] = (total, duplicates, empty_keys)
+        if text is not None:
+            self._text_stats[text_column] = text
+        return self._scans[key_column]
+
+    def text_stats(self, column):
+        """PERF-023: TextColumnStats da coluna (da varredura de scan(), sem reler se já feita)"""
+        if column not in self._text_stats:
+            self.scan(text_column=column)
+        return self._text_stats[column]
+
+    @property
+    def row_count(self):
+        if self._scans:
+            return next(iter(self._scans.values()))[0]
+        return self.scan()[0]
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = BuildJob.fingerprint(self.path)
+        return self._fingerprint
+
+
+_csv_schemas = collections.OrderedDict()  # {(caminho, mtime, tamanho): CsvSchema}
+_csv_schemas_lock = threading.Lock()
+CSV_SCHEMA_CACHE_SIZE = 32
+
+
+def inspect_csv(path):
+    """PERF-021: CsvSchema do arquivo, reaproveitado enquanto caminho, mtime e tamanho não mudarem.
+    Compartilhado entre a GUI, o CLI e o pipeline (inclusive entre threads)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _csv_schemas_lock:
+        schema = _csv_schemas.get(key)
+        if schema is not None:
+            _csv_schemas.move_to_end(key)
+            return schema
+    schema = CsvSchema(path)
+    with _csv_schemas_lock:
+        _csv_schemas[key] = schema
+        while len(_csv_schemas) > CSV_SCHEMA_CACHE_SIZE:
+            _csv_schemas.popitem(last=False)
+    return schema
+
+
+# --- BUILD INCREMENTAL ---
+
+def manifest_path_for(output_pkg):
+    return os.path.splitext(output_pkg)[0] + ".manifest.json"
+
+
+def metrics_path_for(output_pkg, extension="json"):
+    return f"{os.path.splitext(output_pkg)[0]}.metrics.{extension}"
+
+
+class PreviousBuild:
+    """PERF-009: Manifesto e mídia do último build do mesmo deck.
+
+    O manifesto (<deck>.manifest.json, ao lado do .apkg) guarda, por chave de
+    linha, o GUID da nota, o arquivo de áudio e o hash dos campos. Como o nome do
+    arquivo de áudio deriva de (texto, voz, velocidade), um áudio inalterado tem
+    o mesmo nome no pacote anterior e é extraído dele em vez de sintetizado.
+    """
+
+    def __init__(self, rows=None, package_path=None):
+        self.rows = rows or {}
+        self.found = rows is not None
+        self._zip = None
+        self._media = {}  # {nome do arquivo: entrada no zip}
+        if package_path:
+            self._zip = zipfile.ZipFile(package_path)
+            media = json.loads(self._zip.read('media').decode('utf-8'))
+            self._media = {name: entry for entry, name in media.items()}
+
+    @classmethod
+    def load(cls, output_pkg, log):
+        """Carrega o build anterior; sem manifesto (ou corrompido) devolve um build vazio"""
+        manifest_path = manifest_path_for(output_pkg)
+        if not os.path.exists(manifest_path):
+            return cls()
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            package_path = output_pkg if os.path.exists(output_pkg) else None
+            return cls(manifest.get('rows', {}), package_path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            log(f"[AVISO] Build anterior ignorado: {type(e).__name__}: {str(e)}")
+            return cls()
+
+    def has(self, filename):
+        return self._zip is not None and filename in self._media
+
+    def read(self, filename):
+        """Bytes de um áudio do pacote anterior, ou None se ele não estiver lá"""
+        entry = self._media.get(filename)
+        if self._zip is None or entry is None:
+            return None
+        try:
+            return self._zip.read(entry)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return None
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class BuildJob:
+    """PERF-019: Build de deck durável, retomável após uma queda.
+
+    <deck>.job/ guarda job.json (impressão digital do CSV, mapeamento e
+    parâmetros de síntese), journal.jsonl (uma entrada por linha concluída,
+    só acrescentada) e media/ com cada áudio já obtido. Repetir o build com a
+    mesma entrada pula a síntese das linhas do diário e segue direto para o
+    restante e o empacotamento. O diretório é apagado quando o build termina.
+    Um job novo só é criado no disco com o primeiro áudio guardado: um build
+    recusado na pré-verificação ou no espaço em disco não deixa nada para trás.
+    """
+
+    FSYNC_EVERY = 100  # entradas do diário entre fsyncs
+
+    def __init__(self, output_pkg, spec):
+        self.dir = os.path.splitext(output_pkg)[0] + ".job"
+        self.media_dir = os.path.join(self.dir, "media")
+        self.spec = spec
+        self.completed = {}  # {chave da linha: arquivo de áudio}
+        self._sizes = {}     # {arquivo de áudio: bytes}
+        self._journal = None
+        self._unsynced = 0
+
+    @staticmethod
+    def fingerprint(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def open(self, log):
+        """Retoma o job compatível, se houver; devolve as linhas já concluídas"""
+        job_path = os.path.join(self.dir, "job.json")
+        journal_path = os.path.join(self.dir, "journal.jsonl")
+        try:
+            with open(job_path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = None
+        if saved is not None and saved != self.spec:
+            log("[AVISO] Job interrompido de outra entrada (CSV, mapeamento ou voz mudaram) descartado")
+            shutil.rmtree(self.dir, ignore_errors=True)
+            saved = None
+        if saved is None:
+            return 0
+        os.makedirs(self.media_dir, exist_ok=True)
+
+        truncated = False
+        with open(journal_path, 'a+', encoding='utf-8') as f:
+            f.seek(0)
+            for line in f:
+                truncated = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # última linha cortada pela queda
+                path = self.media_path(entry['audio'])
+                if os.path.exists(path) and os.path.getsize(path) == entry['size']:
+                    self.completed[entry['key']] = entry['audio']
+                    self._sizes[entry['audio']] = entry['size']
+        self._journal = open(journal_path, 'a', encoding='utf-8')
+        if truncated:
+            self._journal.write("\n")
+        return len(self.completed)
+
+    def media_path(self, filename):
+        return os.path.join(self.media_dir, filename)
+
+    def has_media(self, filename):
+        return filename in self._sizes
+
+    def read(self, filename):
+        try:
+            with open(self.media_path(filename), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _create(self):
+        """Grava job.json e abre um diário vazio (job novo)"""
+        job_path = os.path.join(self.dir, "job.json")
+        os.makedirs(self.media_dir, exist_ok=True)
+        with open(f"{job_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.spec, f, ensure_ascii=False)
+        os.replace(f"{job_path}.tmp", job_path)
+        self._journal = open(os.path.join(self.dir, "journal.jsonl"), 'w', encoding='utf-8')
+
+    def store(self, filename, data):
+        if self._journal is None:
+            self._create()
+        path = self.media_path(filename)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        self._sizes[filename] = len(data)
+
+    def mark_done(self, key, audio_filename):
+        """Registra a linha cujo áudio passou por store(); os demais não precisam do job"""
+        size = self._sizes.get(audio_filename)
+        if size is None:
+            return
+        self.completed[key] = audio_filename
+        entry = {'key': key, 'audio': audio_filename, 'size': size}
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.FSYNC_EVERY:
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def discard(self):
+        self.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def write_manifest(output_pkg, meta, rows):
+    """Grava o manifesto de forma atômica ao lado do .apkg"""
+    path = manifest_path_for(output_pkg)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, **meta, 'rows': rows}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def write_metrics(output_pkg, report, openmetrics=False):
+    """PERF-017: <deck>.metrics.json (e <deck>.metrics.prom com openmetrics) ao lado do .apkg"""
+    path = metrics_path_for(output_pkg)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+    if openmetrics:
+        with open(metrics_path_for(output_pkg, "prom"), 'w', encoding='utf-8') as f:
+            f.write(BuildMetrics.openmetrics(report))
+
+
+def record_throughput(engine, chars, seconds, path=None):
+    """PERF-023: Acrescenta a vazão de um build ao histórico (JSONL, só as últimas linhas ficam)"""
+    path = path or THROUGHPUT_HISTORY
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    entry = {'engine': engine, 'chars': chars, 'seconds': round(seconds, 3),
+             'at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    if len(lines) > THROUGHPUT_HISTORY_SIZE * 5:
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.writelines(lines[-THROUGHPUT_HISTORY_SIZE * 5:])
+        os.replace(f"{path}.tmp", path)
+
+
+def historical_throughput(engine, path=None):
+    """Mediana dos últimos builds do motor, em caracteres/s; None sem histórico"""
+    try:
+        with open(path or THROUGHPUT_HISTORY, encoding='utf-8') as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    rates = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry.get('engine') == engine and entry.get('seconds'):
+            rates.append(entry['chars'] / entry['seconds'])
+    rates = rates[-THROUGHPUT_HISTORY_SIZE:]
+    return _percentile(rates, 50) if rates else None
+
+
+def fields_hash(fields):
+    return hashlib.sha1("\x1f".join(fields).encode('utf-8')).hexdigest()
+
+
+class RowKeys:
+    """Chave de cada linha = valor da coluna-chave (sem valor: #linhaN); repetições ganham #n.
+
+    Uma chave gerada nunca coincide com outra já entregue, nem com um valor que
+    aparece literalmente no CSV: com as linhas a, a, a#2 a terceira vira a#2#2.
+    clashes conta, por chave, essas colisões entre chaves geradas e literais.
+    """
+
+    def __init__(self):
+        self.seen = collections.Counter()  # {valor: linhas}
+        self.used = set()
+        self.clashes = collections.Counter()
+
+    def assign(self, value, number):
+        value = value or f"#linha{number}"
+        self.seen[value] += 1
+        count = self.seen[value]
+        key = value if count == 1 else f"{value}#{count}"
+        while key in self.used:
+            self.clashes[key] += 1
+            count += 1
+            key = f"{value}#{count}"
+        self.used.add(key)
+        return key
+
+
+def deck_name_for(name):
+    """FIX-014: Nome de deck/arquivo sem caracteres inválidos"""
+    return re.sub(r'[<>:"/\\|?*]', '_', name)[:200]  # Limitar tamanho (Windows tem limite de 260 chars)
+
+
+def batch_deck_names(csv_paths):
+    """PERF-008: Nome de cada deck do lote, único por CSV.
+
+    O nome define o DECK_ID e os GUIDs das notas, então dois CSVs de mesmo nome
+    em pastas diferentes (l1/vocab.csv, l2/vocab.csv) não podem gerar o mesmo
+    deck: ganham como prefixo as pastas que os distinguem (l1_vocab, l2_vocab).
+    CSVs de nome único mantêm o nome de sempre.
+    """
+    parts = {path: os.path.normpath(os.path.abspath(path)).split(os.sep) for path in csv_paths}
+    stems = {path: os.path.splitext(parts[path][-1])[0] for path in csv_paths}
+    groups = collections.defaultdict(list)
+    for path in csv_paths:
+        groups[stems[path]].append(path)
+    names, used = {}, set()
+    for path in csv_paths:
+        name = stems[path]
+        siblings = groups[name]
+        if len(siblings) > 1:
+            # Menor trecho do caminho que separa os CSVs de mesmo nome
+            for depth in range(1, len(parts[path])):
+                candidates = {other: "_".join(parts[other][-1 - depth:-1] + [stems[other]]) for other in siblings}
+                if len(set(candidates.values())) == len(siblings):
+                    name = candidates[path]
+                    break
+        name = base = deck_name_for(name)
+        suffix = 2
+        while name in used:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used.add(name)
+        names[path] = name
+    return names
+
+
+def variant_field_name(voice_code, rate):
+    """PERF-025: Campo do modelo com o áudio de uma variante, ex.: 'Audio File (en-US-MichelleNeural -20%)'"""
+    return f"Audio File ({voice_code} {rate})"
+
+# --- EMPACOTAMENTO ---
+
+class MemoryBudget:
+    """PERF-014: Teto de bytes de áudio em memória, compartilhado pelos decks de um lote"""
+
+    def __init__(self, limit=AUDIO_MEMORY_BYTES):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size):
+        with self._lock:
+            if self.used + size > self.limit:
+                return False
+            self.used += size
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, size):
+        with self._lock:
+            self.used -= size
+
+
+class StreamingPackageWriter:
+    """PERF-013: Monta o .apkg durante a síntese, em vez de tudo no final.
+
+    Cada áudio entra no zip (ZIP_STORED: MP3/WAV não ganham nada com deflate)
+    assim que fica pronto, e cada nota vai para a coleção SQLite assim que sai,
+    na ordem do CSV. Zip e SQLite têm uma thread cada, então a escrita corre em
+    paralelo com a síntese e uma com a outra. finish() só grava o JSON do deck,
+    a coleção e o mapa de mídia, e troca o .part pelo pacote final.
+
+    PERF-014: add_media_data() entrega os bytes direto ao zip enquanto couberem
+    no MemoryBudget; acima do teto (ou sem budget) o áudio passa por work_dir.
+    """
+
+    def __init__(self, output_pkg, work_dir, memory=None):
+        self.output_pkg = output_pkg
+        self.work_dir = work_dir
+        self.memory = memory
+        self.in_memory = 0
+        self.spilled = 0
+        self.part_path = f"{output_pkg}.part"
+        self.timestamp = time.time()
+        self._id_gen = itertools.count(int(self.timestamp * 1000))
+        self._db_path = os.path.join(work_dir, "collection.anki2")
+        self._media = {}  # {entrada no zip: nome do arquivo}, o mapa 'media' do Anki
+        self._models = {}
+        self._reserved = {}  # {chave: ids de nota e cards reservados}
+        self._pending = set()  # chaves reservadas e ainda sem nota (lado do chamador)
+        self._error = None
+        self._finished = False
+        self._closed = False
+        self._zip_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="apkg-media")
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="apkg-db")
+        self._zip = zipfile.ZipFile(self.part_path, 'w')
+        # A conexão SQLite pertence à thread que a criou
+        self._conn = None
+        self._db_executor.submit(self._open_db).result()
+
+    def _open_db(self):
+        import genanki
+        self._conn = sqlite3.connect(self._db_path)
+        # Pacote sem decks: cria só o esquema e a linha 'col' da coleção
+        genanki.Package([]).write_to_db(self._conn.cursor(), self.timestamp, self._id_gen)
+
+    def _submit(self, executor, fn, *args, cleanup=None):
+        # Fire-and-forget: o primeiro erro fica guardado e sobe em finish()
+        if self._closed:
+            if cleanup:
+                cleanup()
+            return
+
+        def job():
+            try:
+                if self._error is None:
+                    fn(*args)
+            except Exception as e:
+                self._error = e
+            finally:
+                if cleanup:
+                    cleanup()
+        executor.submit(job)
+
+    @property
+    def media_count(self):
+        return len(self._media)
+
+    def add_media(self, path):
+        """Enfileira o arquivo para o zip; o temporário é apagado depois de escrito"""
+        entry = str(len(self._media))
+        self._media[entry] = os.path.basename(path)
+        self._submit(self._zip_executor, self._write_media, path, entry)
+
+    def _write_media(self, path, entry):
+        self._zip.write(path, entry, compress_type=zipfile.ZIP_STORED)
+        os.remove(path)
+
+    def add_media_data(self, filename, data):
+        """Enfileira bytes já em memória; sem espaço no budget, grava em work_dir antes"""
+        if self.memory is not None and self.memory.reserve(len(data)):
+            entry = str(len(self._media))
+            self._media[entry] = filename
+            self.in_memory += 1
+            self._submit(self._zip_executor, self._zip.writestr, entry, data, zipfile.ZIP_STORED,
+                         cleanup=lambda: self.memory.release(len(data)))
+            return
+        path = os.path.join(self.work_dir, filename)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.spilled += 1
+        self.add_media(path)
+
+    def add_note(self, note, deck_id, reserved=None):
+        """reserved: chave passada antes a reserve(); a nota usa os ids guardados"""
+        if reserved is not None:
+            if reserved not in self._pending:
+                raise KeyError(f"nenhuma reserva de ids para '{reserved}'")
+            self._pending.discard(reserved)
+        self._models[note.model.model_id] = note.model
+        self._submit(self._db_executor, self._write_note, note, deck_id, reserved)
+
+    def reserve(self, key, count):
+        """PERF-020: Guarda count ids na posição atual, para uma nota gravada depois.
+
+        O Anki ordena os cards novos pelo id da nota; com a reserva, uma linha
+        repetida na passada final continua no lugar dela no deck. A chave precisa
+        ser única entre as reservas pendentes.
+        """
+        if key in self._pending:
+            raise ValueError(f"ids já reservados para '{key}'")
+        self._pending.add(key)
+        self._submit(self._db_executor, self._reserve_ids, key, count)
+
+    def _reserve_ids(self, key, count):
+        # range em vez de lista: no escalonamento por tamanho todas as linhas reservam
+        start = next(self._id_gen)
+        self._id_gen = itertools.count(start + count)
+        self._reserved[key] = range(start, start + count)
+
+    def _write_note(self, note, deck_id, reserved):
+        id_gen = self._id_gen
+        if reserved is not None:
+            id_gen = itertools.chain(iter(self._reserved.pop(reserved)), self._id_gen)
+        note.write_to_db(self._conn.cursor(), self.timestamp, deck_id, id_gen)
+
+    def _finish_db(self, deck):
+        if self._error is not None:
+            return
+        # Notas já foram gravadas; o deck só registra a si mesmo e aos modelos
+        deck.notes = []
+        for model in self._models.values():
+            deck.add_model(model)
+        deck.write_to_db(self._conn.cursor(), self.timestamp, self._id_gen)
+        self._conn.commit()
+        self._conn.close()
+        self._conn = None
+
+    def _finish_zip(self):
+        self._zip.write(self._db_path, 'collection.anki2', compress_type=zipfile.ZIP_DEFLATED)
+        self._zip.writestr('media', json.dumps(self._media))
+        self._zip.close()
+
+    async def finish(self, deck):
+        loop = asyncio.get_running_loop()
+        # As filas são FIFO: o fechamento da coleção corre junto com as últimas mídias
+        await asyncio.gather(
+            loop.run_in_executor(self._zip_executor, lambda: None),
+            loop.run_in_executor(self._db_executor, self._finish_db, deck),
+        )
+        if self._error is not None:
+            raise self._error
+        await loop.run_in_executor(self._zip_executor, self._finish_zip)
+        os.replace(self.part_path, self.output_pkg)
+        self._finished = True
+        self.close()
+
+    def _abort_db(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        """Encerra as threads; sem finish() o pacote parcial é descartado"""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._finished:
+            # Escritas pendentes são canceladas; as que já rodam terminam antes do descarte
+            self._error = self._error or RuntimeError("pacote descartado")
+            self._db_executor.submit(self._abort_db)
+        self._db_executor.shutdown(wait=True)
+        self._zip_executor.shutdown(wait=True)
+        if not self._finished:
+            self._zip.close()
+            try:
+                os.remove(self.part_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 # --- BACKEND ---
 
+# Requisições TTS simultâneas: valor inicial e faixa do controle adaptativo
+MAX_CONCURRENCY = 20
+MIN_CONCURRENCY = 2
+MAX_CONCURRENCY_CEILING = 64
+# PERF-005: Limite fixo opcional (desliga o controle adaptativo)
+CONCURRENCY_OVERRIDE = int(os.environ.get("ANKI_STUDIO_CONCURRENCY", "0")) or None
+# PERF-024: O limite adaptativo mede latência e sucessos em blocos de N caracteres; sem
+# isso um parágrafo longo parece congestionamento e atrasa a subida do limite
+LATENCY_REFERENCE_CHARS = 100
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# PERF-017: Faixas (segundos) do histograma de latência TTS
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class BuildMetrics:
+    """PERF-017: Métricas estruturadas de um build de deck.
+
+    Coleta latência por requisição TTS (histograma), erros e retentativas por
+    tipo de exceção, bytes sintetizados, profundidade da fila e requisições em
+    voo (amostradas no tempo) e a duração de cada fase. report() gera o JSON
+    gravado ao lado do .apkg; openmetrics() o mesmo conteúdo em texto OpenMetrics.
+    """
+
+    SAMPLE_INTERVAL = 0.1
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self._phase = None
+        self._phase_started = 0.0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self._latencies = []
+        self.errors = collections.Counter()
+        self.retries = collections.Counter()
+        self.bytes_synthesized = 0
+        self.bytes_from_cache = 0
+        self.chars_synthesized = 0
+        self._queue = None
+        self._samples = 0
+        self._in_flight = [0, 0]    # [soma, máximo]
+        self._queue_depth = [0, 0]
+        # Preenchidos pelo build à medida que avança; o relatório sai mesmo se ele falhar no meio
+        self.meta = {}
+        self.stats = {}
+        self.preflight = None
+        self.package = None
+
+    def enter_phase(self, name):
+        """Encerra a fase atual e começa name (None só encerra)"""
+        now = time.monotonic()
+        if self._phase is not None:
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + now - self._phase_started
+        self._phase, self._phase_started = name, now
+
+    def record_request(self, latency, size, chars=0):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        self.latency_counts[index] += 1
+        self.latency_sum += latency
+        self._latencies.append(latency)
+        self.bytes_synthesized += size
+        self.chars_synthesized += chars
+
+    def record_error(self, error_type, retried):
+        self.errors[error_type] += 1
+        if retried:
+            self.retries[error_type] += 1
+
+    def watch_queue(self, queue):
+        self._queue = queue
+
+    async def sample(self, limiter):
+        """Amostra em voo e fila até ser cancelada"""
+        while True:
+            self._samples += 1
+            for gauge, value in ((self._in_flight, limiter.in_flight),
+                                 (self._queue_depth, self._queue.qsize() if self._queue else 0)):
+                gauge[0] += value
+                gauge[1] = max(gauge[1], value)
+            await asyncio.sleep(self.SAMPLE_INTERVAL)
+
+    def _gauge(self, gauge):
+        return {'mean': round(gauge[0] / self._samples, 2) if self._samples else 0.0, 'max': gauge[1]}
+
+    def report(self, meta, stats, limiter):
+        requests = sum(self.latency_counts)
+        cumulative = list(itertools.accumulate(self.latency_counts))
+        return {
+            'version': 1,
+            **meta,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'duration_s': round(time.time() - self.started, 3),
+            'phases_s': {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            'stats': dict(stats),
+            'tts': {
+                'requests': requests,
+                'latency_s': {
+                    'buckets': {**{str(bound): count for bound, count in zip(LATENCY_BUCKETS, cumulative)},
+                                '+Inf': requests},
+                    'sum': round(self.latency_sum, 3),
+                    'p50': round(_percentile(self._latencies, 50), 3),
+                    'p95': round(_percentile(self._latencies, 95), 3),
+                    'max': round(max(self._latencies, default=0.0), 3),
+                },
+                'errors_by_type': dict(self.errors),
+                'retries_by_type': dict(self.retries),
+                'bytes_synthesized': self.bytes_synthesized,
+                'bytes_from_cache': self.bytes_from_cache,
+                'chars_synthesized': self.chars_synthesized,
+            },
+            'concurrency': {
+                'final_limit': limiter.limit,
+                'in_flight': self._gauge(self._in_flight),
+                'queue_depth': self._gauge(self._queue_depth),
+            },
+        }
+
+    @staticmethod
+    def openmetrics(report):
+        """Texto OpenMetrics do relatório, com o deck como label"""
+        deck = f'deck="{_label(report.get("deck", ""))}"'
+        tts = report['tts']
+        lines = [
+            "# TYPE anki_studio_tts_latency_seconds histogram",
+            "# UNIT anki_studio_tts_latency_seconds seconds",
+        ]
+        for bound, count in tts['latency_s']['buckets'].items():
+            lines.append(f'anki_studio_tts_latency_seconds_bucket{{{deck},le="{bound}"}} {count}')
+        lines.append(f"anki_studio_tts_latency_seconds_count{{{deck}}} {tts['requests']}")
+        lines.append(f"anki_studio_tts_latency_seconds_sum{{{deck}}} {tts['latency_s']['sum']}")
+        for name, key in (('errors', 'errors_by_type'), ('retries', 'retries_by_type')):
+            lines.append(f"# TYPE anki_studio_tts_{name} counter")
+            for error_type, count in tts[key].items():
+                lines.append(f'anki_studio_tts_{name}_total{{{deck},type="{_label(error_type)}"}} {count}')
+        lines.append("# TYPE anki_studio_tts_bytes counter")
+        lines.append(f'anki_studio_tts_bytes_total{{{deck},source="synthesized"}} {tts["bytes_synthesized"]}')
+        lines.append(f'anki_studio_tts_bytes_total{{{deck},source="cache"}} {tts["bytes_from_cache"]}')
+        lines.append("# TYPE anki_studio_build_events counter")
+        for event, count in report['stats'].items():
+            lines.append(f'anki_studio_build_events_total{{{deck},event="{_label(event)}"}} {count}')
+        lines.append("# TYPE anki_studio_phase_seconds gauge")
+        for name, seconds in report['phases_s'].items():
+            lines.append(f'anki_studio_phase_seconds{{{deck},phase="{_label(name)}"}} {seconds}')
+        concurrency = report['concurrency']
+        for name in ('in_flight', 'queue_depth'):
+            lines.append(f"# TYPE anki_studio_{name} gauge")
+            for stat in ('mean', 'max'):
+                lines.append(f'anki_studio_{name}{{{deck},stat="{stat}"}} {concurrency[name][stat]}')
+        lines.append("# TYPE anki_studio_build info")
+        lines.append(f'anki_studio_build_info{{{deck},status="{_label(report.get("status", ""))}"}} 1')
+        lines.append("# TYPE anki_studio_concurrency_limit gauge")
+        lines.append(f"anki_studio_concurrency_limit{{{deck}}} {concurrency['final_limit']}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class AdaptiveLimiter:
+    """PERF-005: Limite AIMD de requisições TTS simultâneas.
+
+    A cada rodada de `limit` sucessos com latência saudável (p50 até
+    latency_tolerance vezes a melhor mediana observada) o limite sobe 1; um
+    timeout ou erro corta o limite pela metade, no máximo uma vez por rodada.
+    Com fixed=N o limite fica travado em N e só as latências são registradas.
+    record_success(latency, weight) conta weight sucessos (PERF-024: um áudio
+    longo vale pelo seu tamanho em blocos de LATENCY_REFERENCE_CHARS).
+    """
+
+    def __init__(self, initial=MAX_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY_CEILING,
+                 fixed=None, latency_tolerance=2.0, decrease_factor=0.5, log=None):
+        self.fixed = fixed is not None
+        self.minimum = fixed if self.fixed else minimum
+        self.maximum = fixed if self.fixed else maximum
+        self.limit = fixed if self.fixed else max(minimum, min(initial, maximum))
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.log = log
+        self.in_flight = 0
+        self.errors = 0
+        self._waiters = collections.deque()
+        self._latencies = collections.deque(maxlen=200)
+        self._baseline = None
+        self._successes_since_change = 0
+        self._last_decrease = 0.0
+
+    async def __aenter__(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Repassar a vaga se já tínhamos sido acordados
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    @property
+    def p50(self):
+        return _percentile(self._latencies, 50)
+
+    @property
+    def p95(self):
+        return _percentile(self._latencies, 95)
+
+    def summary(self):
+        return f"limite {self.limit}, p50 {self.p50:.2f}s, p95 {self.p95:.2f}s"
+
+    def record_success(self, latency, weight=1.0):
+        self._latencies.append(latency)
+        if self.fixed:
+            return
+        self._successes_since_change += weight
+        if self._successes_since_change < self.limit:
+            return
+        self._successes_since_change = 0
+        # Mediana de referência com leve decaimento, para acompanhar a rede
+        p50 = _percentile(list(self._latencies)[-self.limit:], 50)
+        self._baseline = p50 if self._baseline is None else min(p50, self._baseline * 1.05)
+        if p50 <= self._baseline * self.latency_tolerance and self.limit < self.maximum:
+            self.limit += 1
+            self._wake()
+
+    def record_error(self, reason):
+        self.errors += 1
+        if self.fixed:
+            return
+        # Erros da mesma onda de throttling contam como um único sinal
+        now = time.monotonic()
+        if now - self._last_decrease < max(self.p50, 1.0):
+            return
+        self._last_decrease = now
+        self._successes_since_change = 0
+        new_limit = max(self.minimum, int(self.limit * self.decrease_factor))
+        if new_limit < self.limit:
+            self.limit = new_limit
+            if self.log:
+                self.log(f"[CONCORRÊNCIA] Limite reduzido para {self.limit} ({reason}) | p50 {self.p50:.2f}s | p95 {self.p95:.2f}s")
+
+
+class ConnectTimeout(asyncio.TimeoutError):
+    """O serviço TTS não enviou o primeiro byte a tempo"""
+
+
+class StallTimeout(asyncio.TimeoutError):
+    """O fluxo de áudio parou no meio"""
+
+
+class PermanentTTSError(Exception):
+    """Erro que não adianta repetir (voz inválida, texto recusado...)"""
+
+
+class RetryPolicy:
+    """PERF-020: Política de retentativas da síntese.
+
+    - Backoff com jitter decorrelacionado: cada espera é sorteada entre
+      base_delay e 3x a anterior (até max_delay), então as vagas que falharam
+      juntas não voltam juntas.
+    - Orçamento global: cada requisição nova deposita budget_ratio fichas (até
+      max_budget) e cada retentativa gasta uma. Sem fichas, a linha falha na
+      primeira tentativa em vez de multiplicar a carga sobre um serviço doente.
+    - Erros permanentes (ver is_transient) nunca são repetidos.
+    - Disjuntor: breaker_threshold linhas seguidas sem sucesso indicam serviço
+      fora do ar; as linhas seguintes falham sem requisição e ficam, como as
+      demais falhas transitórias, para a passada final.
+    - connect_timeout limita a espera pelo primeiro byte e stall_timeout o
+      intervalo entre blocos do fluxo, no lugar dos 30 s fixos.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=20.0, budget_ratio=0.1, min_budget=10,
+                 max_budget=50, breaker_threshold=50, connect_timeout=15.0, stall_timeout=10.0,
+                 final_pass_delay=5.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.breaker_threshold = breaker_threshold
+        self.connect_timeout = connect_timeout
+        self.stall_timeout = stall_timeout
+        self.final_pass_delay = final_pass_delay
+        self.reset()
+
+    def fresh(self):
+        """Mesma configuração, com orçamento e disjuntor próprios (um por deck do lote)"""
+        policy = copy.copy(self)
+        policy.reset()
+        return policy
+
+    def reset(self):
+        """Orçamento cheio e disjuntor fechado (início do build e da passada final)"""
+        self.tokens = float(self.min_budget)
+        self.consecutive_failures = 0
+        self.tripped = False
+
+    @staticmethod
+    def is_transient(exc):
+        if isinstance(exc, PermanentTTSError):
+            return False
+        status = getattr(exc, 'status', None)
+        if isinstance(status, int) and 400 <= status < 500:
+            # 408 (timeout) e 429 (throttling) passam; os demais 4xx são pedidos inválidos
+            return status in (408, 429)
+        if isinstance(exc, (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)):
+            # Erros de arquivo local; TimeoutError e ConnectionError também são OSError no 3.11+
+            return False
+        if isinstance(exc, (asyncio.TimeoutError, OSError)):
+            return True
+        return not isinstance(exc, (ValueError, TypeError, LookupError, NotImplementedError))
+
+    def backoff(self, previous):
+        return min(self.max_delay, random.uniform(self.base_delay, max(previous, self.base_delay) * 3))
+
+    def on_request(self):
+        self.tokens = min(self.max_budget, self.tokens + self.budget_ratio)
+
+    def try_retry(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        """Conta a linha perdida; devolve True se o disjuntor acabou de abrir"""
+        self.consecutive_failures += 1
+        if not self.tripped and self.consecutive_failures >= self.breaker_threshold:
+            self.tripped = True
+            return True
+        return False
+
+
+async def run_worker_pool(items, handle, workers, metrics=None):
+    """PERF-003/004: Escalonador contínuo produtor/consumidor.
+
+    Os itens são consumidos sob demanda por uma fila limitada; cada worker pega o
+    próximo item assim que termina o anterior, sem lotes nem pausas. A memória de
+    pico depende do número de workers, não do número de itens.
+    """
+    queue = asyncio.Queue(maxsize=workers * 2)
+    if metrics is not None:
+        metrics.watch_queue(queue)
+
+    async def producer():
+        for item in items:
+            await queue.put(item)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            await handle(item)
+
+    tasks = [asyncio.ensure_future(producer())]
+    tasks += [asyncio.ensure_future(worker()) for _ in range(workers)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# PERF-023: Pré-verificação
+SPEECH_CHARS_PER_SECOND = 15.0     # ~150 palavras/min na velocidade +0%
+PREFLIGHT_LONG_CHARS = 2000        # scripts acima disso são sempre acusados
+PREFLIGHT_OUTLIER_FACTOR = 10      # ...e os acima de 10x a mediana
+PREFLIGHT_MIN_OUTLIER_CHARS = 200  # (mas nunca abaixo disso)
+PREFLIGHT_NOTE_BYTES = 500         # coleção SQLite por nota, na estimativa do pacote
+PREFLIGHT_SAMPLE_LINES = 10       # linhas listadas por problema no log e no relatório
+PREFLIGHT_SAMPLE_TEXTS = 2000     # textos únicos guardados para estimar o que falta sintetizar
+PREFLIGHT_MODES = ('report', 'strict', 'only')
+# PERF-024: Ordem da síntese (a ordem das notas no deck é sempre a do CSV)
+SCHEDULES = ('csv', 'longest')
+_BAD_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\ufffd]')
+_MARKUP = re.compile(r'<[a-zA-Z/][^>]*>')
+
+
+def _duration(seconds):
+    """3725 -> '1h02min'"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}min{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}min"
+
+
+class TextColumnStats:
+    """PERF-023: Estatísticas da coluna de áudio, acumuladas linha a linha por CsvSchema.scan().
+
+    Guarda o comprimento de cada linha (um inteiro), um resumo de 16 bytes e o
+    tamanho de cada texto único e, por problema, a contagem e as primeiras
+    PREFLIGHT_SAMPLE_LINES linhas, nunca a coluna inteira. Texto mesmo, só o de
+    uma amostra de até PREFLIGHT_SAMPLE_TEXTS únicos (os de menor resumo, então
+    uniforme e sempre a mesma para o mesmo arquivo), para a estimativa do que já
+    está no cache ou no pacote anterior.
+    """
+
+    ISSUES = ('empty', 'bad_chars', 'unspeakable', 'markup')
+
+    def __init__(self):
+        self.rows = 0
+        self.lengths = array.array('l')  # caracteres de cada linha, 0 = vazia
+        self.unique = {}                 # {resumo do texto limpo: caracteres}
+        self._sample = []                # heap de (-posição do resumo, texto limpo)
+        self.issues = {name: [0, []] for name in self.ISSUES}  # {problema: [contagem, linhas]}
+
+    def _flag(self, name, number):
+        entry = self.issues[name]
+        entry[0] += 1
+        if len(entry[1]) < PREFLIGHT_SAMPLE_LINES:
+            entry[1].append(number)
+
+    def add(self, text):
+        self.rows += 1
+        number = self.rows
+        clean = text.replace("\n", " ").strip()
+        self.lengths.append(len(clean))
+        if not clean:
+            self._flag('empty', number)
+            return
+        if _BAD_CHARS.search(clean):
+            self._flag('bad_chars', number)
+        if not any(char.isalnum() for char in clean):
+            self._flag('unspeakable', number)
+        if _MARKUP.search(clean):
+            self._flag('markup', number)
+        digest = hashlib.sha256(clean.encode('utf-8')).digest()[:16]
+        if digest in self.unique:
+            return
+        self.unique[digest] = len(clean)
+        rank = int.from_bytes(digest[:8], 'big')
+        if len(self._sample) < PREFLIGHT_SAMPLE_TEXTS:
+            heapq.heappush(self._sample, (-rank, clean))
+        elif rank < -self._sample[0][0]:
+            heapq.heapreplace(self._sample, (-rank, clean))
+
+    @property
+    def sample(self):
+        """Textos únicos da amostra (todos, se couberem em PREFLIGHT_SAMPLE_TEXTS)"""
+        return [clean for _, clean in self._sample]
+
+    def longer_than(self, chars):
+        """[contagem, primeiras linhas] dos textos com mais de chars caracteres"""
+        lines = [number for number, length in enumerate(self.lengths, 1) if length > chars]
+        return [len(lines), lines[:PREFLIGHT_SAMPLE_LINES]]
+
+
 class AnkiBuilderBackend:
-    def __init__(self, log_callback, progress_callback):
+    def __init__(self, log_callback, progress_callback, cache=None, concurrency=None, engine=None,
+                 strict_keys=False, audio_memory=None, postprocess=None, openmetrics=False, durable_jobs=True,
+                 retry_policy=None, preflight='report', schedule='csv'):
         self.log = log_callback
         self.progress = progress_callback
+        # strict_keys: colisões na coluna-chave interrompem o build antes da síntese
+        self.strict_keys = strict_keys
+        self.engine = engine or EdgeTTSEngine()
+        # PERF-015: AudioPostProcessor opcional (recodificação + loudnorm com ffmpeg)
+        self.postprocess = postprocess
+        # PERF-017: Métricas do build em andamento; openmetrics também grava o .prom
+        self.metrics = None
+        self.openmetrics = openmetrics
+        # PERF-019: Áudio e linhas concluídas em <deck>.job/ até o fim do build
+        self.durable_jobs = durable_jobs
+        # cache=None usa o cache padrão em disco; cache=False desativa
+        self.cache = AudioCache() if cache is None else (cache or None)
+        # concurrency=N fixa o limite; None usa ANKI_STUDIO_CONCURRENCY ou o modo adaptativo
+        self.limiter = AdaptiveLimiter(fixed=concurrency or CONCURRENCY_OVERRIDE, log=self.log)
+        # PERF-020: Backoff, orçamento de retentativas, disjuntor e timeouts da síntese
+        self.retry_policy = retry_policy or RetryPolicy()
+        # PERF-023: 'report' só registra, 'strict' para em dados ruins, 'only' para antes da síntese
+        if preflight not in PREFLIGHT_MODES:
+            raise ValueError(f"preflight deve ser um de {PREFLIGHT_MODES}")
+        self.preflight = preflight
+        # PERF-024: 'csv' sintetiza na ordem do arquivo, 'longest' os scripts mais longos primeiro
+        if schedule not in SCHEDULES:
+            raise ValueError(f"schedule deve ser um de {SCHEDULES}")
+        self.schedule = schedule
+        # PERF-014: Teto do áudio em memória; None usa ANKI_STUDIO_AUDIO_MEMORY_MB, 0 desativa
+        if audio_memory is None:
+            audio_memory = AUDIO_MEMORY_BYTES
+        self.audio_memory = MemoryBudget(audio_memory) if audio_memory > 0 else None
+
+    def _cache_read(self, key, stats):
+        try:
+            audio = self.cache.read(key)
+        except (IOError, OSError) as e:
+            self.log(f"[AVISO CACHE] Falha ao ler cache: {str(e)}")
+            audio = None
+        if stats is not None:
+            stats['cache_misses' if audio is None else 'cache_hits'] += 1
+        return audio
 
-    async def generate_audio(self, text, filepath, voice, rate, semaphore, max_retries=3):
-        async with semaphore:
-            if not text or not text.strip(): 
-                return False
-            
-            # Limpeza para TTS
-            clean_text = text.replace("\n", " ").strip()
-            
-            # Retry com backoff exponencial
-            for attempt in range(max_retries):
+    def _cache_store(self, key, audio):
+        try:
+            self.cache.store(key, audio, self.engine.extension)
+        except (IOError, OSError) as e:
+            # Falha no cache nunca deve derrubar a linha
+            self.log(f"[AVISO CACHE] Falha ao gravar cache: {str(e)}")
+
+    async def generate_audio(self, text, filepath, voice, rate, limiter, max_retries=None, stats=None):
+        """Sintetiza para um arquivo; retorna False se não houver áudio"""
+        audio = await self.synthesize_audio(text, voice, rate, limiter, max_retries, stats)
+        if audio is None:
+            return False
+        try:
+            with open(filepath, 'wb') as f:
+                f.write(audio)
+        except (OSError, IOError) as e:
+            # FIX-004: Exceções específicas para I/O
+            self.log(f"[ERRO TTS I/O] Falha ao salvar arquivo: {str(e)}")
+            return False
+        return True
+
+    async def _fetch_audio(self, text, voice, rate):
+        """PERF-020: Lê o fluxo do motor com timeout de conexão (primeiro bloco) e de parada (entre blocos)"""
+        policy = self.retry_policy
+        stream = self.engine.stream(text, voice, rate).__aiter__()
+        chunks = []
+        try:
+            while True:
+                timeout, error = ((policy.stall_timeout, StallTimeout) if chunks
+                                  else (policy.connect_timeout, ConnectTimeout))
                 try:
-                    communicate = edge_tts.Communicate(text=clean_text, voice=voice, rate=rate)
-                    # FIX-005: Timeout de 30 segundos por arquivo
-                    await asyncio.wait_for(
-                        communicate.save(filepath),
-                        timeout=30.0
-                    )
-                    return True
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
                 except asyncio.TimeoutError:
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt  # 1s, 2s, 4s
-                        await asyncio.sleep(wait_time)
-                        continue
-                    self.log(f"[ERRO TTS] Timeout ao gerar áudio após {max_retries} tentativas")
+                    raise error(f"sem dados do serviço TTS por {timeout:g}s") from None
+                chunks.append(chunk)
+        finally:
+            aclose = getattr(stream, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+        audio = b"".join(chunks)
+        if not audio:
+            raise RuntimeError("nenhum áudio recebido")
+        return audio
+
+    async def synthesize_audio(self, text, voice, rate, limiter, max_retries=None, stats=None, failure=None):
+        """PERF-014: Bytes do áudio (cache ou síntese), sem passar pelo disco; None se falhou.
+
+        PERF-020: failure (dict opcional) recebe 'permanent' quando a linha falha:
+        False significa que vale repetir mais tarde (timeout, throttling, disjuntor aberto).
+        """
+        if not text or not text.strip(): 
+            return None
+        
+        # Limpeza para TTS
+        clean_text = text.replace("\n", " ").strip()
+
+        # PERF-001: Linhas inalteradas custam apenas uma leitura local
+        cache_key = None
+        if self.cache is not None:
+            cache_key = AudioCache.make_key(clean_text, self.engine.cache_namespace + voice, rate)
+            audio = self._cache_read(cache_key, stats)
+            if audio is not None:
+                if self.metrics is not None:
+                    self.metrics.bytes_from_cache += len(audio)
+                return audio
+
+        policy = self.retry_policy
+        max_attempts = max_retries or policy.max_attempts
+        if failure is None:
+            failure = {}
+        if policy.tripped:
+            # Serviço fora do ar: a linha fica para a passada final sem nova requisição
+            failure['permanent'] = False
+            return None
+
+        policy.on_request()
+        delay = 0.0
+        for attempt in range(max_attempts):
+            try:
+                # PERF-004: O limite cobre só a tentativa; durante o backoff a vaga
+                # fica livre para a próxima linha da fila
+                async with limiter:
+                    started = time.monotonic()
+                    audio = await self._fetch_audio(clean_text, voice, rate)
+                    latency = time.monotonic() - started
+                    size = max(1.0, len(clean_text) / LATENCY_REFERENCE_CHARS)
+                    limiter.record_success(latency / size, weight=size)
+                policy.record_success()
+                if self.metrics is not None:
+                    self.metrics.record_request(latency, len(audio), len(clean_text))
+                if cache_key is not None:
+                    self._cache_store(cache_key, audio)
+                return audio
+            except Exception as e:
+                error_type = type(e).__name__
+                transient = policy.is_transient(e)
+                if transient:
+                    # Só falhas do serviço indicam sobrecarga; pedidos inválidos não mexem no limite
+                    limiter.record_error("timeout" if isinstance(e, asyncio.TimeoutError) else error_type)
+                retry = transient and attempt < max_attempts - 1 and policy.try_retry()
+                if self.metrics is not None:
+                    self.metrics.record_error(error_type, retried=retry)
+                if retry:
+                    # PERF-020: Jitter decorrelacionado; as vagas que falharam juntas voltam espalhadas
+                    delay = policy.backoff(delay)
+                    await asyncio.sleep(delay)
+                    continue
+                failure['permanent'] = not transient
+                kind = "" if transient else " (permanente)"
+                self.log(f"[ERRO TTS] {error_type}{kind} após {attempt + 1} tentativa(s): {str(e)}")
+                if transient and policy.record_failure():
+                    self.log(f"[ERRO TTS] {policy.consecutive_failures} linhas seguidas sem áudio: serviço "
+                             f"indisponível, as linhas restantes ficam para a passada final")
+                return None
+
+    def _audio_filename(self, text, voice, rate, processed=True):
+        """Nome derivado do conteúdo: mesmo (texto, voz, velocidade) -> mesmo arquivo de mídia"""
+        clean_text = text.replace("\n", " ").strip()
+        key = AudioCache.make_key(clean_text, self.engine.cache_namespace + voice, rate)
+        if processed and self.postprocess is not None:
+            # O perfil de recodificação também define o conteúdo do arquivo
+            key = AudioCache.make_key(key, self.postprocess.signature, "")
+            return f"audio_{key[:24]}.{self.postprocess.extension}"
+        return f"audio_{key[:24]}.{self.engine.extension}"
+
+    async def _postprocess(self, audio, stats):
+        """PERF-015: Recodifica o áudio; None se o ffmpeg falhar"""
+        try:
+            processed = await self.postprocess.process(audio)
+        except (OSError, RuntimeError) as e:
+            stats['post_failed'] += 1
+            self.log(f"[AVISO] Pós-processamento: {str(e)}")
+            return None
+        stats['post_bytes_in'] += len(audio)
+        stats['post_bytes_out'] += len(processed)
+        return processed
+
+    def _log_postprocess(self, stats):
+        if self.postprocess is None or not (stats['post_bytes_in'] or stats['post_failed']):
+            return
+        before, after = stats['post_bytes_in'], stats['post_bytes_out']
+        saved = before - after
+        ratio = saved / before * 100 if before else 0.0
+        self.log(f"--- Pós-processamento ({self.postprocess.signature}): {before / 1_000_000:.2f} MB → "
+                 f"{after / 1_000_000:.2f} MB, {saved / 1_000_000:.2f} MB economizados ({ratio:.0f}%), "
+                 f"{stats['post_failed']} falhas ---")
+
+    async def _get_shared_audio(self, text, voice, rate, limiter, audio_jobs, package, stats, previous=None,
+                                build_job=None, failures=None, count_dedup=True):
+        """PERF-002: Sintetiza cada (texto, voz, velocidade) uma única vez por build.
+        Cada áudio novo vai para o pacote assim que fica pronto e, com build_job,
+        também para o diretório do job.
+        Retorna o nome do arquivo de mídia, ou None se a síntese falhou; nesse caso
+        failures (dict opcional) recebe {arquivo: falha permanente?}.
+        count_dedup=False na passada final: a linha já entrou na contagem da primeira."""
+        audio_filename = self._audio_filename(text, voice, rate)
+        job = audio_jobs.get(audio_filename)
+        if job is None:
+
+            async def synthesize():
+                # PERF-009: Áudio inalterado desde o último build sai do pacote anterior
+                audio = previous.read(audio_filename) if previous is not None else None
+                if audio is not None:
+                    stats['reused'] += 1
+                # PERF-019: ...ou do job interrompido
+                elif build_job is not None and build_job.has_media(audio_filename):
+                    audio = build_job.read(audio_filename)
+                    if audio is not None:
+                        stats['resumed'] += 1
+                if audio is None:
+                    filename = audio_filename
+                    failure = {}
+                    audio = await self.synthesize_audio(text, voice, rate, limiter, stats=stats, failure=failure)
+                    if audio is None and failures is not None:
+                        failures[audio_filename] = failure.get('permanent', True)
+                    if audio is not None and self.postprocess is not None:
+                        processed = await self._postprocess(audio, stats)
+                        if processed is None:
+                            # O original segue com o nome de áudio sem perfil
+                            filename = self._audio_filename(text, voice, rate, processed=False)
+                        else:
+                            audio = processed
+                    if audio is None:
+                        return None
+                    if build_job is not None:
+                        try:
+                            build_job.store(filename, audio)
+                        except (IOError, OSError) as e:
+                            # Sem o job o build continua; só deixa de ser retomável neste áudio
+                            self.log(f"[AVISO] Falha ao gravar áudio do job: {str(e)}")
+                    package.add_media_data(filename, audio)
+                    return filename
+                package.add_media_data(audio_filename, audio)
+                return audio_filename
+
+            job = asyncio.ensure_future(synthesize())
+            audio_jobs[audio_filename] = job
+        elif count_dedup:
+            stats['deduplicated'] += 1
+        return await job
+
+    async def _final_pass(self, deferred, failures, audio_jobs, process_row, package, deck, record_manifest,
+                          metrics):
+        """PERF-020: Repete as linhas com falha transitória, com orçamento renovado e disjuntor fechado.
+        Retorna False se o serviço continuar fora do ar (o build para; o job fica para retomar)."""
+        policy = self.retry_policy
+        metrics.enter_phase('final_pass')
+        self.log(f"--- Passada final: {len(deferred)} linhas com falha transitória, "
+                 f"repetindo em {policy.final_pass_delay:g}s ---")
+        await asyncio.sleep(policy.final_pass_delay)
+        policy.reset()
+        # As tarefas de síntese que falharam saem do mapa para serem refeitas
+        for filename in [filename for filename, permanent in failures.items() if not permanent]:
+            audio_jobs.pop(filename, None)
+            del failures[filename]
+
+        async def retry_row(item):
+            key, (idx, row) = item
+            note, key, audio_filename = await process_row(idx, row, key, final=True)
+            package.add_note(note, deck.deck_id, reserved=key)
+            record_manifest(note, key, audio_filename)
+
+        await run_worker_pool(deferred.items(), retry_row, self.limiter.maximum * 2, metrics)
+        if policy.tripped:
+            self.log("[ERRO] Serviço TTS continua indisponível; build interrompido. "
+                     "Gere novamente mais tarde para retomar.")
+            return False
+        return True
+
+    def _log_dedup(self, stats, audio_jobs, variants=1):
+        """PERF-025: Com variantes cada linha pede um áudio por (voz, velocidade);
+        renderizações e linhas aparecem separadas"""
+        total_refs = len(audio_jobs) + stats['deduplicated']
+        if not total_refs:
+            return
+        ratio = stats['deduplicated'] / total_refs * 100
+        if variants > 1:
+            refs = f"{total_refs} renderizações ({total_refs // variants} linhas)"
+        else:
+            refs = f"{total_refs} linhas"
+        self.log(f"--- Deduplicação: {len(audio_jobs)} áudios únicos para {refs} ({ratio:.1f}% sem nova síntese) ---")
+
+    def _check_disk_space(self, required_bytes, directory='.'):
+        """FIX-017: Verificar espaço em disco antes de processar.
+        PERF-023: required_bytes vem da estimativa da pré-verificação (com 50% de margem)"""
+        try:
+            free_space = shutil.disk_usage(directory).free
+            required_space = required_bytes * 1.5  # 50% de margem de segurança
+            
+            if free_space < required_space:
+                self.log(f"[ERRO] Espaço em disco insuficiente!")
+                self.log(f"  Necessário: {required_space / 1_000_000:.1f} MB")
+                self.log(f"  Disponível: {free_space / 1_000_000:.1f} MB")
+                return False
+            else:
+                self.log(f"✓ Espaço em disco: {free_space / 1_000_000:.1f} MB disponível")
+        except Exception as e:
+            self.log(f"[AVISO] Não foi possível verificar espaço em disco: {str(e)}")
+            # Continua mesmo assim, mas avisa
+        return True
+
+    def _preflight(self, text, renders, previous, build_job):
+        """PERF-023: Pré-verificação sobre a coluna de áudio inteira, sem nenhuma requisição.
+
+        text é o TextColumnStats da coluna, calculado na varredura do scan().
+        Acusa linhas vazias, scripts longos demais (acima de PREFLIGHT_LONG_CHARS
+        ou de PREFLIGHT_OUTLIER_FACTOR vezes a mediana), caracteres de controle e
+        scripts sem nada pronunciável. Estima caracteres, duração e tamanho do
+        áudio de cada (voz, velocidade) em renders; o que já está no cache, no
+        pacote anterior ou no job não conta para o ETA, calculado com a vazão
+        histórica do motor. Com mais textos únicos que a amostra, o que falta
+        sintetizar é a fração da amostra aplicada ao total.
+        """
+        unique = text.unique
+        sample = text.sample
+        scale = len(unique) / len(sample) if sample else 0.0
+        median = _percentile([length for length in text.lengths if length], 50)
+        long_chars = min(PREFLIGHT_LONG_CHARS, max(PREFLIGHT_MIN_OUTLIER_CHARS, median * PREFLIGHT_OUTLIER_FACTOR))
+        issues = dict(text.issues, long=text.longer_than(long_chars))
+
+        totals = {'chars': 0, 'seconds': 0.0, 'bytes': 0}
+        pending = {'scripts': 0, 'chars': 0, 'bytes': 0}
+
+        def estimate(chars, chars_per_second):
+            seconds = chars / chars_per_second
+            if self.postprocess is not None:
+                return seconds, int(seconds * self.postprocess.bytes_per_second)
+            return seconds, self.engine.estimate_bytes(chars, seconds)
+
+        for voice, rate in renders:
+            try:
+                speed = 1 + int(rate.rstrip('%')) / 100
+            except ValueError:
+                speed = 1.0
+            chars_per_second = SPEECH_CHARS_PER_SECOND * speed
+            for chars in unique.values():
+                seconds, size = estimate(chars, chars_per_second)
+                totals['chars'] += chars
+                totals['seconds'] += seconds
+                totals['bytes'] += size
+            for clean in sample:
+                filename = self._audio_filename(clean, voice, rate)
+                if previous.has(filename) or (build_job is not None and build_job.has_media(filename)):
+                    continue
+                if self.cache is not None and \
+                        AudioCache.make_key(clean, self.engine.cache_namespace + voice, rate) in self.cache:
+                    continue
+                pending['scripts'] += 1
+                pending['chars'] += len(clean)
+                pending['bytes'] += estimate(len(clean), chars_per_second)[1]
+        pending = {name: round(value * scale) for name, value in pending.items()}
+
+        throughput = historical_throughput(self.engine.name)
+        package_bytes = totals['bytes'] + text.rows * PREFLIGHT_NOTE_BYTES
+        # O .part do pacote, mais as cópias do áudio novo no job e no cache
+        disk_bytes = package_bytes + pending['bytes'] * ((build_job is not None) + (self.cache is not None))
+        return {
+            'rows': text.rows,
+            'unique_scripts': len(unique),
+            'variants': len(renders),
+            'median_chars': median,
+            'long_chars': long_chars,
+            # Só as primeiras linhas de cada problema: o relatório vai para o metrics.json
+            'issues': {name: {'count': count, 'lines': lines} for name, (count, lines) in issues.items()},
+            'chars': totals['chars'],
+            'audio_seconds': round(totals['seconds'], 1),
+            'to_synthesize': pending,
+            'package_bytes': package_bytes,
+            'disk_bytes': disk_bytes,
+            'throughput_chars_s': round(throughput, 1) if throughput else None,
+            'eta_s': round(pending['chars'] / throughput, 1) if throughput else None,
+        }
+
+    def _report_preflight(self, report, audio_column):
+        """Registra a pré-verificação; com preflight='strict', problemas nos dados interrompem o build"""
+        pending = report['to_synthesize']
+        variants = f" × {report['variants']} variantes" if report['variants'] > 1 else ""
+        self.log(f"--- Pré-verificação: {report['rows']} linhas, {report['unique_scripts']} scripts únicos{variants}, "
+                 f"{report['chars']} caracteres, ~{_duration(report['audio_seconds'])} de áudio, "
+                 f"pacote ~{report['package_bytes'] / 1_000_000:.1f} MB ---")
+        if report['eta_s'] is not None:
+            eta = f"ETA ~{_duration(report['eta_s'])} (histórico: {report['throughput_chars_s']:.0f} caracteres/s)"
+        else:
+            eta = "sem histórico de vazão para o ETA"
+        self.log(f"--- A sintetizar: {pending['scripts']} scripts, {pending['chars']} caracteres; {eta} ---")
+
+        strict = self.preflight == 'strict'
+        issues = report['issues']
+        messages = (
+            ('empty', True, f"sem texto na coluna '{audio_column}' (ficam sem áudio)"),
+            ('bad_chars', True, "com caracteres de controle ou U+FFFD (encoding errado?)"),
+            ('unspeakable', True, "sem letras nem números (o TTS não devolve áudio)"),
+            ('long', True, f"longas demais (> {report['long_chars']:.0f} caracteres; mediana {report['median_chars']})"),
+            ('markup', False, "com marcação HTML, que será lida em voz alta"),
+        )
+        failed = False
+        for name, blocking, message in messages:
+            count, lines = issues[name]['count'], issues[name]['lines']
+            if not count:
+                continue
+            level = "[ERRO]" if strict and blocking else "[AVISO]"
+            failed = failed or (strict and blocking)
+            more = f" e mais {count - len(lines)}" if count > len(lines) else ""
+            self.log(f"{level} Pré-verificação: {count} linhas {message}: "
+                     f"linhas {', '.join(map(str, lines))}{more}")
+        if failed:
+            self.log("[ERRO] Pré-verificação estrita falhou; nenhuma requisição ao TTS foi feita")
+            return False
+        return True
+
+    def _report_key_collisions(self, key_column, duplicates, empty_keys):
+        """Acusa colisões na coluna-chave. Com strict_keys, interrompe o build."""
+        if not duplicates and not empty_keys:
+            return True
+        level = "[ERRO]" if self.strict_keys else "[AVISO]"
+        if duplicates:
+            worst = sorted(duplicates.items(), key=lambda item: -item[1])[:10]
+            listed = ", ".join(f"'{key}' ×{count}" for key, count in worst)
+            more = f" e mais {len(duplicates) - len(worst)}" if len(duplicates) > len(worst) else ""
+            self.log(f"{level} Coluna-chave '{key_column}': {len(duplicates)} valores repetidos ({listed}{more})")
+        if empty_keys:
+            self.log(f"{level} Coluna-chave '{key_column}': {empty_keys} linhas sem valor")
+        if self.strict_keys:
+            return False
+        self.log("  Repetições recebem o sufixo #n e linhas sem chave usam o número da linha; "
+                 "o GUID dessas notas depende da ordem no CSV.")
+        return True
+
+    async def _build_deck(self, csv_path, deck, output_pkg, voice_code, speed,
+                          audio_column, make_note, label_column, validate_headers, key_column, mapping=None,
+                          columns=None, variants=()):
+        """Pipeline comum aos dois modos: leitura em streaming, síntese e empacotamento.
+
+        make_note(row, audio_field, *variant_fields) monta a genanki.Note da linha e
+        validate_headers(fieldnames) registra o erro e devolve False se o CSV não servir.
+        O GUID de cada nota deriva do deck e do valor de key_column.
+        mapping (None no modo legado) entra na identidade do job retomável.
+        columns: colunas lidas por make_note (None = todas); as demais nem saem do arquivo.
+        variants: pares (voz, velocidade) extras; cada um vira mais um áudio por
+        linha, na mesma leitura, no mesmo pool e no mesmo pacote.
+        PERF-017: As métricas são gravadas ao fim de todo build, inclusive dos que
+        falharam ou foram interrompidos, com 'status' ok, failed, aborted ou preflight.
+        """
+        metrics = self.metrics = BuildMetrics()
+        status = 'aborted'
+        try:
+            ok = await self._run_build_deck(csv_path, deck, output_pkg, voice_code, speed, audio_column, make_note,
+                                            label_column, validate_headers, key_column, mapping, columns, variants)
+            status = ('preflight' if self.preflight == 'only' else 'ok') if ok else 'failed'
+            return ok
+        finally:
+            metrics.enter_phase(None)
+            self._write_build_metrics(output_pkg, metrics, status)
+
+    def _write_build_metrics(self, output_pkg, metrics, status):
+        """PERF-017: Relatório de métricas ao lado do .apkg"""
+        report = metrics.report({
+            'deck': os.path.basename(output_pkg),
+            'status': status,
+            **metrics.meta,
+            'package': metrics.package,
+            'preflight': metrics.preflight,
+        }, metrics.stats, self.limiter)
+        try:
+            write_metrics(output_pkg, report, self.openmetrics)
+            # PERF-023: Vazão deste build para o ETA dos próximos
+            if status == 'ok' and metrics.chars_synthesized >= THROUGHPUT_MIN_CHARS and metrics.phases.get('synthesis'):
+                record_throughput(self.engine.name, metrics.chars_synthesized, metrics.phases['synthesis'])
+        except (IOError, OSError) as e:
+            self.log(f"[AVISO] Falha ao gravar métricas: {str(e)}")
+
+    async def _run_build_deck(self, csv_path, deck, output_pkg, voice_code, speed, audio_column, make_note,
+                              label_column, validate_headers, key_column, mapping, columns, variants):
+        """Corpo do _build_deck; estatísticas e relatórios vão para self.metrics"""
+        import genanki
+        # PERF-009: Manifesto e pacote do build anterior (vazio se não houver)
+        with PreviousBuild.load(output_pkg, self.log) as previous, tempfile.TemporaryDirectory() as temp_dir, \
+                contextlib.ExitStack() as stack:
+            audio_jobs = {}  # PERF-002: {arquivo de áudio: tarefa de síntese}
+            renders = [(voice_code, speed), *variants]  # PERF-025: áudios de cada linha
+            limiter = self.limiter
+            metrics = self.metrics
+            metrics.meta = {
+                'csv': os.path.basename(csv_path),
+                'voice': voice_code,
+                'rate': speed,
+                'engine': self.engine.name,
+            }
+            if variants:
+                metrics.meta['variants'] = [list(variant) for variant in variants]
+            metrics.enter_phase('csv_parse')
+
+            try:
+                # PERF-021: Encoding, dialeto e contagem vêm da inspeção em cache (a mesma da GUI)
+                schema = inspect_csv(csv_path)
+                if not validate_headers(schema.fieldnames):
+                    return False
+                # PERF-003: Linhas lidas sob demanda, nunca o CSV inteiro em memória
+                # PERF-022: ...e só com as colunas que viram campos, áudio, chave ou rótulo
+                needed = list(schema.fieldnames if columns is None else columns)
+                needed += [name for name in (audio_column, key_column, label_column) if name]
+                repeated = sorted({name for name in needed if schema.fieldnames.count(name) > 1})
+                if repeated:
+                    self.log(f"[AVISO] Colunas repetidas no cabeçalho: {', '.join(repeated)} (vale a primeira)")
+                reader = stack.enter_context(contextlib.closing(schema.rows(needed)))
+
+                # PERF-023: A mesma passada prepara a pré-verificação e a impressão digital do job
+                total_rows, duplicate_keys, empty_keys = schema.scan(key_column, audio_column)
+                if not total_rows:
+                    self.log(f"[ERRO] CSV está vazio!")
                     return False
-                except (OSError, IOError) as e:
-                    # FIX-004: Exceções específicas para I/O
-                    self.log(f"[ERRO TTS I/O] Falha ao salvar arquivo: {str(e)}")
+                if not self._report_key_collisions(key_column, duplicate_keys, empty_keys):
                     return False
-                except Exception as e:
-                    # FIX-004: Capturar outros erros específicos se possível
-                    error_type = type(e).__name__
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt
-                        await asyncio.sleep(wait_time)
-                        continue
-                    self.log(f"[ERRO TTS] {error_type}: {str(e)}")
+                
+                # PERF-019: Job durável; um build interrompido da mesma entrada é retomado
+                build_job = None
+                if self.durable_jobs and self.preflight != 'only':
+                    build_job = stack.enter_context(contextlib.closing(BuildJob(output_pkg, json.loads(json.dumps({
+                        'version': 1,
+                        'csv': os.path.abspath(csv_path),
+                        'fingerprint': schema.fingerprint,
+                        'mapping': mapping,
+                        'key_column': key_column,
+                        'voice': voice_code,
+                        'rate': speed,
+                        'engine': self.engine.name,
+                        'postprocess': self.postprocess.signature if self.postprocess else None,
+                        # Só com variantes, para que jobs de um build simples continuem compatíveis
+                        **({'variants': variants} if variants else {}),
+                    })))))
+                    resumed = build_job.open(self.log)
+                    if resumed:
+                        self.log(f"--- Retomando build interrompido: {resumed} de {total_rows} linhas já concluídas ---")
+
+                # PERF-023: Dados ruins, estimativas e espaço em disco antes da primeira requisição
+                metrics.enter_phase('preflight')
+                preflight = metrics.preflight = self._preflight(schema.text_stats(audio_column), renders, previous,
+                                                                build_job)
+                if not self._report_preflight(preflight, audio_column):
                     return False
+                metrics.enter_phase('disk_check')
+                if not self._check_disk_space(preflight['disk_bytes'], os.path.dirname(os.path.abspath(output_pkg))):
+                    return False
+                if self.preflight == 'only':
+                    self.log("--- Pré-verificação concluída; nenhuma requisição ao TTS foi feita ---")
+                    return True
+                
+                # PERF-013: O pacote é escrito em <saída>.part enquanto as linhas saem
+                package = stack.enter_context(StreamingPackageWriter(output_pkg, temp_dir, self.audio_memory))
+
+                # FIX-006: Estatísticas de sucessos/falhas
+                stats = {'success': 0, 'failed': 0, 'skipped': 0, 'cache_hits': 0, 'cache_misses': 0, 'deduplicated': 0, 'reused': 0, 'resumed': 0,
+                         'post_bytes_in': 0, 'post_bytes_out': 0, 'post_failed': 0, 'deferred': 0, 'recovered': 0}
+                metrics.stats = stats
+                manifest_rows = {}  # PERF-009: {chave da linha: guid, áudio, hash dos campos}
+                diff = {'added': 0, 'changed': 0, 'unchanged': 0}
+                failures = {}  # PERF-020: {arquivo de áudio: falha permanente?}
+                deferred = {}  # PERF-020: {chave: (idx, linha)} das falhas transitórias
+
+                def keyed_rows():
+                    # As mesmas chaves que scan() conferiu antes do build
+                    keys = RowKeys()
+                    for idx, row in enumerate(reader):
+                        yield idx, row, keys.assign((row.get(key_column) or '').strip(), idx + 1)
+
+                async def process_row(idx, row, key, final=False):
+                    # Fonte do áudio = coluna escolhida pelo usuário
+                    script_text = (row.get(audio_column) or '').strip()
+                    if not script_text: 
+                        stats['skipped'] += 1
+                        return None
+
+                    # PERF-002: Linhas com o mesmo script compartilham um único arquivo
+                    # PERF-025: As variantes da linha entram juntas no pool
+                    filenames = await asyncio.gather(*(
+                        self._get_shared_audio(script_text, voice, rate, limiter, audio_jobs, package, stats,
+                                               previous, build_job, failures, count_dedup=not final)
+                        for voice, rate in renders
+                    ))
+                    audio_filename = filenames[0]
+
+                    if all(filenames):
+                        stats['success'] += 1
+                        stats['recovered'] += final
+                        if build_job is not None:
+                            for filename in filenames:
+                                build_job.mark_done(key, filename)
+                    elif not final and any(failures.get(self._audio_filename(script_text, voice, rate)) is False
+                                           for (voice, rate), filename in zip(renders, filenames) if not filename):
+                        # PERF-020: Falha transitória: a nota sai na passada final, no mesmo lugar do deck
+                        stats['deferred'] += 1
+                        deferred[key] = (idx, row)
+                    else:
+                        stats['failed'] += 1
+
+                    note = make_note(row, *(f"[sound:{filename}]" if filename else "" for filename in filenames))
+                    # GUID estável: reimportar o deck atualiza a nota em vez de duplicá-la.
+                    # PERF-009: o GUID do build anterior tem prioridade (continuidade)
+                    if key in previous.rows:
+                        note.guid = previous.rows[key]['guid']
+                    else:
+                        note.guid = genanki.guid_for(deck.deck_id, key)
+                    return note, key, audio_filename or ''
+
+                def record_manifest(note, key, audio_filename):
+                    entry = {'guid': note.guid, 'audio': audio_filename, 'fields': fields_hash(note.fields)}
+                    old = previous.rows.get(key)
+                    if old is None:
+                        diff['added'] += 1
+                    elif old.get('audio') == entry['audio'] and old.get('fields') == entry['fields']:
+                        diff['unchanged'] += 1
+                    else:
+                        diff['changed'] += 1
+                    manifest_rows[key] = entry
+
+                cursor = {'done': 0}
+
+                # PERF-003: Cada nota recebe, antes da síntese, ids reservados na ordem do
+                # CSV e sai assim que fica pronta: uma linha lenta não segura as de trás
+                # e as reservas pendentes não passam da fila do pool mais os workers
+                def reserved_rows(items):
+                    for item in items:
+                        idx, row, key = item
+                        if (row.get(audio_column) or '').strip():
+                            note = make_note(row, *("[sound:]" for _ in renders))
+                            package.reserve(key, 1 + len(note.cards))
+                        yield item
+
+                # PERF-024: Mais longos primeiro, para que os áudios demorados não fiquem
+                # para o fim com poucas vagas ocupadas. A lista inteira fica em memória (só
+                # as colunas usadas); com as reservas a ordem do deck não muda.
+                work = reserved_rows(keyed_rows())
+                if self.schedule == 'longest':
+                    work = sorted(work, key=lambda item: -len((item[1].get(audio_column) or '').strip()))
+
+                async def handle_row(item):
+                    idx, row, key = item
+                    result = await process_row(idx, row, key)
+                    # Linhas adiadas (PERF-020) saem na passada final, com a mesma reserva
+                    if result is not None and result[1] not in deferred:
+                        package.add_note(result[0], deck.deck_id, reserved=key)
+                        record_manifest(*result)
+
+                    # FIX-011: Atualizar progresso sempre, log a cada 10
+                    cursor['done'] += 1
+                    self.progress(cursor['done'], total_rows)
+                    if idx % 10 == 0:
+                        self.log(f"[{idx+1}] OK: {row.get(label_column, 'N/A') if label_column else 'N/A'}")
+                    if idx % 100 == 0 and idx:
+                        self.log(f"[CONCORRÊNCIA] {limiter.summary()}")
+
+                # PERF-003: Linhas lidas sob demanda direto do reader
+                # PERF-004: Mais workers que vagas, para que linhas em backoff, em cache
+                # ou aguardando um áudio deduplicado não deixem vagas ociosas
+                metrics.enter_phase('synthesis')
+                sampler = asyncio.ensure_future(metrics.sample(limiter))
+                try:
+                    await run_worker_pool(work, handle_row, limiter.maximum * 2, metrics)
+                    if deferred and not await self._final_pass(deferred, failures, audio_jobs, process_row,
+                                                               package, deck, record_manifest, metrics):
+                        return False
+                finally:
+                    sampler.cancel()
+                
+                # FIX-006: Reportar estatísticas
+                self.log(f"--- Estatísticas: {stats['success']} sucessos, {stats['failed']} falhas, {stats['skipped']} ignorados, cache: {stats['cache_hits']} acertos / {stats['cache_misses']} faltas ---")
+                self._log_dedup(stats, audio_jobs, len(renders))
+                self._log_postprocess(stats)
+                if stats['deferred']:
+                    self.log(f"--- Passada final: {stats['recovered']} de {stats['deferred']} linhas recuperadas ---")
+                if stats['resumed']:
+                    self.log(f"--- Job retomado: {stats['resumed']} áudios recuperados de {build_job.dir} ---")
+                if package.spilled:
+                    self.log(f"--- Mídia: {package.in_memory} áudios direto da memória, "
+                             f"{package.spilled} via disco (teto de memória atingido ou desativado) ---")
+                self.log(f"--- Concorrência: {limiter.summary()}, {limiter.errors} erros de rede ---")
+                if previous.found:
+                    removed = sum(1 for key in previous.rows if key not in manifest_rows)
+                    self.log(f"--- Incremental: {diff['added']} novas, {diff['changed']} alteradas, "
+                             f"{diff['unchanged']} inalteradas, {removed} removidas; "
+                             f"{stats['reused']} áudios reaproveitados do pacote anterior ---")
 
-    async def _run_legacy_pipeline(self, csv_path, voice_code, speed, MODEL_ID, DECK_ID, output_pkg):
-        """Modo legado - 7 colunas fixas"""
-        base_name = os.path.splitext(os.path.basename(csv_path))[0]
-        
-        # FIX-014: Sanitizar nome do arquivo
-        safe_name = re.sub(r'[<>:"/\\|?*]', '_', base_name)
-        safe_name = safe_name[:200]  # Limitar tamanho
-        deck = genanki.Deck(DECK_ID, safe_name)
+            except (IOError, OSError) as e:
+                # FIX-004: Exceções específicas para I/O
+                self.log(f"[ERRO I/O] Erro ao ler CSV: {type(e).__name__}: {str(e)}")
+                return False
+            except csv.Error as e:
+                # FIX-004: Exceções específicas para CSV
+                self.log(f"[ERRO CSV] Erro ao processar CSV: {str(e)}")
+                return False
+            except Exception as e:
+                # FIX-004: Outros erros
+                self.log(f"[ERRO] Erro inesperado ao processar CSV: {type(e).__name__}: {str(e)}")
+                return False
+
+            # O pacote anterior precisa estar fechado antes de ser sobrescrito
+            previous.close()
+            self.log(f"--- Empacotando... ---")
+            metrics.enter_phase('packaging')
+            try:
+                await package.finish(deck)
+            except (IOError, OSError) as e:
+                # FIX-004: Exceções específicas para escrita
+                self.log(f"[ERRO I/O] Falha ao escrever arquivo: {type(e).__name__}: {str(e)}")
+                return False
+            except Exception as e:
+                self.log(f"[ERRO] Falha ao empacotar deck: {type(e).__name__}: {str(e)}")
+                return False
+            
+            try:
+                write_manifest(output_pkg, metrics.meta, manifest_rows)
+            except (IOError, OSError) as e:
+                # Sem manifesto o próximo build só deixa de ser incremental
+                self.log(f"[AVISO] Falha ao gravar manifesto: {str(e)}")
+            metrics.package = {'bytes': os.path.getsize(output_pkg), 'media_files': package.media_count}
+
+            if build_job is not None:
+                build_job.discard()
+            self.progress(total_rows, total_rows)
+            self.log(f"--- SUCESSO: {output_pkg} ---")
+            return True
+
+    async def _run_legacy_pipeline(self, csv_path, voice_code, speed, MODEL_ID, DECK_ID, output_pkg, deck_name,
+                                   variants=()):
+        """Modo legado - 7 colunas fixas (+ um campo de áudio por variante)"""
+        import genanki
+        deck = genanki.Deck(DECK_ID, deck_name)
         
         # FIX-008: Validar permissões de escrita
         output_dir = os.path.dirname(os.path.abspath(output_pkg)) or '.'
@@ -97,6 +2507,7 @@ class AnkiBuilderBackend:
                 {'name': 'Image Query'},
                 {'name': 'Audio File'}, # Gerado
                 {'name': 'Image File'}, # Reservado (Vazio por enquanto)
+                *({'name': variant_field_name(*variant)} for variant in variants),
             ],
             templates=[{
                 'name': 'Card 1',
@@ -133,159 +2544,61 @@ class AnkiBuilderBackend:
             '''
         )
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            self.log(f"--- Iniciando (Modo Legado) ---")
-            
-            media_files = []
-            tasks = []
-            semaphore = asyncio.Semaphore(20)
-
-            try:
-                with open(csv_path, encoding='utf-8-sig') as f:
-                    sample = f.read(1024)
-                    sniffer = csv.Sniffer()
-                    try:
-                        dialect = sniffer.sniff(sample)
-                    except:
-                        dialect = 'excel'
-                    f.seek(0)
-                    
-                    reader = csv.DictReader(f, dialect=dialect)
-                    
-                    # VALIDAÇÃO DAS 7 COLUNAS
-                    required = {'Target Word', 'Audio Script', 'Cloze Sentence', 'IPA', 'Simple Definition', 'PT Translation', 'Image Query'}
-                    headers_set = set(reader.fieldnames)
-                    
-                    if not required.issubset(headers_set):
-                        missing = required - headers_set
-                        self.log(f"[FATAL] CSV Inválido!")
-                        self.log(f"Faltam as colunas: {missing}")
-                        return False
+        self.log(f"--- Iniciando (Modo Legado) ---")
 
-                    rows = list(reader)
-                    
-                    if not rows:
-                        self.log(f"[ERRO] CSV está vazio!")
-                        return False
-                    
-                    total_rows = len(rows)
-                    
-                    # FIX-017: Verificar espaço em disco antes de processar
-                    try:
-                        free_space = shutil.disk_usage('.').free
-                        # Estimar ~50KB por áudio + overhead
-                        estimated_size = total_rows * 60_000  # 60KB por item com margem
-                        required_space = estimated_size * 1.5  # 50% de margem de segurança
-                        
-                        if free_space < required_space:
-                            self.log(f"[ERRO] Espaço em disco insuficiente!")
-                            self.log(f"  Necessário: {required_space / 1_000_000:.1f} MB")
-                            self.log(f"  Disponível: {free_space / 1_000_000:.1f} MB")
-                            return False
-                        else:
-                            self.log(f"✓ Espaço em disco: {free_space / 1_000_000:.1f} MB disponível")
-                    except Exception as e:
-                        self.log(f"[AVISO] Não foi possível verificar espaço em disco: {str(e)}")
-                        # Continua mesmo assim, mas avisa
-                    
-                    # FIX-006: Estatísticas de sucessos/falhas
-                    stats = {'success': 0, 'failed': 0, 'skipped': 0}
-
-                    async def process_row(idx, row):
-                        script_text = row['Audio Script'].strip()
-                        if not script_text: 
-                            stats['skipped'] += 1
-                            return
-
-                        # FIX-010: Incluir índice no hash para garantir unicidade
-                        file_hash = zlib.crc32(f"{idx}{script_text}".encode())
-                        audio_filename = f"audio_{idx}_{file_hash}.mp3"
-                        audio_path = os.path.join(temp_dir, audio_filename)
-
-                        success = await self.generate_audio(script_text, audio_path, voice_code, speed, semaphore)
-                        
-                        audio_field = ""
-                        if success:
-                            media_files.append(audio_path)
-                            audio_field = f"[sound:{audio_filename}]"
-                            stats['success'] += 1
-                        else:
-                            stats['failed'] += 1
-
-                        note = genanki.Note(
-                            model=model,
-                            fields=[
-                                row['Target Word'],
-                                row['Audio Script'],
-                                row['Cloze Sentence'],
-                                row['IPA'],
-                                row['Simple Definition'],
-                                row['PT Translation'],
-                                row['Image Query'],
-                                audio_field,
-                                "" # Image File (Vazio)
-                            ]
-                        )
-                        deck.add_note(note)
-                        
-                        # FIX-011: Atualizar progresso sempre, log a cada 10
-                        self.progress(idx + 1, total_rows)
-                        if idx % 10 == 0:
-                            self.log(f"[{idx+1}] OK: {row['Target Word']}")
-
-                    # FIX-001: Processamento em lote para evitar OOM
-                    BATCH_SIZE = 100
-                    for i, row in enumerate(rows):
-                        tasks.append(process_row(i, row))
-                    
-                    # Processar em batches
-                    for batch_start in range(0, len(tasks), BATCH_SIZE):
-                        batch = tasks[batch_start:batch_start + BATCH_SIZE]
-                        await asyncio.gather(*batch)
-                        # Pequena pausa entre batches para liberar memória
-                        await asyncio.sleep(0.1)
-                    
-                    # FIX-006: Reportar estatísticas
-                    self.log(f"--- Estatísticas: {stats['success']} sucessos, {stats['failed']} falhas, {stats['skipped']} ignorados ---")
+        # VALIDAÇÃO DAS 7 COLUNAS
+        required = {'Target Word', 'Audio Script', 'Cloze Sentence', 'IPA', 'Simple Definition', 'PT Translation', 'Image Query'}
 
-            except (IOError, OSError) as e:
-                # FIX-004: Exceções específicas para I/O
-                self.log(f"[ERRO I/O] Erro ao ler CSV: {type(e).__name__}: {str(e)}")
-                return False
-            except csv.Error as e:
-                # FIX-004: Exceções específicas para CSV
-                self.log(f"[ERRO CSV] Erro ao processar CSV: {str(e)}")
-                return False
-            except Exception as e:
-                # FIX-004: Outros erros
-                self.log(f"[ERRO] Erro inesperado ao processar CSV: {type(e).__name__}: {str(e)}")
-                return False
-
-            self.log(f"--- Empacotando... ---")
-            try:
-                pkg = genanki.Package(deck)
-                pkg.media_files = media_files
-                pkg.write_to_file(output_pkg)
-            except (IOError, OSError) as e:
-                # FIX-004: Exceções específicas para escrita
-                self.log(f"[ERRO I/O] Falha ao escrever arquivo: {type(e).__name__}: {str(e)}")
+        def validate_headers(fieldnames):
+            headers_set = set(fieldnames)
+            if not required.issubset(headers_set):
+                missing = required - headers_set
+                self.log(f"[FATAL] CSV Inválido!")
+                self.log(f"Faltam as colunas: {missing}")
                 return False
-            except Exception as e:
-                self.log(f"[ERRO] Falha ao empacotar deck: {type(e).__name__}: {str(e)}")
-                return False
-            
-            self.progress(total_rows, total_rows)
-            self.log(f"--- SUCESSO: {output_pkg} ---")
             return True
 
-    async def run_pipeline(self, csv_path, voice_key, speed, column_mapping=None):
+        def make_note(row, audio_field, *variant_fields):
+            return genanki.Note(
+                model=model,
+                fields=[
+                    row['Target Word'],
+                    row['Audio Script'],
+                    row['Cloze Sentence'],
+                    row['IPA'],
+                    row['Simple Definition'],
+                    row['PT Translation'],
+                    row['Image Query'],
+                    audio_field,
+                    "", # Image File (Vazio)
+                    *variant_fields,
+                ]
+            )
+
+        return await self._build_deck(
+            csv_path, deck, output_pkg, voice_code, speed,
+            'Audio Script', make_note, 'Target Word', validate_headers, 'Target Word', columns=sorted(required),
+            variants=variants
+        )
+
+    async def run_pipeline(self, csv_path, voice_key, speed, column_mapping=None, output_pkg=None, variants=None,
+                           deck_name=None):
         """
         column_mapping: dict com {
             'audio_source': 'nome_coluna',
             'selected_columns': ['col1', 'col2', ...],
             'all_columns': ['todas', 'colunas']
         }
+        output_pkg: caminho do .apkg (padrão: <nome do csv>_Complete.apkg no diretório atual)
+        variants: pares (voice_key, speed) extras, ex.: [(voz, '-20%')]; cada um vira
+            um campo 'Audio File (<voz> <velocidade>)' no fim do modelo. 'Audio File'
+            continua com (voice_key, speed).
+        deck_name: nome do deck (padrão: o do CSV); define também o DECK_ID e, com
+            ele, os GUIDs das notas. O lote passa nomes únicos (batch_deck_names).
+        Retorna o caminho do .apkg (o padrão, se output_pkg não foi dado) ou False.
         """
+        # Import tardio: o CLI só paga o custo do genanki quando gera decks
+        import genanki
         try:
             # FIX-008: Validação completa de entrada
             # Validação de arquivo
@@ -293,31 +2606,35 @@ class AnkiBuilderBackend:
                 self.log(f"[ERRO] Arquivo não encontrado: {csv_path}")
                 return False
             
-            # Validação de voice_key
-            if voice_key not in VOICES:
-                self.log(f"[ERRO] Voz inválida: {voice_key}")
-                return False
-            
-            # Validação de speed
-            if not speed or not speed.endswith('%'):
-                self.log(f"[ERRO] Velocidade inválida: {speed}. Deve terminar com '%'")
-                return False
-            try:
-                speed_value = int(speed[1:-1])  # Remove + ou - e %
-                if not (-50 <= speed_value <= 50):
-                    self.log(f"[ERRO] Velocidade fora do range válido (-50% a +50%): {speed}")
+            for voice, rate in [(voice_key, speed), *(variants or ())]:
+                # Validação de voice_key
+                if voice not in VOICES:
+                    self.log(f"[ERRO] Voz inválida: {voice}")
+                    return False
+
+                # Validação de speed
+                if not rate or not rate.endswith('%'):
+                    self.log(f"[ERRO] Velocidade inválida: {rate}. Deve terminar com '%'")
+                    return False
+                try:
+                    speed_value = int(rate[1:-1])  # Remove + ou - e %
+                    if not (-50 <= speed_value <= 50):
+                        self.log(f"[ERRO] Velocidade fora do range válido (-50% a +50%): {rate}")
+                        return False
+                except ValueError:
+                    self.log(f"[ERRO] Velocidade com formato inválido: {rate}")
                     return False
-            except ValueError:
-                self.log(f"[ERRO] Velocidade com formato inválido: {speed}")
-                return False
             
             voice_code = VOICES[voice_key]
-            base_name = os.path.splitext(os.path.basename(csv_path))[0]
-            
-            # FIX-014: Sanitizar nome do arquivo
-            safe_name = re.sub(r'[<>:"/\\|?*]', '_', base_name)
-            safe_name = safe_name[:200]  # Limitar tamanho (Windows tem limite de 260 chars)
-            output_pkg = f"{safe_name}_Complete.apkg"
+            # PERF-025: Variantes repetidas (ou iguais à principal) não geram outro campo
+            extra = []
+            for voice, rate in variants or ():
+                if (VOICES[voice], rate) != (voice_code, speed) and (VOICES[voice], rate) not in extra:
+                    extra.append((VOICES[voice], rate))
+            # FIX-014: Nome sanitizado
+            safe_name = deck_name_for(deck_name or os.path.splitext(os.path.basename(csv_path))[0])
+            if not output_pkg:
+                output_pkg = f"{safe_name}_Complete.apkg"
             
             # FIX-008: Validar permissões de escrita
             output_dir = os.path.dirname(os.path.abspath(output_pkg)) or '.'
@@ -328,15 +2645,24 @@ class AnkiBuilderBackend:
             # IDs Determinísticos
             MODEL_ID = zlib.crc32(f"Dynamic_Model_v1".encode('utf-8'))
             DECK_ID = zlib.crc32(f"Deck_{safe_name}".encode('utf-8'))
+            if extra:
+                # Outros campos = outro modelo; sem variantes o ID não muda
+                names = "|".join(variant_field_name(*variant) for variant in extra)
+                MODEL_ID = zlib.crc32(f"Dynamic_Model_v1|{names}".encode('utf-8'))
+                self.log(f"--- Variantes de áudio: {', '.join(f'{voice} {rate}' for voice, rate in extra)} ---")
 
             # Se não houver mapeamento, usar modo legado
             if column_mapping is None:
-                return await self._run_legacy_pipeline(csv_path, voice_code, speed, MODEL_ID, DECK_ID, output_pkg)
+                ok = await self._run_legacy_pipeline(csv_path, voice_code, speed, MODEL_ID, DECK_ID, output_pkg,
+                                                     safe_name, extra)
+                return output_pkg if ok else False
             
             # Modo flexível - usar mapeamento
             audio_source = column_mapping['audio_source']
             audio_target = column_mapping.get('audio_target', audio_source)  # Default: mesma coluna da fonte
             selected_columns = column_mapping['selected_columns']
+            # Coluna que identifica a nota (GUID estável); padrão: primeira coluna selecionada
+            key_column = column_mapping.get('key_column') or (selected_columns[0] if selected_columns else audio_source)
 
             # Criar modelo dinâmico: inserir áudio na posição da coluna target
             fields = []
@@ -355,6 +2681,8 @@ class AnkiBuilderBackend:
             if audio_field_index is None:
                 fields.append({'name': 'Audio File'})
                 audio_field_index = len(selected_columns)
+            # PERF-025: Um campo por variante, depois de todos os outros
+            fields += [{'name': variant_field_name(*variant)} for variant in extra]
             
             # Criar template dinâmico
             first_field = selected_columns[0] if selected_columns else 'Field1'
@@ -386,152 +2714,49 @@ class AnkiBuilderBackend:
 
             deck = genanki.Deck(DECK_ID, safe_name)
             
-            with tempfile.TemporaryDirectory() as temp_dir:
-                self.log(f"--- Iniciando: {safe_name} ---")
-                self.log(f"--- Colunas selecionadas: {', '.join(selected_columns)} ---")
-                self.log(f"--- Fonte de áudio: {audio_source} ---")
-                self.log(f"--- Áudio será inserido em: {audio_target} ---")
-                
-                media_files = []
-                tasks = []
-                semaphore = asyncio.Semaphore(20)
-
-                try:
-                    with open(csv_path, encoding='utf-8-sig') as f:
-                        sample = f.read(1024)
-                        sniffer = csv.Sniffer()
-                        try:
-                            dialect = sniffer.sniff(sample)
-                        except Exception:
-                            dialect = 'excel'
-                        f.seek(0)
-                        
-                        reader = csv.DictReader(f, dialect=dialect)
-                        rows = list(reader)
-                        
-                        if not rows:
-                            self.log(f"[ERRO] CSV está vazio!")
-                            return False
-                        
-                        # Verificar se a coluna de áudio existe
-                        if audio_source not in reader.fieldnames:
-                            self.log(f"[ERRO] Coluna '{audio_source}' não encontrada no CSV!")
-                            return False
-                        
-                        total_rows = len(rows)
-                        
-                        # FIX-017: Verificar espaço em disco antes de processar
-                        try:
-                            free_space = shutil.disk_usage('.').free
-                            # Estimar ~50KB por áudio + overhead
-                            estimated_size = total_rows * 60_000  # 60KB por item com margem
-                            required_space = estimated_size * 1.5  # 50% de margem de segurança
-                            
-                            if free_space < required_space:
-                                self.log(f"[ERRO] Espaço em disco insuficiente!")
-                                self.log(f"  Necessário: {required_space / 1_000_000:.1f} MB")
-                                self.log(f"  Disponível: {free_space / 1_000_000:.1f} MB")
-                                return False
-                            else:
-                                self.log(f"✓ Espaço em disco: {free_space / 1_000_000:.1f} MB disponível")
-                        except Exception as e:
-                            self.log(f"[AVISO] Não foi possível verificar espaço em disco: {str(e)}")
-                            # Continua mesmo assim, mas avisa
-                        
-                        # FIX-006: Estatísticas de sucessos/falhas
-                        stats = {'success': 0, 'failed': 0, 'skipped': 0}
-
-                        async def process_row(idx, row):
-                            # Fonte do áudio = coluna escolhida pelo usuário
-                            script_text = row.get(audio_source, '').strip()
-                            if not script_text: 
-                                stats['skipped'] += 1
-                                return
-
-                            # Hash único (FIX-010: incluir índice para garantir unicidade)
-                            file_hash = zlib.crc32(f"{idx}{script_text}".encode())
-                            audio_filename = f"audio_{idx}_{file_hash}.mp3"
-                            audio_path = os.path.join(temp_dir, audio_filename)
-
-                            success = await self.generate_audio(script_text, audio_path, voice_code, speed, semaphore)
-                            
-                            audio_field = ""
-                            if success:
-                                media_files.append(audio_path)
-                                audio_field = f"[sound:{audio_filename}]"
-                                stats['success'] += 1
-                            else:
-                                stats['failed'] += 1
-
-                            # Criar nota com colunas selecionadas, inserindo áudio na posição correta
-                            # A ordem deve corresponder exatamente aos campos do modelo
-                            note_fields = []
-                            for col in selected_columns:
-                                if col == audio_target:
-                                    # Inserir áudio na posição da coluna target (antes do valor da coluna)
-                                    note_fields.append(audio_field)
-                                    # Depois inserir o valor da própria coluna
-                                    note_fields.append(row.get(col, ''))
-                                else:
-                                    note_fields.append(row.get(col, ''))
-                            
-                            # Se audio_target não estiver nas colunas selecionadas, adicionar no final
-                            if audio_target not in selected_columns:
-                                note_fields.append(audio_field)
-                            
-                            note = genanki.Note(model=model, fields=note_fields)
-                            deck.add_note(note)
-                            
-                            # FIX-011: Atualizar progresso sempre, log a cada 10
-                            self.progress(idx + 1, total_rows)
-                            if idx % 10 == 0:
-                                first_col_value = row.get(selected_columns[0], 'N/A') if selected_columns else 'N/A'
-                                self.log(f"[{idx+1}] OK: {first_col_value}")
-
-                        # FIX-001: Processamento em lote para evitar OOM
-                        BATCH_SIZE = 100
-                        for i, row in enumerate(rows):
-                            tasks.append(process_row(i, row))
-                        
-                        # Processar em batches
-                        for batch_start in range(0, len(tasks), BATCH_SIZE):
-                            batch = tasks[batch_start:batch_start + BATCH_SIZE]
-                            await asyncio.gather(*batch)
-                            # Pequena pausa entre batches para liberar memória
-                            await asyncio.sleep(0.1)
-                        
-                        # FIX-006: Reportar estatísticas
-                        self.log(f"--- Estatísticas: {stats['success']} sucessos, {stats['failed']} falhas, {stats['skipped']} ignorados ---")
-
-                except (IOError, OSError) as e:
-                    # FIX-004: Exceções específicas para I/O
-                    self.log(f"[ERRO I/O] Erro ao ler CSV: {type(e).__name__}: {str(e)}")
-                    return False
-                except csv.Error as e:
-                    # FIX-004: Exceções específicas para CSV
-                    self.log(f"[ERRO CSV] Erro ao processar CSV: {str(e)}")
+            self.log(f"--- Iniciando: {safe_name} ---")
+            self.log(f"--- Colunas selecionadas: {', '.join(selected_columns)} ---")
+            self.log(f"--- Fonte de áudio: {audio_source} ---")
+            self.log(f"--- Áudio será inserido em: {audio_target} ---")
+            self.log(f"--- Coluna-chave: {key_column} ---")
+
+            def validate_headers(fieldnames):
+                # Verificar se a coluna de áudio existe
+                if audio_source not in fieldnames:
+                    self.log(f"[ERRO] Coluna '{audio_source}' não encontrada no CSV!")
                     return False
-                except Exception as e:
-                    # FIX-004: Outros erros
-                    self.log(f"[ERRO] Erro inesperado ao processar CSV: {type(e).__name__}: {str(e)}")
+                if key_column not in fieldnames:
+                    self.log(f"[ERRO] Coluna-chave '{key_column}' não encontrada no CSV!")
                     return False
+                return True
 
-                self.log(f"--- Empacotando... ---")
-                try:
-                    pkg = genanki.Package(deck)
-                    pkg.media_files = media_files
-                    pkg.write_to_file(output_pkg)
-                except (IOError, OSError) as e:
-                    # FIX-004: Exceções específicas para escrita
-                    self.log(f"[ERRO I/O] Falha ao escrever arquivo: {type(e).__name__}: {str(e)}")
-                    return False
-                except Exception as e:
-                    self.log(f"[ERRO] Falha ao empacotar deck: {type(e).__name__}: {str(e)}")
-                    return False
+            def make_note(row, audio_field, *variant_fields):
+                # Criar nota com colunas selecionadas, inserindo áudio na posição correta
+                # A ordem deve corresponder exatamente aos campos do modelo
+                note_fields = []
+                for col in selected_columns:
+                    if col == audio_target:
+                        # Inserir áudio na posição da coluna target (antes do valor da coluna)
+                        note_fields.append(audio_field)
+                        # Depois inserir o valor da própria coluna
+                        note_fields.append(row.get(col, ''))
+                    else:
+                        note_fields.append(row.get(col, ''))
                 
-                self.progress(total_rows, total_rows)
-                self.log(f"--- SUCESSO: {output_pkg} ---")
-                return True
+                # Se audio_target não estiver nas colunas selecionadas, adicionar no final
+                if audio_target not in selected_columns:
+                    note_fields.append(audio_field)
+                note_fields.extend(variant_fields)
+                
+                return genanki.Note(model=model, fields=note_fields)
+
+            label_column = selected_columns[0] if selected_columns else None
+            ok = await self._build_deck(
+                csv_path, deck, output_pkg, voice_code, speed,
+                audio_source, make_note, label_column, validate_headers, key_column, column_mapping,
+                selected_columns, extra
+            )
+            return output_pkg if ok else False
                 
         except KeyError as e:
             # FIX-004: Exceções específicas
@@ -541,23 +2766,294 @@ class AnkiBuilderBackend:
             self.log(f"[ERRO FATAL] {type(e).__name__}: {str(e)}")
             return False
 
+    def _child_backend(self, log_callback, progress_callback):
+        """Backend de um deck do lote: compartilha motor, cache, limites, retentativas e memória"""
+        child = AnkiBuilderBackend(log_callback, progress_callback, cache=self.cache or False, engine=self.engine,
+                                   strict_keys=self.strict_keys, postprocess=self.postprocess,
+                                   openmetrics=self.openmetrics, durable_jobs=self.durable_jobs,
+                                   preflight=self.preflight, schedule=self.schedule)
+        child.limiter = self.limiter
+        # Orçamento e disjuntor próprios: a passada final de um deck (policy.reset) não
+        # reabre o disjuntor nem renova o orçamento dos decks ainda em andamento
+        child.retry_policy = self.retry_policy.fresh()
+        child.audio_memory = self.audio_memory
+        return child
+
+    async def run_batch(self, csv_paths, voice_key, speed, column_mapping=None, mappings=None,
+                        output_dir=None, max_parallel_decks=4, variants=None):
+        """PERF-008: Gera vários decks com um único pool de concorrência e cache.
+
+        mappings: {csv_path: column_mapping} com mapeamentos próprios de cada CSV;
+        os demais usam column_mapping (None = modo legado). Até max_parallel_decks
+        decks ficam abertos ao mesmo tempo, de modo que a cauda de um deck se
+        sobrepõe ao início dos próximos e as vagas de síntese não ficam ociosas.
+        Cada .apkg é escrito assim que as linhas do seu deck terminam.
+        variants: pares (voice_key, speed) extras de cada deck (ver run_pipeline).
+        Retorna {csv_path: sucesso}.
+        """
+        mappings = mappings or {}
+        output_dir = output_dir or '.'
+        results = {}
+        deck_progress = {}
+        started = time.monotonic()
+
+        # Nomes de deck (e de saída) únicos mesmo com CSVs de mesmo nome em pastas diferentes
+        deck_names = batch_deck_names(csv_paths)
+        outputs = {csv_path: os.path.join(output_dir, f"{name}_Complete.apkg") for csv_path, name in deck_names.items()}
+
+        def report_progress():
+            self.progress(sum(c for c, _ in deck_progress.values()), sum(t for _, t in deck_progress.values()))
+
+        async def build(csv_path):
+            name = os.path.basename(csv_path)
+            if deck_name_for(os.path.splitext(name)[0]) != deck_names[csv_path]:
+                name = csv_path  # nome repetido no lote: o caminho identifica o deck no log
+
+            def log(msg):
+                self.log(f"[{name}] {msg}")
+
+            def progress(curr, total):
+                deck_progress[csv_path] = (curr, total)
+                report_progress()
+
+            child = self._child_backend(log, progress)
+            mapping = mappings.get(csv_path, column_mapping)
+            results[csv_path] = bool(await child.run_pipeline(csv_path, voice_key, speed, mapping,
+                                                              outputs[csv_path], variants, deck_names[csv_path]))
+
+        self.log(f"--- Lote: {len(csv_paths)} decks, até {max_parallel_decks} em paralelo ---")
+        await run_worker_pool(iter(csv_paths), build, max(1, max_parallel_decks))
+
+        succeeded = sum(1 for ok in results.values() if ok)
+        self.log(f"--- Lote concluído: {succeeded}/{len(csv_paths)} decks em {time.monotonic() - started:.1f} s ---")
+        for csv_path, ok in results.items():
+            if not ok:
+                self.log(f"[ERRO] Falha no deck: {csv_path}")
+        return results
+
+
+# --- NARRAÇÃO ---
+
+# PERF-011: Trechos de até N caracteres sintetizados em paralelo
+NARRATION_CHUNK_CHARS = 2000
+NARRATION_CONCURRENCY = 4
+
+_SENTENCE_END = re.compile(r'(?<=[.!?…;:])\s+')
+
+
+def split_text_into_chunks(text, max_chars=NARRATION_CHUNK_CHARS):
+    """Divide o texto em trechos de até max_chars, cortando em parágrafos, depois em
+    frases e, só em último caso, entre palavras. A ordem do texto é preservada."""
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append((paragraph, True))
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append((sentence[:cut], False))
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append((sentence, False))
+        # Marca o fim do parágrafo no último pedaço
+        pieces[-1] = (pieces[-1][0], True)
+
+    # Junta pedaços pequenos até o limite, separando parágrafos com quebra dupla
+    chunks = []
+    current = ""
+    for piece, ends_paragraph in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current.strip())
+            current = ""
+        current += piece + ("\n\n" if ends_paragraph else " ")
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+
+def _strip_id3(data):
+    """Remove a tag ID3v2 do início, para concatenar quadros MP3 de vários trechos"""
+    if len(data) > 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return data[10 + size:]
+    return data
+
+
+def join_audio_files(paths, extension, dest):
+    """Grava os trechos em ordem em um único arquivo (MP3: quadros concatenados; WAV: PCM unido)"""
+    if extension == "wav":
+        import wave
+        with wave.open(dest, 'wb') as out:
+            for idx, path in enumerate(paths):
+                with wave.open(path, 'rb') as src:
+                    if idx == 0:
+                        out.setparams(src.getparams())
+                    out.writeframes(src.readframes(src.getnframes()))
+        return
+    with open(dest, 'wb') as out:
+        for idx, path in enumerate(paths):
+            with open(path, 'rb') as src:
+                if idx > 0:
+                    # Só o cabeçalho pode ter ID3; o resto é copiado em blocos
+                    out.write(_strip_id3(src.read(64 * 1024)))
+                shutil.copyfileobj(src, out)
+
+
+class NarrationJournal:
+    """PERF-012: Diário dos trechos concluídos de uma narração.
+
+    Os trechos ficam em <saída>.parts/ e o diário em <saída>.journal.json. Um
+    trabalho interrompido ou com falhas parciais retoma do ponto em que parou,
+    desde que texto, voz, velocidade, motor e divisão em trechos sejam os mesmos.
+    """
+
+    def __init__(self, filepath, signature, segments):
+        self.filepath = filepath
+        self.parts_dir = f"{filepath}.parts"
+        self.journal_path = f"{filepath}.journal.json"
+        self.signature = signature
+        self.segments = segments
+        self.completed = {}  # {índice: bytes}
+
+    def segment_path(self, idx, extension):
+        return os.path.join(self.parts_dir, f"segment_{idx + 1:04d}.{extension}")
+
+    def load(self, extension):
+        """Recupera os trechos já gravados de uma execução anterior compatível"""
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if journal.get('signature') != self.signature or journal.get('segments') != self.segments:
+            return 0
+        for idx, size in journal.get('completed', {}).items():
+            idx = int(idx)
+            path = self.segment_path(idx, extension)
+            if os.path.exists(path) and os.path.getsize(path) == size:
+                self.completed[idx] = size
+        return len(self.completed)
+
+    def mark_done(self, idx, size):
+        self.completed[idx] = size
+        self._save()
+
+    def _save(self):
+        tmp = f"{self.journal_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'signature': self.signature,
+                'segments': self.segments,
+                'completed': {str(idx): size for idx, size in sorted(self.completed.items())},
+            }, f)
+        os.replace(tmp, self.journal_path)
+
+    def discard(self):
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
+
 
 class NarratorBackend:
-    def __init__(self, status_callback):
+    def __init__(self, status_callback, engine=None, concurrency=NARRATION_CONCURRENCY,
+                 chunk_chars=NARRATION_CHUNK_CHARS):
         self.status_callback = status_callback
+        self.engine = engine or EdgeTTSEngine()
+        self.concurrency = concurrency
+        self.chunk_chars = chunk_chars
+
+    async def _stream_segment(self, chunk, voice, speed, path):
+        """PERF-012: Grava o áudio em disco à medida que chega"""
+        tmp_path = f"{path}.tmp"
+        size = 0
+        with open(tmp_path, 'wb') as f:
+            async for data in self.engine.stream(chunk, voice, speed):
+                f.write(data)
+                size += len(data)
+        if not size:
+            raise RuntimeError("nenhum áudio recebido")
+        os.replace(tmp_path, path)
+        return size
+
+    async def _synthesize_segment(self, idx, chunk, voice, speed, path, semaphore, max_retries=3):
+        """Sintetiza um trecho; só ele é repetido em caso de falha. Retorna o tamanho em bytes."""
+        for attempt in range(max_retries):
+            try:
+                async with semaphore:
+                    # FIX-005: Timeout de 60 segundos por trecho
+                    return await asyncio.wait_for(
+                        self._stream_segment(chunk, voice, speed, path),
+                        timeout=60.0
+                    )
+            except Exception as e:
+                # PERF-020: Timeouts e conexões caídas são repetidos; erros de arquivo local, não
+                if not RetryPolicy.is_transient(e) or attempt == max_retries - 1:
+                    raise
+                self.status_callback(f"Trecho {idx + 1}: {type(e).__name__}, tentando novamente...")
+                # Backoff fora do semáforo
+                await asyncio.sleep(2 ** attempt)
 
     async def generate_long_audio(self, text, filepath, voice, speed):
+        journal = None
         try:
-            # Validação de tamanho (Edge TTS tem limite prático)
-            if len(text) > 5000:
-                self.status_callback("Aviso: Texto muito longo. Pode ser cortado pelo TTS.")
-            
-            communicate = edge_tts.Communicate(text, voice, rate=speed)
-            # FIX-005: Timeout de 60 segundos para textos longos
-            await asyncio.wait_for(
-                communicate.save(filepath),
-                timeout=60.0
-            )
+            # PERF-011: Textos longos viram trechos sintetizados em paralelo
+            chunks = split_text_into_chunks(text, self.chunk_chars)
+            if not chunks:
+                self.status_callback("Erro: Texto vazio")
+                return False
+
+            extension = self.engine.extension
+            signature = hashlib.sha256("\x1f".join(
+                (self.engine.name, voice, speed, str(self.chunk_chars), text)
+            ).encode('utf-8')).hexdigest()
+            journal = NarrationJournal(filepath, signature, len(chunks))
+            resumed = journal.load(extension)
+            if resumed:
+                self.status_callback(f"Retomando: {resumed}/{len(chunks)} trechos já prontos")
+            elif len(chunks) > 1:
+                self.status_callback(f"Texto dividido em {len(chunks)} trechos")
+            os.makedirs(journal.parts_dir, exist_ok=True)
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def run(idx, chunk):
+                path = journal.segment_path(idx, extension)
+                size = await self._synthesize_segment(idx, chunk, voice, speed, path, semaphore)
+                journal.mark_done(idx, size)
+                self.status_callback(
+                    f"Trecho {idx + 1}/{len(chunks)} salvo ({size // 1024} KB) - "
+                    f"{len(journal.completed)}/{len(chunks)} prontos"
+                )
+
+            pending = [idx for idx in range(len(chunks)) if idx not in journal.completed]
+            tasks = [asyncio.ensure_future(run(idx, chunks[idx])) for idx in pending]
+            try:
+                # Falhas não cancelam os outros trechos: tudo que terminar fica no diário
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                self.status_callback(
+                    f"Erro: {len(errors)} trecho(s) falharam ({type(errors[0]).__name__}: {str(errors[0])}). "
+                    f"{len(journal.completed)}/{len(chunks)} salvos; gere novamente para retomar."
+                )
+                return False
+
+            # Escrita atômica: uma falha nunca deixa um MP3 pela metade
+            tmp_path = f"{filepath}.part"
+            join_audio_files([journal.segment_path(idx, extension) for idx in range(len(chunks))],
+                             extension, tmp_path)
+            os.replace(tmp_path, filepath)
+            journal.discard()
             self.status_callback(f"Salvo com sucesso em: {os.path.basename(filepath)}")
             return True
         except asyncio.TimeoutError:
@@ -574,431 +3070,390 @@ class NarratorBackend:
             return False
 
 
-# --- DIÁLOGO DE MAPEAMENTO DE COLUNAS ---
-
-class ColumnMappingDialog(tk.Toplevel):
-    """Diálogo para mapear colunas do CSV"""
-    
-    def __init__(self, parent, csv_path, csv_columns=None):
-        super().__init__(parent)
-        self.title("Mapear Colunas do CSV")
-        self.geometry("700x600")
-        self.configure(bg="#f4f4f4")
-        self.result = None
-        
-        # FIX-009: Usar colunas passadas ou detectar se não fornecidas
-        if csv_columns:
-            self.csv_columns = csv_columns
-        else:
-            self.csv_columns = self._detect_columns(csv_path)
-        
-        if not self.csv_columns:
-            messagebox.showerror("Erro", "Não foi possível ler as colunas do CSV.")
-            self.destroy()
-            return
-        
-        self._setup_ui()
-        self.transient(parent)
-        self.grab_set()
-        
-    def _detect_columns(self, csv_path):
-        """Detecta as colunas do CSV"""
-        try:
-            with open(csv_path, encoding='utf-8-sig') as f:
-                sample = f.read(1024)
-                sniffer = csv.Sniffer()
-                try:
-                    dialect = sniffer.sniff(sample)
-                except Exception:
-                    dialect = 'excel'
-                f.seek(0)
-                reader = csv.DictReader(f, dialect=dialect)
-                return reader.fieldnames or []
-        except (IOError, OSError) as e:
-            # FIX-004: Exceções específicas
-            return None
-        except Exception as e:
-            return None
-    
-    def _setup_ui(self):
-        main_frame = ttk.Frame(self, padding=20)
-        main_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Título
-        title = ttk.Label(main_frame, text="Colunas detectadas no CSV:", font=("Arial", 10, "bold"))
-        title.pack(anchor='w', pady=(0, 10))
-        
-        # Frame com scroll para colunas
-        canvas_frame = ttk.Frame(main_frame)
-        canvas_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-        
-        canvas = tk.Canvas(canvas_frame, bg="white")
-        scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Variáveis para armazenar escolhas
-        self.audio_source_var = tk.StringVar()
-        self.audio_target_var = tk.StringVar()
-        self.column_mapping = {}  # {coluna_csv: usar_ou_nao}
-        
-        # Criar checkboxes para cada coluna
-        ttk.Label(scrollable_frame, text="Selecione quais colunas usar no deck:", font=("Arial", 9)).pack(anchor='w', pady=5)
-        
-        for col in self.csv_columns:
-            frame = ttk.Frame(scrollable_frame)
-            frame.pack(fill=tk.X, pady=2)
-            
-            var = tk.BooleanVar(value=True)  # Por padrão, todas selecionadas
-            self.column_mapping[col] = var
-            
-            ttk.Checkbutton(frame, text=col, variable=var).pack(side=tk.LEFT, padx=5)
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        # Seleção da fonte de áudio
-        audio_frame = ttk.LabelFrame(main_frame, text="Configuração de Áudio", padding=10)
-        audio_frame.pack(fill=tk.X, pady=10)
-        
-        # Fonte do áudio
-        ttk.Label(audio_frame, text="Qual coluna será usada para gerar o áudio?").pack(anchor='w')
-        audio_source_combo = ttk.Combobox(audio_frame, textvariable=self.audio_source_var, 
-                                         values=self.csv_columns, state="readonly", width=40)
-        audio_source_combo.pack(fill=tk.X, pady=5)
-        
-        # Callback para atualizar o target quando source mudar
-        def update_audio_target(*args):
-            if not self.audio_target_var.get() or self.audio_target_var.get() not in self.csv_columns:
-                self.audio_target_var.set(self.audio_source_var.get())
-        
-        self.audio_source_var.trace('w', update_audio_target)
-        
-        # Onde inserir o áudio
-        ttk.Label(audio_frame, text="Onde o áudio será inserido no card?").pack(anchor='w', pady=(10, 0))
-        audio_target_combo = ttk.Combobox(audio_frame, textvariable=self.audio_target_var, 
-                                         values=self.csv_columns, state="readonly", width=40)
-        audio_target_combo.pack(fill=tk.X, pady=5)
-        
-        # Se houver coluna "Audio Script", selecionar por padrão
-        if "Audio Script" in self.csv_columns:
-            self.audio_source_var.set("Audio Script")
-            self.audio_target_var.set("Audio Script")
-        elif self.csv_columns:
-            self.audio_source_var.set(self.csv_columns[0])
-            self.audio_target_var.set(self.csv_columns[0])
-        
-        # Botões
-        btn_frame = ttk.Frame(main_frame)
-        btn_frame.pack(fill=tk.X, pady=10)
-        
-        ttk.Button(btn_frame, text="Cancelar", command=self.cancel).pack(side=tk.RIGHT, padx=5)
-        ttk.Button(btn_frame, text="Confirmar", command=self.confirm).pack(side=tk.RIGHT)
-    
-    def confirm(self):
-        if not self.audio_source_var.get():
-            messagebox.showwarning("Aviso", "Selecione a coluna fonte do áudio.")
-            return
-        
-        if not self.audio_target_var.get():
-            messagebox.showwarning("Aviso", "Selecione onde o áudio será inserido.")
-            return
-        
-        # Coletar colunas selecionadas
-        selected_columns = [col for col, var in self.column_mapping.items() if var.get()]
-        
-        if not selected_columns:
-            messagebox.showwarning("Aviso", "Selecione pelo menos uma coluna.")
-            return
-        
-        # Verificar se a coluna target está nas selecionadas
-        audio_target = self.audio_target_var.get()
-        if audio_target not in selected_columns:
-            messagebox.showwarning("Aviso", f"A coluna '{audio_target}' (onde o áudio será inserido) deve estar selecionada.")
-            return
-        
-        self.result = {
-            'audio_source': self.audio_source_var.get(),
-            'audio_target': audio_target,
-            'selected_columns': selected_columns,
-            'all_columns': self.csv_columns
-        }
-        self.destroy()
-    
-    def cancel(self):
-        self.result = None
-        self.destroy()
+# --- LINHA DE COMANDO ---
 
+class CliReporter:
+    """Saída do modo headless.
 
-# --- GUI UNIFICADA ---
+    fmt='json' emite um evento JSON por linha no stdout (log, progress, status,
+    done); fmt='text' imprime o log como na GUI; fmt='quiet' só mostra erros.
+    O progresso é limitado a min_interval segundos entre eventos.
+    """
 
-class AnkiStudioApp(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Anki Studio - Gerador de Decks e Graded Readers")
-        self.geometry("750x650")
-        self.configure(bg="#f4f4f4")
-        
-        # Configurar event loop para Windows
-        if os.name == 'nt':
-            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-        
-        self._setup_ui()
+    def __init__(self, fmt='text', stream=None, min_interval=0.25):
+        self.fmt = fmt
+        self.stream = stream or sys.stdout
+        self.min_interval = min_interval
+        self._last_progress = 0.0
 
-    def _setup_ui(self):
-        # Notebook para abas
-        self.notebook = ttk.Notebook(self)
-        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        # Aba 1: Gerar Flashcards Anki
-        self.anki_frame = ttk.Frame(self.notebook, padding=20)
-        self.notebook.add(self.anki_frame, text="📚 Gerar Flashcards Anki")
-        self._setup_anki_tab()
-        
-        # Aba 2: Gerar Graded Readers
-        self.narrator_frame = ttk.Frame(self.notebook, padding=20)
-        self.notebook.add(self.narrator_frame, text="🎙️ Gerar Graded Reader")
-        self._setup_narrator_tab()
-
-    def _setup_anki_tab(self):
-        # Variáveis
-        self.anki_file_path = tk.StringVar()
-        self.anki_voice_var = tk.StringVar(value="Inglês (US) - Christopher (M)")
-        self.anki_speed_var = tk.StringVar(value="+20%")
-        
-        # Header CSV
-        lbl = ttk.Label(self.anki_frame, text="Arquivo CSV (O programa detectará automaticamente as colunas)", font=("Arial", 9, "bold"))
-        lbl.pack(anchor='w')
-        
-        f_file = ttk.Frame(self.anki_frame)
-        f_file.pack(fill=tk.X, pady=5)
-        ttk.Entry(f_file, textvariable=self.anki_file_path).pack(side=tk.LEFT, fill=tk.X, expand=True)
-        ttk.Button(f_file, text="Selecionar", command=self.browse_anki).pack(side=tk.LEFT, padx=5)
-
-        # Configs
-        f_cfg = ttk.Frame(self.anki_frame)
-        f_cfg.pack(fill=tk.X, pady=15)
-        
-        ttk.Label(f_cfg, text="Idioma/Voz:").pack(side=tk.LEFT)
-        ttk.Combobox(f_cfg, textvariable=self.anki_voice_var, values=list(VOICES.keys()), state="readonly", width=30).pack(side=tk.LEFT, padx=5)
-        
-        ttk.Label(f_cfg, text="Velocidade:").pack(side=tk.LEFT, padx=(15,0))
-        ttk.Combobox(f_cfg, textvariable=self.anki_speed_var, values=["+0%", "+10%", "+20%", "+30%"], state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+    def _emit(self, event, **data):
+        data = {'event': event, 'time': round(time.time(), 3), **data}
+        self.stream.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self.stream.flush()
 
-        # Botão Run
-        self.anki_progress_bar = ttk.Progressbar(self.anki_frame, orient=tk.HORIZONTAL, mode='determinate')
-        self.anki_progress_bar.pack(fill=tk.X, pady=(10, 5))
-        
-        self.anki_btn_run = tk.Button(self.anki_frame, text="GERAR DECK COMPLETO", bg="#333", fg="white", font=("Segoe UI", 10, "bold"), command=self.start_anki)
-        self.anki_btn_run.pack(fill=tk.X, pady=5)
-
-        # Log
-        self.anki_log_text = tk.Text(self.anki_frame, height=12, font=("Consolas", 8), state='disabled', bg="#fff")
-        self.anki_log_text.pack(fill=tk.BOTH, expand=True, pady=10)
-
-    def _setup_narrator_tab(self):
-        # Variáveis
-        self.narrator_voice_var = tk.StringVar(value="Inglês (US) - Christopher (M)")
-        self.narrator_speed_var = tk.StringVar(value="+0% (Normal)")
-        
-        # Container Principal
-        main = ttk.Frame(self.narrator_frame)
-        main.pack(fill=tk.BOTH, expand=True)
-
-        # 1. Configurações
-        top_frame = ttk.LabelFrame(main, text="Configurações de Voz", padding=10)
-        top_frame.pack(fill=tk.X, pady=(0, 15))
-
-        # Voz
-        ttk.Label(top_frame, text="Narrador:").pack(side=tk.LEFT)
-        ttk.Combobox(top_frame, textvariable=self.narrator_voice_var, values=list(VOICES.keys()), state="readonly", width=30).pack(side=tk.LEFT, padx=10)
-
-        # Velocidade
-        ttk.Label(top_frame, text="Velocidade:").pack(side=tk.LEFT, padx=(10, 0))
-        speed_opts = ["-20% (Muito Lento)", "-10% (Lento)", "+0% (Normal)", "+10% (Rápido)", "+20% (Nativo)"]
-        self.narrator_speed_combo = ttk.Combobox(top_frame, textvariable=self.narrator_speed_var, values=speed_opts, state="readonly", width=20)
-        self.narrator_speed_combo.pack(side=tk.LEFT, padx=5)
-
-        # 2. Área de Texto
-        lbl_text = ttk.Label(main, text="Cole sua história abaixo:", font=("Arial", 10, "bold"))
-        lbl_text.pack(anchor="w")
-
-        self.narrator_text_area = scrolledtext.ScrolledText(main, height=15, font=("Georgia", 11), wrap=tk.WORD, undo=True)
-        self.narrator_text_area.pack(fill=tk.BOTH, expand=True, pady=5)
-        
-        # Dica
-        tip = ttk.Label(main, text="Dica: O Edge TTS lida bem com pontuação. Use vírgulas e pontos para criar pausas naturais.", foreground="#666", font=("Arial", 8))
-        tip.pack(anchor="w", pady=(0, 10))
-
-        # 3. Botão de Ação
-        self.narrator_btn_save = tk.Button(main, text="GERAR MP3 DA HISTÓRIA", bg="#27ae60", fg="white", font=("Segoe UI", 11, "bold"), height=2, command=self.save_narrator_audio)
-        self.narrator_btn_save.pack(fill=tk.X)
-
-        # Status
-        self.narrator_status_var = tk.StringVar(value="Pronto")
-        self.narrator_status_bar = ttk.Label(main, textvariable=self.narrator_status_var, relief=tk.SUNKEN, anchor="e")
-        self.narrator_status_bar.pack(fill=tk.X, pady=(10, 0))
-
-    # Métodos para aba Anki
-    def log_anki(self, msg):
-        self.anki_log_text.config(state='normal')
-        self.anki_log_text.insert(tk.END, msg + "\n")
-        self.anki_log_text.see(tk.END)
-        self.anki_log_text.config(state='disabled')
-
-    def update_anki_progress(self, curr, total):
-        self.anki_progress_bar['maximum'] = total
-        self.anki_progress_bar['value'] = curr
-
-    def _detect_csv_columns(self, csv_path):
-        """FIX-009: Detecta colunas do CSV uma vez para evitar leitura duplicada"""
-        try:
-            with open(csv_path, encoding='utf-8-sig') as f:
-                sample = f.read(1024)
-                sniffer = csv.Sniffer()
-                try:
-                    dialect = sniffer.sniff(sample)
-                except Exception:
-                    dialect = 'excel'
-                f.seek(0)
-                reader = csv.DictReader(f, dialect=dialect)
-                return reader.fieldnames or []
-        except (IOError, OSError) as e:
-            return None
-        except Exception as e:
-            return None
+    def log(self, msg):
+        if self.fmt == 'json':
+            self._emit('log', message=msg)
+        elif self.fmt == 'text' or msg.startswith(("[ERRO", "[FATAL")):
+            print(msg, file=self.stream, flush=True)
 
-    def browse_anki(self):
-        f = filedialog.askopenfilename(filetypes=[("CSV", "*.csv")])
-        if f: 
-            # Definir o caminho do arquivo primeiro (para mostrar no campo)
-            self.anki_file_path.set(f)
-            # Forçar atualização do Entry
-            self.update_idletasks()
-            
-            # FIX-009: Detectar colunas uma vez e passar para o diálogo
-            columns = self._detect_csv_columns(f)
-            if not columns:
-                messagebox.showerror("Erro", "Não foi possível ler as colunas do CSV.")
-                return
-            
-            # Abrir diálogo de mapeamento passando colunas já detectadas
-            dialog = ColumnMappingDialog(self, f, columns)
-            self.wait_window(dialog)
-            
-            if dialog.result:
-                self.column_mapping = dialog.result
-                self.log_anki(f"✓ CSV carregado: {len(dialog.result['selected_columns'])} colunas selecionadas")
-                self.log_anki(f"✓ Fonte de áudio: {dialog.result['audio_source']}")
-                self.log_anki(f"✓ Áudio será inserido em: {dialog.result.get('audio_target', dialog.result['audio_source'])}")
-            else:
-                # Usuário cancelou o mapeamento, mas mantém o arquivo selecionado
-                # Limpar apenas o mapeamento, não o arquivo
-                if hasattr(self, 'column_mapping'):
-                    delattr(self, 'column_mapping')
-                self.log_anki("⚠ Mapeamento cancelado. Selecione o arquivo novamente para configurar.")
-
-    def start_anki(self):
-        if not self.anki_file_path.get():
-            messagebox.showwarning("Aviso", "Selecione o CSV.")
-            return
-        
-        # Verificar se há mapeamento (modo flexível) ou usar modo legado
-        column_mapping = getattr(self, 'column_mapping', None)
-        
-        self.anki_btn_run.config(state='disabled')
-        self.anki_log_text.config(state='normal')
-        self.anki_log_text.delete(1.0, tk.END)
-        self.anki_log_text.config(state='disabled')
-        
-        backend = AnkiBuilderBackend(self.log_anki, self.update_anki_progress)
-        # FIX-015: Thread não-daemon para garantir conclusão
-        thread = threading.Thread(target=self.run_anki_thread, args=(backend, column_mapping), daemon=False)
-        thread.start()
-        # Armazenar thread para possível join futuro
-        self.anki_thread = thread
-
-    def run_anki_thread(self, backend, column_mapping):
-        csv_f = self.anki_file_path.get()
-        voice = self.anki_voice_var.get()
-        speed = self.anki_speed_var.get()
-        
-        success = asyncio.run(backend.run_pipeline(csv_f, voice, speed, column_mapping))
-        
-        # Atualizar UI na thread principal
-        self.after(0, lambda: self.finish_anki_process(success))
-
-    def finish_anki_process(self, success):
-        self.anki_btn_run.config(state='normal')
-        if success:
-            messagebox.showinfo("Sucesso", "Deck gerado com sucesso!")
+    def status(self, msg):
+        if self.fmt == 'json':
+            self._emit('status', message=msg)
         else:
-            messagebox.showerror("Erro", "Houve um erro ao gerar o deck. Verifique o log.")
-
-    # Métodos para aba Narrator
-    def get_clean_speed(self):
-        raw = self.narrator_speed_var.get()
-        return raw.split(" ")[0]
+            print(msg, file=self.stream, flush=True)
 
-    def save_narrator_audio(self):
-        text_content = self.narrator_text_area.get("1.0", tk.END).strip()
-        
-        if not text_content:
-            messagebox.showwarning("Aviso", "A caixa de texto está vazia.")
+    def progress(self, current, total):
+        now = time.monotonic()
+        if current < total and now - self._last_progress < self.min_interval:
             return
-
-        # Escolher onde salvar
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".mp3",
-            filetypes=[("MP3 Audio", "*.mp3")],
-            title="Salvar Narração Como..."
-        )
-
-        if not file_path:
-            return
-
-        # Bloqueia UI
-        self.narrator_btn_save.config(state="disabled", text="GERANDO ÁUDIO... AGUARDE")
-        self.narrator_text_area.config(state="disabled")
-        self.narrator_status_var.set("Processando texto...")
-
-        # FIX-015: Thread não-daemon para garantir conclusão
-        thread = threading.Thread(target=self.run_narrator_thread, args=(text_content, file_path), daemon=False)
-        thread.start()
-        # Armazenar thread para possível join futuro
-        self.narrator_thread = thread
-
-    def run_narrator_thread(self, text, filepath):
-        voice_key = self.narrator_voice_var.get()
-        voice_code = VOICES[voice_key]
-        speed = self.get_clean_speed()
-
-        backend = NarratorBackend(self.update_narrator_status)
-        success = asyncio.run(backend.generate_long_audio(text, filepath, voice_code, speed))
-
-        # Restaura UI na thread principal
-        self.after(0, lambda: self.finish_narrator_process(success))
-
-    def update_narrator_status(self, message):
-        # Thread-safe update
-        self.after(0, lambda: self.narrator_status_var.set(message))
-
-    def finish_narrator_process(self, success):
-        self.narrator_btn_save.config(state="normal", text="GERAR MP3 DA HISTÓRIA")
-        self.narrator_text_area.config(state="normal")
-        if success:
-            messagebox.showinfo("Sucesso", "Narração concluída!")
+        self._last_progress = now
+        if self.fmt == 'json':
+            self._emit('progress', current=current, total=total)
+        elif self.fmt == 'text' and sys.stderr.isatty():
+            sys.stderr.write(f"\r[{current}/{total}]")
+            if current >= total:
+                sys.stderr.write("\n")
+            sys.stderr.flush()
+
+    def done(self, success, **data):
+        if self.fmt == 'json':
+            self._emit('done', success=success, **data)
+
+
+def resolve_voice_key(voice):
+    """Aceita o nome exibido na GUI ('Italiano - Diego (M)') ou o código ('it-IT-DiegoNeural')"""
+    if voice in VOICES:
+        return voice
+    for key, code in VOICES.items():
+        if code == voice:
+            return key
+    return None
+
+
+def read_csv_header(csv_path):
+    return list(inspect_csv(csv_path).fieldnames)
+
+
+def load_column_mapping(path):
+    """Lê um mapeamento de colunas em JSON ou TOML (mesmo formato do diálogo da GUI)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Mapeamento TOML requer Python 3.11+ ou o pacote 'tomli'") from None
+        mapping = tomllib.loads(raw.decode('utf-8'))
+    else:
+        mapping = json.loads(raw.decode('utf-8'))
+    if not isinstance(mapping, dict) or 'audio_source' not in mapping:
+        raise ValueError(f"Mapeamento inválido em {path}: faltando 'audio_source'")
+    return mapping
+
+
+def build_column_mapping(args):
+    """Combina --mapping com --audio-source/--audio-target/--columns. None = modo legado."""
+    mapping = load_column_mapping(args.mapping) if args.mapping else {}
+    if args.audio_source:
+        mapping['audio_source'] = args.audio_source
+    if args.audio_target:
+        mapping['audio_target'] = args.audio_target
+    if args.columns:
+        mapping['selected_columns'] = [col.strip() for col in args.columns.split(',') if col.strip()]
+    if not mapping:
+        return None
+    if args.key_column:
+        mapping['key_column'] = args.key_column
+    if 'audio_source' not in mapping:
+        raise ValueError("Informe --audio-source (ou 'audio_source' no arquivo de mapeamento)")
+    if not mapping.get('selected_columns'):
+        # Como no diálogo: por padrão todas as colunas do CSV
+        mapping['selected_columns'] = read_csv_header(args.csv)
+    mapping.setdefault('audio_target', mapping['audio_source'])
+    return mapping
+
+
+def _engine_from_args(args):
+    if args.engine == 'fake':
+        return FakeTTSEngine(latency=args.fake_latency, error_rate=args.fake_error_rate)
+    return create_engine(args.engine)
+
+
+def _postprocessor_from_args(args):
+    if not args.transcode:
+        return None
+    return AudioPostProcessor(
+        codec=args.transcode, bitrate=args.bitrate, sample_rate=args.sample_rate,
+        loudness=None if args.no_loudnorm else args.loudness,
+    )
+
+
+def _retry_policy_from_args(args):
+    return RetryPolicy(max_attempts=args.max_attempts, connect_timeout=args.connect_timeout,
+                       stall_timeout=args.stall_timeout)
+
+
+def _variants_from_args(args):
+    """--variant VOZ@VELOCIDADE (repetível) -> [(voice_key, velocidade)]"""
+    variants = []
+    for spec in args.variant or ():
+        voice, _, rate = spec.rpartition('@')
+        voice_key = resolve_voice_key(voice or args.voice)
+        if voice_key is None:
+            raise ValueError(f"Voz inválida na variante: {spec}")
+        variants.append((voice_key, rate))
+    return variants
+
+
+def cmd_deck(args):
+    reporter = CliReporter(args.progress)
+    voice_key = resolve_voice_key(args.voice)
+    if voice_key is None:
+        reporter.log(f"[ERRO] Voz inválida: {args.voice}")
+        reporter.done(False)
+        return 1
+    try:
+        column_mapping = build_column_mapping(args)
+        variants = _variants_from_args(args)
+        engine = _engine_from_args(args)
+        postprocess = _postprocessor_from_args(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        reporter.log(f"[ERRO] {e}")
+        reporter.done(False)
+        return 1
+    backend = AnkiBuilderBackend(
+        reporter.log, reporter.progress,
+        cache=False if args.no_cache else None,
+        concurrency=args.concurrency,
+        engine=engine,
+        strict_keys=args.strict_keys,
+        audio_memory=None if args.audio_memory_mb is None else args.audio_memory_mb * 1_000_000,
+        postprocess=postprocess,
+        openmetrics=args.openmetrics,
+        durable_jobs=not args.no_resume,
+        retry_policy=_retry_policy_from_args(args),
+        preflight=args.preflight,
+        schedule=args.schedule,
+    )
+    output_pkg = asyncio.run(backend.run_pipeline(args.csv, voice_key, args.rate, column_mapping, args.output,
+                                                  variants))
+    reporter.done(bool(output_pkg), output=output_pkg or args.output)
+    return 0 if output_pkg else 1
+
+
+def expand_csv_inputs(inputs):
+    """Diretórios viram suas planilhas (TABLE_PATTERNS); os demais argumentos são caminhos ou globs"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(path for pattern in TABLE_PATTERNS for path in glob.glob(os.path.join(item, pattern)))
+        else:
+            matches = sorted(glob.glob(item)) or [item]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def find_mapping_sidecar(csv_path):
+    """Mapeamento próprio de um CSV: <nome>.mapping.json ou <nome>.mapping.toml ao lado dele"""
+    stem = os.path.splitext(csv_path)[0]
+    for ext in ('.mapping.json', '.mapping.toml'):
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return None
+
+
+def cmd_batch(args):
+    reporter = CliReporter(args.progress)
+    voice_key = resolve_voice_key(args.voice)
+    if voice_key is None:
+        reporter.log(f"[ERRO] Voz inválida: {args.voice}")
+        reporter.done(False)
+        return 1
+    csv_paths = expand_csv_inputs(args.inputs)
+    if not csv_paths:
+        reporter.log("[ERRO] Nenhum CSV encontrado")
+        reporter.done(False)
+        return 1
+    try:
+        shared_mapping = load_column_mapping(args.mapping) if args.mapping else None
+        mappings = {}
+        for csv_path in csv_paths:
+            sidecar = find_mapping_sidecar(csv_path)
+            if sidecar:
+                mappings[csv_path] = load_column_mapping(sidecar)
+        for mapping in [shared_mapping, *mappings.values()]:
+            if mapping is not None:
+                mapping.setdefault('audio_target', mapping['audio_source'])
+        variants = _variants_from_args(args)
+        engine = _engine_from_args(args)
+        postprocess = _postprocessor_from_args(args)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+    except (OSError, ValueError, RuntimeError) as e:
+        reporter.log(f"[ERRO] {e}")
+        reporter.done(False)
+        return 1
+
+    backend = AnkiBuilderBackend(
+        reporter.log, reporter.progress,
+        cache=False if args.no_cache else None,
+        concurrency=args.concurrency,
+        engine=engine,
+        strict_keys=args.strict_keys,
+        audio_memory=None if args.audio_memory_mb is None else args.audio_memory_mb * 1_000_000,
+        postprocess=postprocess,
+        openmetrics=args.openmetrics,
+        durable_jobs=not args.no_resume,
+        retry_policy=_retry_policy_from_args(args),
+        preflight=args.preflight,
+        schedule=args.schedule,
+    )
+    # Sem 'selected_columns', cada CSV usa todas as suas colunas
+    for csv_path in csv_paths:
+        mapping = mappings.get(csv_path, shared_mapping)
+        if mapping is not None and not mapping.get('selected_columns'):
+            mappings[csv_path] = dict(mapping, selected_columns=read_csv_header(csv_path))
+    results = asyncio.run(backend.run_batch(
+        csv_paths, voice_key, args.rate, shared_mapping, mappings,
+        output_dir=args.output_dir, max_parallel_decks=args.parallel_decks, variants=variants,
+    ))
+    success = all(results.values())
+    reporter.done(success, results={path: ok for path, ok in results.items()})
+    return 0 if success else 1
+
+
+def cmd_narrate(args):
+    reporter = CliReporter(args.progress)
+    voice_key = resolve_voice_key(args.voice)
+    voice_code = VOICES[voice_key] if voice_key else args.voice
+    try:
+        if args.input == '-':
+            text = sys.stdin.read()
         else:
-            messagebox.showerror("Erro", "Houve um erro ao gerar a narração.")
+            with open(args.input, encoding='utf-8-sig') as f:
+                text = f.read()
+        engine = _engine_from_args(args)
+    except (OSError, ValueError) as e:
+        reporter.log(f"[ERRO] {e}")
+        reporter.done(False)
+        return 1
+    if not text.strip():
+        reporter.log("[ERRO] Texto vazio")
+        reporter.done(False)
+        return 1
+    backend = NarratorBackend(reporter.status, engine=engine, concurrency=args.concurrency)
+    success = asyncio.run(backend.generate_long_audio(text.strip(), args.output, voice_code, args.rate))
+    reporter.done(success, output=args.output)
+    return 0 if success else 1
+
+
+def cmd_voices(args):
+    for key, code in VOICES.items():
+        print(f"{code}\t{key}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="anky_studio.py",
+        description="Anki Studio - geração de decks e narrações sem interface gráfica. "
+                    "Sem argumentos, abre a GUI.",
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--voice', default="Inglês (US) - Christopher (M)",
+                        help="nome da voz (como na GUI) ou código edge-tts, ex.: it-IT-DiegoNeural")
+    common.add_argument('--engine', choices=sorted(TTS_ENGINES), default='edge', help="motor TTS")
+    common.add_argument('--fake-latency', type=float, default=0.05, help=argparse.SUPPRESS)
+    common.add_argument('--fake-error-rate', type=float, default=0.0, help=argparse.SUPPRESS)
+    common.add_argument('--strict-keys', action='store_true',
+                        help="abortar antes da síntese se a coluna-chave tiver valores repetidos ou vazios")
+    common.add_argument('--progress', choices=['text', 'json', 'quiet'], default='text',
+                        help="formato da saída; 'json' emite um evento JSON por linha")
+
+    # Opções de síntese e empacotamento comuns a deck e batch
+    building = argparse.ArgumentParser(add_help=False)
+    building.add_argument('--concurrency', type=int, help="limite fixo de requisições simultâneas (padrão: adaptativo)")
+    building.add_argument('--no-cache', action='store_true', help="não usar o cache persistente de áudio")
+    building.add_argument('--audio-memory-mb', type=int,
+                          help="teto de áudio em memória antes de usar o disco (padrão: 256; 0 = sempre disco)")
+    building.add_argument('--transcode', choices=sorted(AUDIO_CODECS),
+                          help="recodifica cada áudio com o ffmpeg (padrão: mantém o MP3 original)")
+    building.add_argument('--bitrate', default="32k", help="taxa de bits da recodificação, ex.: 24k")
+    building.add_argument('--sample-rate', type=int, default=24000, help="taxa de amostragem da recodificação")
+    building.add_argument('--loudness', type=float, default=-16.0, help="alvo de volume em LUFS na recodificação")
+    building.add_argument('--no-loudnorm', action='store_true', help="recodificar sem normalizar o volume")
+    building.add_argument('--no-resume', action='store_true',
+                          help="não manter <deck>.job/ para retomar um build interrompido")
+    building.add_argument('--openmetrics', action='store_true',
+                          help="além de <deck>.metrics.json, grava as métricas em <deck>.metrics.prom (OpenMetrics)")
+    building.add_argument('--preflight', choices=PREFLIGHT_MODES, default='report',
+                          help="pré-verificação dos dados: report registra, strict para em linhas "
+                               "problemáticas, only só estima (nenhuma requisição)")
+    building.add_argument('--schedule', choices=SCHEDULES, default='csv',
+                          help="ordem da síntese: csv (do arquivo) ou longest (scripts longos primeiro; "
+                               "a ordem do deck não muda)")
+    building.add_argument('--variant', action='append', metavar="VOZ@VELOCIDADE",
+                          help="áudio extra por linha, num campo próprio, ex.: en-US-MichelleNeural@-20%%; "
+                               "repetível, com uma única leitura e um único pacote ('@-20%%' = mesma voz)")
+    building.add_argument('--max-attempts', type=int, default=4, help="tentativas por áudio com erro transitório")
+    building.add_argument('--connect-timeout', type=float, default=15.0,
+                          help="segundos até o primeiro byte do serviço TTS")
+    building.add_argument('--stall-timeout', type=float, default=10.0,
+                          help="segundos sem novos dados antes de desistir da tentativa")
+
+    deck = sub.add_parser('deck', parents=[common, building], help="gera um deck .apkg a partir de um CSV")
+    deck.add_argument('csv', help="arquivo CSV, TSV ou XLSX de entrada")
+    deck.add_argument('-o', '--output', help="caminho do .apkg (padrão: <csv>_Complete.apkg)")
+    deck.add_argument('--rate', default="+20%", help="velocidade, ex.: +20%% ou -10%%")
+    deck.add_argument('--mapping', help="mapeamento de colunas em JSON ou TOML")
+    deck.add_argument('--audio-source', help="coluna usada para gerar o áudio")
+    deck.add_argument('--audio-target', help="coluna onde o áudio é inserido (padrão: a fonte)")
+    deck.add_argument('--columns', help="colunas do deck, separadas por vírgula (padrão: todas)")
+    deck.add_argument('--key-column', help="coluna que identifica a nota (GUID estável); padrão: a primeira coluna")
+    deck.set_defaults(func=cmd_deck)
+
+    batch = sub.add_parser('batch', parents=[common, building], help="gera vários decks com um pool de concorrência único")
+    batch.add_argument('inputs', nargs='+', help="diretórios (usa *.csv, *.tsv e *.xlsx), arquivos ou globs")
+    batch.add_argument('--output-dir', help="pasta dos .apkg (padrão: diretório atual)")
+    batch.add_argument('--rate', default="+20%", help="velocidade, ex.: +20%%")
+    batch.add_argument('--mapping', help="mapeamento compartilhado (JSON/TOML); <csv>.mapping.json/.toml tem prioridade")
+    batch.add_argument('--parallel-decks', type=int, default=4, help="decks abertos ao mesmo tempo")
+    batch.set_defaults(func=cmd_batch)
+
+    narrate = sub.add_parser('narrate', parents=[common], help="narra um texto em um único MP3")
+    narrate.add_argument('input', help="arquivo de texto (UTF-8) ou '-' para stdin")
+    narrate.add_argument('-o', '--output', required=True, help="arquivo MP3 de saída")
+    narrate.add_argument('--rate', default="+0%", help="velocidade, ex.: -10%%")
+    narrate.add_argument('--concurrency', type=int, default=NARRATION_CONCURRENCY, help="trechos sintetizados em paralelo")
+    narrate.set_defaults(func=cmd_narrate)
+
+    voices = sub.add_parser('voices', help="lista as vozes disponíveis")
+    voices.set_defaults(func=cmd_voices)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        # Sem argumentos: GUI, com o Tkinter importado só agora
+        from anky_studio_gui import main as gui_main
+        gui_main()
+        return 0
+
+    args = build_parser().parse_args(argv)
+    # Configurar event loop para Windows
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    app = AnkiStudioApp()
-    app.mainloop()
+    sys.exit(main())
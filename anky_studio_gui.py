@@ -0,0 +1,500 @@
+"""Interface gráfica (Tkinter) do Anki Studio.
+
+Separada do backend para que o modo de linha de comando (anky_studio.py) rode
+em servidores sem display e sem importar o Tkinter.
+"""
+import asyncio
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, scrolledtext
+
+from anky_studio import VOICES, TABLE_PATTERNS, AnkiBuilderBackend, NarratorBackend, inspect_csv
+
+# PERF-016: A fila de eventos é drenada a cada UI_REFRESH_MS (~20 atualizações/s)
+UI_REFRESH_MS = 50
+# Linhas mantidas no log; as mais antigas são descartadas
+LOG_MAX_LINES = 2000
+
+# --- DIÁLOGO DE MAPEAMENTO DE COLUNAS ---
+
+class ColumnMappingDialog(tk.Toplevel):
+    """Diálogo para mapear colunas do CSV"""
+    
+    def __init__(self, parent, csv_path, csv_columns=None):
+        super().__init__(parent)
+        self.title("Mapear Colunas do CSV")
+        self.geometry("700x660")
+        self.configure(bg="#f4f4f4")
+        self.result = None
+        
+        # FIX-009: Usar colunas passadas ou detectar se não fornecidas
+        if csv_columns:
+            self.csv_columns = csv_columns
+        else:
+            self.csv_columns = self._detect_columns(csv_path)
+        
+        if not self.csv_columns:
+            messagebox.showerror("Erro", "Não foi possível ler as colunas do CSV.")
+            self.destroy()
+            return
+        
+        self._setup_ui()
+        self.transient(parent)
+        self.grab_set()
+        
+    def _detect_columns(self, csv_path):
+        """Detecta as colunas do CSV (PERF-021: inspeção em cache, a mesma do pipeline)"""
+        try:
+            return list(inspect_csv(csv_path).fieldnames)
+        except (IOError, OSError) as e:
+            # FIX-004: Exceções específicas
+            return None
+        except Exception as e:
+            return None
+    
+    def _setup_ui(self):
+        main_frame = ttk.Frame(self, padding=20)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Título
+        title = ttk.Label(main_frame, text="Colunas detectadas no CSV:", font=("Arial", 10, "bold"))
+        title.pack(anchor='w', pady=(0, 10))
+        
+        # Frame com scroll para colunas
+        canvas_frame = ttk.Frame(main_frame)
+        canvas_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        canvas = tk.Canvas(canvas_frame, bg="white")
+        scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=canvas.yview)
+        scrollable_frame = ttk.Frame(canvas)
+        
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
+        
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        # Variáveis para armazenar escolhas
+        self.audio_source_var = tk.StringVar()
+        self.audio_target_var = tk.StringVar()
+        self.key_column_var = tk.StringVar(value=self.csv_columns[0])
+        self.column_mapping = {}  # {coluna_csv: usar_ou_nao}
+        
+        # Criar checkboxes para cada coluna
+        ttk.Label(scrollable_frame, text="Selecione quais colunas usar no deck:", font=("Arial", 9)).pack(anchor='w', pady=5)
+        
+        for col in self.csv_columns:
+            frame = ttk.Frame(scrollable_frame)
+            frame.pack(fill=tk.X, pady=2)
+            
+            var = tk.BooleanVar(value=True)  # Por padrão, todas selecionadas
+            self.column_mapping[col] = var
+            
+            ttk.Checkbutton(frame, text=col, variable=var).pack(side=tk.LEFT, padx=5)
+        
+        canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        # Seleção da fonte de áudio
+        audio_frame = ttk.LabelFrame(main_frame, text="Configuração de Áudio", padding=10)
+        audio_frame.pack(fill=tk.X, pady=10)
+        
+        # Fonte do áudio
+        ttk.Label(audio_frame, text="Qual coluna será usada para gerar o áudio?").pack(anchor='w')
+        audio_source_combo = ttk.Combobox(audio_frame, textvariable=self.audio_source_var, 
+                                         values=self.csv_columns, state="readonly", width=40)
+        audio_source_combo.pack(fill=tk.X, pady=5)
+        
+        # Callback para atualizar o target quando source mudar
+        def update_audio_target(*args):
+            if not self.audio_target_var.get() or self.audio_target_var.get() not in self.csv_columns:
+                self.audio_target_var.set(self.audio_source_var.get())
+        
+        self.audio_source_var.trace('w', update_audio_target)
+        
+        # Onde inserir o áudio
+        ttk.Label(audio_frame, text="Onde o áudio será inserido no card?").pack(anchor='w', pady=(10, 0))
+        audio_target_combo = ttk.Combobox(audio_frame, textvariable=self.audio_target_var, 
+                                         values=self.csv_columns, state="readonly", width=40)
+        audio_target_combo.pack(fill=tk.X, pady=5)
+        
+        # Coluna-chave: identifica a nota entre builds (GUID estável)
+        ttk.Label(audio_frame, text="Qual coluna identifica cada nota (chave para reimportar)?").pack(anchor='w', pady=(10, 0))
+        key_column_combo = ttk.Combobox(audio_frame, textvariable=self.key_column_var,
+                                        values=self.csv_columns, state="readonly", width=40)
+        key_column_combo.pack(fill=tk.X, pady=5)
+        
+        # Se houver coluna "Audio Script", selecionar por padrão
+        if "Audio Script" in self.csv_columns:
+            self.audio_source_var.set("Audio Script")
+            self.audio_target_var.set("Audio Script")
+        elif self.csv_columns:
+            self.audio_source_var.set(self.csv_columns[0])
+            self.audio_target_var.set(self.csv_columns[0])
+        
+        # Botões
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=10)
+        
+        ttk.Button(btn_frame, text="Cancelar", command=self.cancel).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(btn_frame, text="Confirmar", command=self.confirm).pack(side=tk.RIGHT)
+    
+    def confirm(self):
+        if not self.audio_source_var.get():
+            messagebox.showwarning("Aviso", "Selecione a coluna fonte do áudio.")
+            return
+        
+        if not self.audio_target_var.get():
+            messagebox.showwarning("Aviso", "Selecione onde o áudio será inserido.")
+            return
+        
+        # Coletar colunas selecionadas
+        selected_columns = [col for col, var in self.column_mapping.items() if var.get()]
+        
+        if not selected_columns:
+            messagebox.showwarning("Aviso", "Selecione pelo menos uma coluna.")
+            return
+        
+        # Verificar se a coluna target está nas selecionadas
+        audio_target = self.audio_target_var.get()
+        if audio_target not in selected_columns:
+            messagebox.showwarning("Aviso", f"A coluna '{audio_target}' (onde o áudio será inserido) deve estar selecionada.")
+            return
+        
+        self.result = {
+            'audio_source': self.audio_source_var.get(),
+            'audio_target': audio_target,
+            'selected_columns': selected_columns,
+            'key_column': self.key_column_var.get(),
+            'all_columns': self.csv_columns
+        }
+        self.destroy()
+    
+    def cancel(self):
+        self.result = None
+        self.destroy()
+
+
+# --- GUI UNIFICADA ---
+
+class AnkiStudioApp(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("Anki Studio - Gerador de Decks e Graded Readers")
+        self.geometry("750x650")
+        self.configure(bg="#f4f4f4")
+        
+        # Configurar event loop para Windows
+        if os.name == 'nt':
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        
+        # PERF-016: As threads de trabalho só enfileiram eventos; os widgets são
+        # tocados apenas pelo loop do Tk, em _drain_events
+        self._events = queue.SimpleQueue()
+        self._anki_progress = None  # último (atual, total) ainda não exibido
+        self._narrator_status = None
+
+        self._setup_ui()
+        self.after(UI_REFRESH_MS, self._drain_events)
+
+    def _setup_ui(self):
+        # Notebook para abas
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Aba 1: Gerar Flashcards Anki
+        self.anki_frame = ttk.Frame(self.notebook, padding=20)
+        self.notebook.add(self.anki_frame, text="📚 Gerar Flashcards Anki")
+        self._setup_anki_tab()
+        
+        # Aba 2: Gerar Graded Readers
+        self.narrator_frame = ttk.Frame(self.notebook, padding=20)
+        self.notebook.add(self.narrator_frame, text="🎙️ Gerar Graded Reader")
+        self._setup_narrator_tab()
+
+    def _setup_anki_tab(self):
+        # Variáveis
+        self.anki_file_path = tk.StringVar()
+        self.anki_voice_var = tk.StringVar(value="Inglês (US) - Christopher (M)")
+        self.anki_speed_var = tk.StringVar(value="+20%")
+        
+        # Header CSV
+        lbl = ttk.Label(self.anki_frame, text="Arquivo CSV (O programa detectará automaticamente as colunas)", font=("Arial", 9, "bold"))
+        lbl.pack(anchor='w')
+        
+        f_file = ttk.Frame(self.anki_frame)
+        f_file.pack(fill=tk.X, pady=5)
+        ttk.Entry(f_file, textvariable=self.anki_file_path).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(f_file, text="Selecionar", command=self.browse_anki).pack(side=tk.LEFT, padx=5)
+
+        # Configs
+        f_cfg = ttk.Frame(self.anki_frame)
+        f_cfg.pack(fill=tk.X, pady=15)
+        
+        ttk.Label(f_cfg, text="Idioma/Voz:").pack(side=tk.LEFT)
+        ttk.Combobox(f_cfg, textvariable=self.anki_voice_var, values=list(VOICES.keys()), state="readonly", width=30).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(f_cfg, text="Velocidade:").pack(side=tk.LEFT, padx=(15,0))
+        ttk.Combobox(f_cfg, textvariable=self.anki_speed_var, values=["+0%", "+10%", "+20%", "+30%"], state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+
+        # Botão Run
+        self.anki_progress_bar = ttk.Progressbar(self.anki_frame, orient=tk.HORIZONTAL, mode='determinate')
+        self.anki_progress_bar.pack(fill=tk.X, pady=(10, 5))
+        
+        self.anki_btn_run = tk.Button(self.anki_frame, text="GERAR DECK COMPLETO", bg="#333", fg="white", font=("Segoe UI", 10, "bold"), command=self.start_anki)
+        self.anki_btn_run.pack(fill=tk.X, pady=5)
+
+        # Log
+        self.anki_log_text = tk.Text(self.anki_frame, height=12, font=("Consolas", 8), state='disabled', bg="#fff")
+        self.anki_log_text.pack(fill=tk.BOTH, expand=True, pady=10)
+
+    def _setup_narrator_tab(self):
+        # Variáveis
+        self.narrator_voice_var = tk.StringVar(value="Inglês (US) - Christopher (M)")
+        self.narrator_speed_var = tk.StringVar(value="+0% (Normal)")
+        
+        # Container Principal
+        main = ttk.Frame(self.narrator_frame)
+        main.pack(fill=tk.BOTH, expand=True)
+
+        # 1. Configurações
+        top_frame = ttk.LabelFrame(main, text="Configurações de Voz", padding=10)
+        top_frame.pack(fill=tk.X, pady=(0, 15))
+
+        # Voz
+        ttk.Label(top_frame, text="Narrador:").pack(side=tk.LEFT)
+        ttk.Combobox(top_frame, textvariable=self.narrator_voice_var, values=list(VOICES.keys()), state="readonly", width=30).pack(side=tk.LEFT, padx=10)
+
+        # Velocidade
+        ttk.Label(top_frame, text="Velocidade:").pack(side=tk.LEFT, padx=(10, 0))
+        speed_opts = ["-20% (Muito Lento)", "-10% (Lento)", "+0% (Normal)", "+10% (Rápido)", "+20% (Nativo)"]
+        self.narrator_speed_combo = ttk.Combobox(top_frame, textvariable=self.narrator_speed_var, values=speed_opts, state="readonly", width=20)
+        self.narrator_speed_combo.pack(side=tk.LEFT, padx=5)
+
+        # 2. Área de Texto
+        lbl_text = ttk.Label(main, text="Cole sua história abaixo:", font=("Arial", 10, "bold"))
+        lbl_text.pack(anchor="w")
+
+        self.narrator_text_area = scrolledtext.ScrolledText(main, height=15, font=("Georgia", 11), wrap=tk.WORD, undo=True)
+        self.narrator_text_area.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        # Dica
+        tip = ttk.Label(main, text="Dica: O Edge TTS lida bem com pontuação. Use vírgulas e pontos para criar pausas naturais.", foreground="#666", font=("Arial", 8))
+        tip.pack(anchor="w", pady=(0, 10))
+
+        # 3. Botão de Ação
+        self.narrator_btn_save = tk.Button(main, text="GERAR MP3 DA HISTÓRIA", bg="#27ae60", fg="white", font=("Segoe UI", 11, "bold"), height=2, command=self.save_narrator_audio)
+        self.narrator_btn_save.pack(fill=tk.X)
+
+        # Status
+        self.narrator_status_var = tk.StringVar(value="Pronto")
+        self.narrator_status_bar = ttk.Label(main, textvariable=self.narrator_status_var, relief=tk.SUNKEN, anchor="e")
+        self.narrator_status_bar.pack(fill=tk.X, pady=(10, 0))
+
+    # Fila de eventos (thread-safe)
+    def _post(self, callback):
+        """Agenda callback no loop do Tk, depois dos logs já enfileirados"""
+        self._events.put(('call', callback))
+
+    def _drain_events(self):
+        """PERF-016: Aplica os eventos acumulados numa única passada do loop do Tk.
+        Um callback com erro vira uma linha de log; o próximo ciclo é sempre agendado."""
+        try:
+            # Progresso e status coalescidos: só o valor mais recente é exibido
+            progress, self._anki_progress = self._anki_progress, None
+            if progress is not None:
+                curr, total = progress
+                self.anki_progress_bar['maximum'] = total
+                self.anki_progress_bar['value'] = curr
+            status, self._narrator_status = self._narrator_status, None
+            if status is not None:
+                self.narrator_status_var.set(status)
+
+            lines = []
+            while True:
+                try:
+                    kind, payload = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'log':
+                    lines.append(payload)
+                    continue
+                # Mantém a ordem: logs anteriores aparecem antes do callback
+                if lines:
+                    self._append_anki_log(lines)
+                    lines = []
+                try:
+                    payload()
+                except Exception as e:
+                    lines.append(f"[ERRO GUI] {type(e).__name__}: {str(e)}")
+            if lines:
+                self._append_anki_log(lines)
+        finally:
+            self.after(UI_REFRESH_MS, self._drain_events)
+
+    def _append_anki_log(self, lines):
+        widget = self.anki_log_text
+        widget.config(state='normal')
+        widget.insert(tk.END, "\n".join(lines) + "\n")
+        # 'end-1c' fica na linha vazia após a última quebra
+        excess = int(widget.index('end-1c').split('.')[0]) - 1 - LOG_MAX_LINES
+        if excess > 0:
+            widget.delete('1.0', f'{excess + 1}.0')
+        widget.see(tk.END)
+        widget.config(state='disabled')
+
+    def _clear_anki_log(self):
+        self.anki_log_text.config(state='normal')
+        self.anki_log_text.delete(1.0, tk.END)
+        self.anki_log_text.config(state='disabled')
+
+    # Métodos para aba Anki
+    def log_anki(self, msg):
+        # Chamado também pela thread do backend
+        self._events.put(('log', msg))
+
+    def update_anki_progress(self, curr, total):
+        # Chamado a cada linha; o loop do Tk exibe só o último valor
+        self._anki_progress = (curr, total)
+
+    def _detect_csv_columns(self, csv_path):
+        """FIX-009: Detecta colunas do CSV uma vez para evitar leitura duplicada.
+        PERF-021: A inspeção fica em cache e o pipeline reaproveita encoding e dialeto."""
+        try:
+            return list(inspect_csv(csv_path).fieldnames)
+        except (IOError, OSError) as e:
+            return None
+        except Exception as e:
+            return None
+
+    def browse_anki(self):
+        f = filedialog.askopenfilename(filetypes=[("CSV, TSV ou XLSX", " ".join(TABLE_PATTERNS)), ("CSV", "*.csv")])
+        if f: 
+            # Definir o caminho do arquivo primeiro (para mostrar no campo)
+            self.anki_file_path.set(f)
+            # Forçar atualização do Entry
+            self.update_idletasks()
+            
+            # FIX-009: Detectar colunas uma vez e passar para o diálogo
+            columns = self._detect_csv_columns(f)
+            if not columns:
+                messagebox.showerror("Erro", "Não foi possível ler as colunas do CSV.")
+                return
+            
+            # Abrir diálogo de mapeamento passando colunas já detectadas
+            dialog = ColumnMappingDialog(self, f, columns)
+            self.wait_window(dialog)
+            
+            if dialog.result:
+                self.column_mapping = dialog.result
+                self.log_anki(f"✓ CSV carregado: {len(dialog.result['selected_columns'])} colunas selecionadas")
+                self.log_anki(f"✓ Fonte de áudio: {dialog.result['audio_source']}")
+                self.log_anki(f"✓ Áudio será inserido em: {dialog.result.get('audio_target', dialog.result['audio_source'])}")
+                self.log_anki(f"✓ Coluna-chave: {dialog.result['key_column']}")
+            else:
+                # Usuário cancelou o mapeamento, mas mantém o arquivo selecionado
+                # Limpar apenas o mapeamento, não o arquivo
+                if hasattr(self, 'column_mapping'):
+                    delattr(self, 'column_mapping')
+                self.log_anki("⚠ Mapeamento cancelado. Selecione o arquivo novamente para configurar.")
+
+    def start_anki(self):
+        if not self.anki_file_path.get():
+            messagebox.showwarning("Aviso", "Selecione o CSV.")
+            return
+        
+        # Verificar se há mapeamento (modo flexível) ou usar modo legado
+        column_mapping = getattr(self, 'column_mapping', None)
+        
+        self.anki_btn_run.config(state='disabled')
+        # Pela fila, para não apagar logs ainda pendentes depois de exibidos
+        self._post(self._clear_anki_log)
+        
+        backend = AnkiBuilderBackend(self.log_anki, self.update_anki_progress)
+        # Variáveis do Tk lidas aqui, na thread principal
+        args = (backend, self.anki_file_path.get(), self.anki_voice_var.get(), self.anki_speed_var.get(),
+                column_mapping)
+        # FIX-015: Thread não-daemon para garantir conclusão
+        thread = threading.Thread(target=self.run_anki_thread, args=args, daemon=False)
+        thread.start()
+        # Armazenar thread para possível join futuro
+        self.anki_thread = thread
+
+    def run_anki_thread(self, backend, csv_f, voice, speed, column_mapping):
+        success = asyncio.run(backend.run_pipeline(csv_f, voice, speed, column_mapping))
+        
+        # Atualizar UI na thread principal
+        self._post(lambda: self.finish_anki_process(success))
+
+    def finish_anki_process(self, success):
+        self.anki_btn_run.config(state='normal')
+        if success:
+            messagebox.showinfo("Sucesso", f"Deck gerado com sucesso!\n{success}")
+        else:
+            messagebox.showerror("Erro", "Houve um erro ao gerar o deck. Verifique o log.")
+
+    # Métodos para aba Narrator
+    def get_clean_speed(self):
+        raw = self.narrator_speed_var.get()
+        return raw.split(" ")[0]
+
+    def save_narrator_audio(self):
+        text_content = self.narrator_text_area.get("1.0", tk.END).strip()
+        
+        if not text_content:
+            messagebox.showwarning("Aviso", "A caixa de texto está vazia.")
+            return
+
+        # Escolher onde salvar
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".mp3",
+            filetypes=[("MP3 Audio", "*.mp3")],
+            title="Salvar Narração Como..."
+        )
+
+        if not file_path:
+            return
+
+        # Bloqueia UI
+        self.narrator_btn_save.config(state="disabled", text="GERANDO ÁUDIO... AGUARDE")
+        self.narrator_text_area.config(state="disabled")
+        self.narrator_status_var.set("Processando texto...")
+
+        args = (text_content, file_path, VOICES[self.narrator_voice_var.get()], self.get_clean_speed())
+        # FIX-015: Thread não-daemon para garantir conclusão
+        thread = threading.Thread(target=self.run_narrator_thread, args=args, daemon=False)
+        thread.start()
+        # Armazenar thread para possível join futuro
+        self.narrator_thread = thread
+
+    def run_narrator_thread(self, text, filepath, voice_code, speed):
+        backend = NarratorBackend(self.update_narrator_status)
+        success = asyncio.run(backend.generate_long_audio(text, filepath, voice_code, speed))
+
+        # Restaura UI na thread principal
+        self._post(lambda: self.finish_narrator_process(success))
+
+    def update_narrator_status(self, message):
+        # Thread-safe: o loop do Tk exibe só o status mais recente
+        self._narrator_status = message
+
+    def finish_narrator_process(self, success):
+        self.narrator_btn_save.config(state="normal", text="GERAR MP3 DA HISTÓRIA")
+        self.narrator_text_area.config(state="normal")
+        if success:
+            messagebox.showinfo("Sucesso", "Narração concluída!")
+        else:
+            messagebox.showerror("Erro", "Houve um erro ao gerar a narração.")
+
+
+def main():
+    app = AnkiStudioApp()
+    app.mainloop()
+
+
+if __name__ == "__main__":
+    main()
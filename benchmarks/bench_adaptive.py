@@ -0,0 +1,71 @@
+"""Benchmark: limite fixo vs. controle adaptativo (AIMD) de concorrência.
+
+O FakeTTSEngine aceita no máximo --capacity requisições simultâneas; acima
+disso recusa com erro após --throttle-delay segundos, como um serviço sob
+throttling. Compara limites fixos abaixo/acima da capacidade com o
+AdaptiveLimiter, que deve convergir para perto da capacidade. A vazão conta só
+as linhas com áudio; as que falharam aparecem ao lado.
+
+Uso:
+    python benchmarks/bench_adaptive.py --rows 2000 --capacity 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anky_studio  # noqa: E402
+
+
+async def run(backend, limiter, texts, temp_dir):
+    """Devolve quantas linhas terminaram com áudio"""
+    ok = []
+
+    async def handle(item):
+        i, text = item
+        if await backend.generate_audio(text, os.path.join(temp_dir, f"a_{i}.mp3"), "voice", "+0%", limiter):
+            ok.append(i)
+
+    await anky_studio.run_worker_pool(enumerate(texts), handle, limiter.maximum * 2)
+    return len(ok)
+
+
+def measure(name, limiter, texts, args):
+    engine = anky_studio.FakeTTSEngine(
+        latency=args.median, tail_alpha=args.alpha, capacity=args.capacity,
+        throttle_delay=args.throttle_delay, seed=args.seed,
+    )
+    backend = anky_studio.AnkiBuilderBackend(lambda msg: None, lambda curr, total: None, cache=False, engine=engine)
+    limiter.log = None
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        succeeded = asyncio.run(run(backend, limiter, texts, temp_dir))
+        elapsed = time.perf_counter() - start
+    print(f"{name:<14} {elapsed:8.2f} s  {succeeded / elapsed:8.1f} linhas ok/s  "
+          f"{len(texts) - succeeded:4d} falhas  {limiter.errors:5d} recusas  {limiter.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--capacity', type=int, default=40, help="requisições simultâneas aceitas pelo serviço")
+    parser.add_argument('--throttle-delay', type=float, default=0.5)
+    parser.add_argument('--median', type=float, default=0.1)
+    parser.add_argument('--alpha', type=float, default=3.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    texts = [f"sentence number {i}" for i in range(args.rows)]
+    print(f"{args.rows} linhas, capacidade do serviço {args.capacity}, mediana {args.median}s")
+    measure("fixo 20", anky_studio.AdaptiveLimiter(fixed=20), texts, args)
+    measure(f"fixo {anky_studio.MAX_CONCURRENCY_CEILING}",
+            anky_studio.AdaptiveLimiter(fixed=anky_studio.MAX_CONCURRENCY_CEILING), texts, args)
+    measure("adaptativo", anky_studio.AdaptiveLimiter(), texts, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Benchmark de ponta a ponta: run_pipeline (modos legado e mapeado) e NarratorBackend.
+
+Roda sem rede, com o FakeTTSEngine (latência mediana, cauda Pareto e taxa de
+erro configuráveis), sobre CSVs sintéticos de 1k/10k/100k linhas. Cada cenário
+roda num processo novo, para que o pico de RSS seja só dele. Reporta linhas/s,
+pico de RSS, tempo por fase (do <deck>.metrics.json) e tamanho do pacote, e
+grava tudo em JSON para comparar execuções.
+
+Com --long-ratio, essa fração das linhas ganha um parágrafo longo, concentrado
+no fim do CSV; com --per-char a latência simulada cresce com o texto. Assim
+--schedule csv,longest compara o tempo total das duas ordens de síntese.
+
+Uso:
+    python benchmarks/bench_pipeline.py --rows 1000,10000 --output antes.json
+    python benchmarks/bench_pipeline.py --modes narrator --narration-chars 500000
+    python benchmarks/bench_pipeline.py --modes mapped --rows 2000 --long-ratio 0.05 \\
+        --per-char 0.002 --schedule csv,longest
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import anky_studio  # noqa: E402
+
+LEGACY_COLUMNS = ['Target Word', 'Audio Script', 'Cloze Sentence', 'IPA',
+                  'Simple Definition', 'PT Translation', 'Image Query']
+VOICE = "Inglês (US) - Christopher (M)"
+
+
+def write_csv(path, rows, dup_ratio, seed, long_ratio=0.0):
+    """CSV no layout legado; dup_ratio das linhas repete o script de uma linha anterior
+    e as últimas long_ratio das linhas têm um parágrafo ~20x mais longo"""
+    unique = max(1, int(rows * (1 - dup_ratio)))
+    long_from = rows - int(rows * long_ratio)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(LEGACY_COLUMNS)
+        for i in range(rows):
+            script = f"Sentence {i % unique} for seed {seed}, with a few more words."
+            if i >= long_from:
+                script = f"Paragraph {i}: " + script * 20
+            writer.writerow([f"word{i}", script, f"Cloze {{{{c1::word{i}}}}} here.", "/wɜːd/",
+                             "a short definition", f"palavra {i}", f"image {i}"])
+
+
+def peak_rss_mb():
+    # ru_maxrss é em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_engine(params):
+    return anky_studio.FakeTTSEngine(
+        latency=params['median'], tail_alpha=params['alpha'], error_rate=params['error_rate'],
+        output_size=params['output_size'], per_char=params['per_char'], seed=params['seed'],
+    )
+
+
+def run_deck(params, work_dir):
+    csv_path = os.path.join(work_dir, "bench.csv")
+    write_csv(csv_path, params['rows'], params['dup_ratio'], params['seed'], params['long_ratio'])
+    output_pkg = os.path.join(work_dir, "bench.apkg")
+    mapping = None
+    if params['mode'] == 'mapped':
+        mapping = {'audio_source': 'Audio Script', 'audio_target': 'Audio Script',
+                   'selected_columns': LEGACY_COLUMNS, 'key_column': 'Target Word'}
+    errors = []
+    backend = anky_studio.AnkiBuilderBackend(
+        lambda msg: errors.append(msg) if msg.startswith("[ERRO") else None,
+        lambda curr, total: None,
+        cache=False, concurrency=params['concurrency'], engine=make_engine(params),
+        schedule=params['schedule'],
+    )
+    start = time.perf_counter()
+    ok = bool(asyncio.run(backend.run_pipeline(csv_path, VOICE, "+0%", mapping, output_pkg)))
+    elapsed = time.perf_counter() - start
+    result = {'ok': ok, 'wall_s': round(elapsed, 3), 'rows_per_s': round(params['rows'] / elapsed, 1),
+              'errors': errors[:5]}
+    if ok:
+        with open(anky_studio.metrics_path_for(output_pkg), encoding='utf-8') as f:
+            metrics = json.load(f)
+        result.update({
+            'phases_s': metrics['phases_s'],
+            'package_bytes': metrics['package']['bytes'],
+            'media_files': metrics['package']['media_files'],
+            'tts_requests': metrics['tts']['requests'],
+            'tts_p95_s': metrics['tts']['latency_s']['p95'],
+            'final_limit': metrics['concurrency']['final_limit'],
+        })
+    return result
+
+
+def run_narrator(params, work_dir):
+    sentence = "The quick brown fox jumps over the lazy dog near the quiet river bank. "
+    text = sentence * max(1, params['narration_chars'] // len(sentence))
+    output = os.path.join(work_dir, "bench.mp3")
+    statuses = []
+    backend = anky_studio.NarratorBackend(statuses.append, engine=make_engine(params))
+    start = time.perf_counter()
+    ok = asyncio.run(backend.generate_long_audio(text, output, "en-US-ChristopherNeural", "+0%"))
+    elapsed = time.perf_counter() - start
+    chunks = len(anky_studio.split_text_into_chunks(text, backend.chunk_chars))
+    return {'ok': ok, 'wall_s': round(elapsed, 3), 'chars_per_s': round(len(text) / elapsed, 1),
+            'chunks': chunks, 'output_bytes': os.path.getsize(output) if ok else 0,
+            'last_status': statuses[-1] if statuses else None}
+
+
+def run_scenario(params):
+    """Executado num processo novo (spawn)"""
+    with tempfile.TemporaryDirectory(dir=params['work_dir']) as work_dir:
+        # A vazão do motor falso não entra no histórico usado pelo ETA dos builds reais
+        anky_studio.THROUGHPUT_HISTORY = os.path.join(work_dir, "throughput.jsonl")
+        if params['mode'] == 'narrator':
+            result = run_narrator(params, work_dir)
+        else:
+            result = run_deck(params, work_dir)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'commit': commit or None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default="1000,10000,100000", help="tamanhos dos CSVs, separados por vírgula")
+    parser.add_argument('--modes', default="legacy,mapped,narrator", help="legacy, mapped e/ou narrator")
+    parser.add_argument('--median', type=float, default=0.05, help="latência mediana do TTS simulado (s)")
+    parser.add_argument('--alpha', type=float, default=3.0, help="cauda Pareto da latência (0 = fixa)")
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--output-size', type=int, default=4000, help="bytes por áudio simulado")
+    parser.add_argument('--dup-ratio', type=float, default=0.1, help="fração de linhas com script repetido")
+    parser.add_argument('--concurrency', type=int, help="limite fixo (padrão: adaptativo)")
+    parser.add_argument('--long-ratio', type=float, default=0.0, help="fração de linhas longas, no fim do CSV")
+    parser.add_argument('--per-char', type=float, default=0.0, help="latência extra por caractere (s)")
+    parser.add_argument('--schedule', default="csv", help="csv e/ou longest, separados por vírgula")
+    parser.add_argument('--narration-chars', type=int, default=200_000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--work-dir', help="onde criar CSVs e pacotes (padrão: diretório temporário)")
+    parser.add_argument('--output', default="bench_pipeline.json", help="arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    base = {
+        'median': args.median, 'alpha': args.alpha or None, 'error_rate': args.error_rate,
+        'output_size': args.output_size, 'dup_ratio': args.dup_ratio, 'concurrency': args.concurrency,
+        'narration_chars': args.narration_chars, 'seed': args.seed, 'work_dir': args.work_dir,
+        'long_ratio': args.long_ratio, 'per_char': args.per_char,
+    }
+    scenarios = []
+    for mode in args.modes.split(','):
+        if mode == 'narrator':
+            scenarios.append(dict(base, mode=mode, rows=None, schedule=None))
+        else:
+            scenarios += [dict(base, mode=mode, rows=int(rows), schedule=schedule)
+                          for rows in args.rows.split(',') for schedule in args.schedule.split(',')]
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for params in scenarios:
+        label = f"{params['mode']}" + (f" {params['rows']}" if params['rows'] else "")
+        if params['schedule'] and params['schedule'] != 'csv':
+            label += f" {params['schedule']}"
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_scenario, params).result()
+        results.append({'scenario': label, 'params': params, **result})
+        rate = (f"{result['rows_per_s']:9.1f} linhas/s" if 'rows_per_s' in result
+                else f"{result['chars_per_s']:9.0f} car/s ")
+        size = result.get('package_bytes', result.get('output_bytes', 0)) / 1_000_000
+        print(f"{label:<24} {'ok ' if result['ok'] else 'ERRO'} {result['wall_s']:8.2f} s  {rate}  "
+              f"RSS {result['peak_rss_mb']:7.1f} MB  saída {size:8.1f} MB  {result.get('phases_s', '')}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': environment(),
+                   'results': results}, f, ensure_ascii=False, indent=2)
+    print(f"Resultados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark da leitura de linhas: csv.DictReader (leitor antigo) x CsvSchema.rows().
+
+Gera um CSV sintético largo (várias colunas, só algumas mapeadas) e mede o tempo
+para percorrer todas as linhas lendo as colunas mapeadas, como o process_row
+faz. Cada leitor roda num processo novo, para que o pico de RSS seja só dele.
+O leitor pyarrow só entra se o pacote estiver instalado.
+
+Uso:
+    python benchmarks/bench_reader.py --rows 500000
+    python benchmarks/bench_reader.py --rows 100000 --columns 20 --mapped 3 --output leitura.json
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import anky_studio  # noqa: E402
+
+
+def write_csv(path, rows, columns):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([f"col{index}" for index in range(columns)])
+        for i in range(rows):
+            writer.writerow([f"word{i}", f"Sentence number {i}, with a comma and a few more words."]
+                            + [f"value {i}-{index}" for index in range(2, columns)])
+
+
+def read_dictreader(path, mapped):
+    # Como o _build_deck antes do PERF-022
+    with open(path, encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            for name in mapped:
+                row.get(name, '')
+            yield
+
+
+def read_schema(path, mapped):
+    for row in anky_studio.inspect_csv(path).rows(mapped):
+        for name in mapped:
+            row.get(name, '')
+        yield
+
+
+def run_reader(params):
+    """Executado num processo novo (spawn)"""
+    os.environ['ANKI_STUDIO_CSV_READER'] = params['backend']
+    anky_studio.CSV_READER = params['backend']
+    mapped = [f"col{index}" for index in range(params['mapped'])]
+    read = read_dictreader if params['reader'] == 'dictreader' else read_schema
+    start = time.perf_counter()
+    rows = sum(1 for _ in read(params['path'], mapped))
+    elapsed = time.perf_counter() - start
+    return {'rows': rows, 'wall_s': round(elapsed, 3), 'rows_per_s': round(rows / elapsed),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--columns', type=int, default=12, help="colunas no CSV")
+    parser.add_argument('--mapped', type=int, default=4, help="colunas lidas por linha")
+    parser.add_argument('--work-dir', help="onde criar o CSV (padrão: diretório temporário)")
+    parser.add_argument('--output', default="bench_reader.json", help="arquivo JSON de resultados")
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+        readers = [('dictreader', 'stdlib'), ('schema', 'stdlib'), ('schema', 'pyarrow')]
+    except ImportError:
+        readers = [('dictreader', 'stdlib'), ('schema', 'stdlib')]
+        print("pyarrow não instalado: só a stdlib")
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        path = os.path.join(work_dir, "bench.csv")
+        write_csv(path, args.rows, args.columns)
+        size_mb = os.path.getsize(path) / 1_000_000
+        print(f"CSV: {args.rows} linhas, {args.columns} colunas, {size_mb:.1f} MB")
+        for reader, backend in readers:
+            params = {'reader': reader, 'backend': backend, 'path': path, 'mapped': args.mapped}
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_reader, params).result()
+            label = reader if reader == 'dictreader' else f"{reader}/{backend}"
+            results.append({'reader': label, **result})
+            print(f"{label:<16} {result['wall_s']:8.2f} s  {result['rows_per_s']:>10} linhas/s  "
+                  f"RSS {result['peak_rss_mb']:7.1f} MB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'rows': args.rows,
+                   'columns': args.columns, 'mapped': args.mapped, 'csv_mb': round(size_mb, 1),
+                   'results': results}, f, ensure_ascii=False, indent=2)
+    print(f"Resultados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
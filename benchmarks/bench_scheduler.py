@@ -0,0 +1,76 @@
+"""Benchmark: lotes fixos de 100 tarefas (FIX-001) vs. escalonador contínuo.
+
+Usa o FakeTTSEngine, sem rede, com latência de cauda pesada (Pareto) e uma
+fração de falhas que dispara o backoff de generate_audio. As duas estratégias
+chamam o mesmo AnkiBuilderBackend.generate_audio; só o escalonamento muda.
+
+Uso:
+    python benchmarks/bench_scheduler.py --rows 1000 --seed 1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anky_studio  # noqa: E402
+
+
+async def run_batches(backend, texts, temp_dir):
+    """Laço antigo: gather em fatias de 100 + pausa de 0,1 s"""
+    limiter = anky_studio.AdaptiveLimiter(fixed=anky_studio.MAX_CONCURRENCY)
+    tasks = [
+        backend.generate_audio(text, os.path.join(temp_dir, f"b_{i}.mp3"), "voice", "+0%", limiter)
+        for i, text in enumerate(texts)
+    ]
+    for batch_start in range(0, len(tasks), 100):
+        await asyncio.gather(*tasks[batch_start:batch_start + 100])
+        await asyncio.sleep(0.1)
+
+
+async def run_continuous(backend, texts, temp_dir):
+    limiter = anky_studio.AdaptiveLimiter(fixed=anky_studio.MAX_CONCURRENCY)
+
+    async def handle(item):
+        i, text = item
+        await backend.generate_audio(text, os.path.join(temp_dir, f"c_{i}.mp3"), "voice", "+0%", limiter)
+
+    await anky_studio.run_worker_pool(enumerate(texts), handle, limiter.maximum * 2)
+
+
+def measure(name, runner, texts, args):
+    engine = anky_studio.FakeTTSEngine(
+        latency=args.median, tail_alpha=args.alpha, error_rate=args.error_rate, seed=args.seed,
+    )
+    backend = anky_studio.AnkiBuilderBackend(lambda msg: None, lambda curr, total: None, cache=False, engine=engine)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        asyncio.run(runner(backend, texts, temp_dir))
+        elapsed = time.perf_counter() - start
+    rate = len(texts) / elapsed
+    print(f"{name:<12} {elapsed:8.2f} s  {rate:8.1f} linhas/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--median', type=float, default=0.1, help="latência mediana em segundos")
+    parser.add_argument('--alpha', type=float, default=1.5, help="forma da cauda Pareto (menor = cauda mais pesada)")
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    texts = [f"sentence number {i}" for i in range(args.rows)]
+    print(f"{args.rows} linhas, {anky_studio.MAX_CONCURRENCY} vagas, mediana {args.median}s, "
+          f"alpha {args.alpha}, erros {args.error_rate:.1%}")
+    batch = measure("lotes-100", run_batches, texts, args)
+    continuous = measure("contínuo", run_continuous, texts, args)
+    print(f"ganho: {continuous / batch:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
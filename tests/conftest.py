@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import anky_studio  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_history(tmp_path, monkeypatch):
+    # O histórico de vazão nunca sai do diretório do teste
+    monkeypatch.setattr(anky_studio, 'THROUGHPUT_HISTORY', str(tmp_path / "throughput.jsonl"))
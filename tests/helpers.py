@@ -0,0 +1,48 @@
+"""Funções comuns aos testes: CSVs de entrada, builds com o FakeTTSEngine e leitura do .apkg"""
+import asyncio
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import zipfile
+
+import anky_studio
+
+VOICE = "Inglês (US) - Christopher (M)"
+
+
+def write_csv(path, rows, header=('Word', 'Script')):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def make_backend(engine=None, logs=None, **options):
+    logs = [] if logs is None else logs
+    options.setdefault('cache', False)
+    return anky_studio.AnkiBuilderBackend(logs.append, lambda curr, total: None,
+                                          engine=engine or anky_studio.FakeTTSEngine(latency=0.001), **options)
+
+
+def build(csv_path, output_pkg, backend=None, mapping=None, variants=None, **options):
+    mapping = mapping or {'audio_source': 'Script', 'selected_columns': ['Word', 'Script'], 'key_column': 'Word'}
+    backend = backend or make_backend(**options)
+    return asyncio.run(backend.run_pipeline(str(csv_path), VOICE, "+0%", mapping, str(output_pkg), variants))
+
+
+def read_package(output_pkg):
+    """(deck, notas em ordem de id como [(guid, campos)], nomes da mídia) de um .apkg"""
+    with zipfile.ZipFile(output_pkg) as z, tempfile.TemporaryDirectory() as tmp:
+        z.extract('collection.anki2', tmp)
+        media = sorted(json.loads(z.read('media')).values())
+        db = sqlite3.connect(os.path.join(tmp, 'collection.anki2'))
+        try:
+            decks = json.loads(db.execute('SELECT decks FROM col').fetchone()[0])
+            notes = [(guid, flds.split('\x1f')) for guid, flds in db.execute('SELECT guid, flds FROM notes ORDER BY id')]
+        finally:
+            db.close()
+    deck = next(d for d in decks.values() if d['name'] != 'Default')
+    return deck, notes, media
@@ -0,0 +1,37 @@
+import asyncio
+import os
+
+import anky_studio
+from helpers import VOICE, make_backend, read_package, write_csv
+
+
+def test_batch_names_keep_unique_names_and_separate_repeated_ones(tmp_path):
+    paths = [str(tmp_path / "l1" / "vocab.csv"), str(tmp_path / "l2" / "vocab.csv"), str(tmp_path / "verbs.csv")]
+    assert anky_studio.batch_deck_names(paths) == {paths[0]: "l1_vocab", paths[1]: "l2_vocab", paths[2]: "verbs"}
+
+
+def test_same_named_csvs_build_distinct_decks(tmp_path):
+    paths = []
+    for folder, script in (("l1", "Hello in lesson one."), ("l2", "Hello in lesson two.")):
+        os.makedirs(tmp_path / folder)
+        paths.append(write_csv(tmp_path / folder / "vocab.csv", [("hello", script)]))
+    logs = []
+    backend = make_backend(logs=logs)
+    mapping = {'audio_source': 'Script', 'selected_columns': ['Word', 'Script'], 'key_column': 'Word'}
+    os.makedirs(tmp_path / "out")
+    results = asyncio.run(backend.run_batch(paths, VOICE, "+0%", mapping, output_dir=str(tmp_path / "out")))
+    assert all(results.values())
+
+    decks = [read_package(tmp_path / "out" / f"{name}_Complete.apkg") for name in ("l1_vocab", "l2_vocab")]
+    (deck1, notes1, _), (deck2, notes2, _) = decks
+    assert {deck1['name'], deck2['name']} == {"l1_vocab", "l2_vocab"}
+    assert deck1['id'] != deck2['id']
+    assert notes1[0][0] != notes2[0][0]  # GUIDs da chave "hello"
+    assert any(msg.startswith(f"[{paths[0]}]") for msg in logs)
+
+
+def test_directories_expand_to_every_supported_table(tmp_path):
+    for name in ("a.csv", "b.tsv", "c.tab", "d.xlsx", "e.xlsm", "notes.txt"):
+        (tmp_path / name).write_text("", encoding='utf-8')
+    found = anky_studio.expand_csv_inputs([str(tmp_path)])
+    assert sorted(os.path.basename(path) for path in found) == ["a.csv", "b.tsv", "c.tab", "d.xlsx", "e.xlsm"]
@@ -0,0 +1,86 @@
+import os
+
+import anky_studio
+from helpers import build, make_backend, read_package, write_csv
+
+
+class CrashingEngine(anky_studio.FakeTTSEngine):
+    """Serviço que cai de vez depois de `healthy` áudios"""
+
+    def __init__(self, healthy):
+        super().__init__(latency=0.001)
+        self.healthy = healthy
+
+    async def stream(self, text, voice, rate):
+        if self.calls >= self.healthy:
+            self.calls += 1
+            raise anky_studio.FakeTTSError("503 Service Unavailable (simulado)")
+        async for chunk in super().stream(text, voice, rate):
+            yield chunk
+
+
+ROWS = [(f"w{i}", f"Sentence {i}.") for i in range(6)]
+
+
+def interrupt(tmp_path, healthy=3):
+    csv_path = write_csv(tmp_path / "vocab.csv", ROWS)
+    policy = anky_studio.RetryPolicy(max_attempts=1, breaker_threshold=2, final_pass_delay=0)
+    assert not build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(
+        engine=CrashingEngine(healthy), concurrency=1, retry_policy=policy))
+    assert not os.path.exists(tmp_path / "vocab.apkg")
+    return csv_path
+
+
+def test_interrupted_build_resumes_from_the_job(tmp_path):
+    csv_path = interrupt(tmp_path)
+    assert os.path.isdir(tmp_path / "vocab.job")
+
+    engine = anky_studio.FakeTTSEngine(latency=0.001)
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(engine=engine, logs=logs))
+    assert "--- Retomando build interrompido: 3 de 6 linhas já concluídas ---" in logs
+    assert engine.calls == 3
+    _, notes, media = read_package(tmp_path / "vocab.apkg")
+    assert [fields[0] for _, fields in notes] == [word for word, _ in ROWS]
+    assert len(media) == 6
+    assert not os.path.exists(tmp_path / "vocab.job")
+
+
+def test_job_from_another_input_is_discarded(tmp_path):
+    interrupt(tmp_path)
+    csv_path = write_csv(tmp_path / "vocab.csv", ROWS + [("w6", "Sentence 6.")])
+    engine = anky_studio.FakeTTSEngine(latency=0.001)
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(engine=engine, logs=logs))
+    assert any("descartado" in line for line in logs)
+    assert engine.calls == 7
+
+
+def test_truncated_journal_line_is_ignored(tmp_path):
+    csv_path = interrupt(tmp_path)
+    journal = tmp_path / "vocab.job" / "journal.jsonl"
+    lines = journal.read_text(encoding='utf-8').splitlines(keepends=True)
+    journal.write_text(lines[0] + lines[1][:10], encoding='utf-8')
+
+    engine = anky_studio.FakeTTSEngine(latency=0.001)
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(engine=engine, logs=logs))
+    assert "--- Retomando build interrompido: 1 de 6 linhas já concluídas ---" in logs
+    assert len(read_package(tmp_path / "vocab.apkg")[1]) == 6
+
+
+def test_rejected_build_leaves_no_job(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", ROWS + [("empty", "")])
+    assert not build(csv_path, tmp_path / "vocab.apkg", preflight='strict')
+    assert not os.path.exists(tmp_path / "vocab.job")
+
+
+def test_rejected_build_keeps_an_interrupted_job(tmp_path):
+    interrupt(tmp_path)
+    csv_path = tmp_path / "vocab.csv"
+    logs = []
+    backend = make_backend(logs=logs)
+    backend._check_disk_space = lambda required, directory='.': False
+    assert not build(csv_path, tmp_path / "vocab.apkg", backend=backend)
+    assert "--- Retomando build interrompido: 3 de 6 linhas já concluídas ---" in logs
+    assert len((tmp_path / "vocab.job" / "journal.jsonl").read_text(encoding='utf-8').splitlines()) == 3
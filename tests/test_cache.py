@@ -0,0 +1,34 @@
+import os
+
+import anky_studio
+
+
+def test_store_keeps_the_engine_extension(tmp_path):
+    cache = anky_studio.AudioCache(str(tmp_path))
+    cache.store("ab" * 32, b"RIFF....WAVE", anky_studio.EspeakEngine.extension)
+    assert os.path.exists(os.path.join(tmp_path, "ab", "ab" * 32 + ".wav"))
+
+    # Um processo novo reencontra o item pela varredura do diretório
+    reopened = anky_studio.AudioCache(str(tmp_path))
+    assert "ab" * 32 in reopened
+    assert reopened.read("ab" * 32) == b"RIFF....WAVE"
+
+
+def test_store_in_another_format_replaces_the_old_file(tmp_path):
+    cache = anky_studio.AudioCache(str(tmp_path))
+    key = "cd" * 32
+    cache.store(key, b"mp3 data")
+    cache.store(key, b"wav data", "wav")
+    assert sorted(os.listdir(os.path.join(tmp_path, "cd"))) == [key + ".wav"]
+    assert cache.read(key) == b"wav data"
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = anky_studio.AudioCache(str(tmp_path), max_bytes=25)
+    cache.store("aa" * 32, b"x" * 10, "wav")
+    cache.store("bb" * 32, b"x" * 10)
+    cache.read("aa" * 32)
+    cache.store("cc" * 32, b"x" * 10)
+    assert "bb" * 32 not in cache
+    assert "aa" * 32 in cache and "cc" * 32 in cache
+    assert not os.path.exists(cache.path_for("bb" * 32, "mp3"))
@@ -0,0 +1,16 @@
+import json
+
+import anky_studio
+from helpers import write_csv
+
+
+def test_deck_reports_the_default_output_path(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    write_csv(tmp_path / "vocab.csv", [("hello", "Hello there."), ("world", "Hello world.")])
+    code = anky_studio.main(['deck', 'vocab.csv', '--engine', 'fake', '--fake-latency', '0.001',
+                             '--no-cache', '--audio-source', 'Script', '--progress', 'json'])
+    assert code == 0
+    done = [json.loads(line) for line in capsys.readouterr().out.splitlines()][-1]
+    assert done['event'] == 'done' and done['success'] is True
+    assert done['output'] == "vocab_Complete.apkg"
+    assert (tmp_path / done['output']).exists()
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import anky_studio
+from helpers import write_csv
+
+
+@pytest.fixture(params=['stdlib', 'pyarrow'])
+def reader(request, monkeypatch):
+    if request.param == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    monkeypatch.setattr(anky_studio, 'CSV_READER', request.param)
+    return request.param
+
+
+def test_duplicate_headers_resolve_to_the_first_column(tmp_path, reader):
+    path = write_csv(tmp_path / "dup.csv", [("first", "Hello", "second")], header=("Word", "Script", "Word"))
+    schema = anky_studio.CsvSchema(path)
+    assert list(schema.rows(["Word", "Script"])) == [{'Word': 'first', 'Script': 'Hello'}]
+    assert schema.scan("Word") == (1, {}, 0)
+
+
+def test_readers_agree_on_quotes_multiline_and_short_rows(tmp_path, reader):
+    path = tmp_path / "mixed.csv"
+    path.write_text('Word;Script;Extra\n"a;b";"line one\nline two";x\n\nshort;"say ""hi"""\n', encoding='cp1252')
+    schema = anky_studio.CsvSchema(str(path))
+    assert schema.encoding == 'utf-8-sig' and schema.dialect.delimiter == ';'
+    assert list(schema.rows(["Word", "Script", "Extra"])) == [
+        {'Word': 'a;b', 'Script': 'line one\nline two', 'Extra': 'x'},
+        {'Word': 'short', 'Script': 'say "hi"', 'Extra': ''},
+    ]
+
+
+def test_inspect_csv_is_cached_until_the_file_changes(tmp_path):
+    path = write_csv(tmp_path / "vocab.csv", [("hello", "Hello there.")])
+    first = anky_studio.inspect_csv(path)
+    assert anky_studio.inspect_csv(path) is first
+    assert first.row_count == 1
+
+    write_csv(path, [("hello", "Hello there."), ("world", "Hello world.")])
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = anky_studio.inspect_csv(path)
+    assert second is not first
+    assert second.row_count == 2
+
+
+def test_tsv_and_encoding_detection(tmp_path):
+    path = tmp_path / "vocab.tsv"
+    path.write_bytes("Word\tScript\ncafé\tÇa va?\n".encode('cp1252'))
+    schema = anky_studio.inspect_csv(str(path))
+    assert schema.format == 'tsv' and schema.encoding == 'cp1252'
+    assert list(schema.rows(["Script"])) == [{'Script': 'Ça va?'}]
@@ -0,0 +1,52 @@
+import queue
+
+import pytest
+
+gui = pytest.importorskip("anky_studio_gui")
+
+
+class Recorder:
+    """Só os atributos de AnkiStudioApp que _drain_events usa, sem abrir janela"""
+
+    _drain_events = gui.AnkiStudioApp._drain_events
+
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+        self._anki_progress = None
+        self._narrator_status = None
+        self.lines = []
+        self.scheduled = []
+
+    def _append_anki_log(self, lines):
+        self.lines.extend(lines)
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+
+def test_failing_callback_does_not_stop_the_event_loop():
+    app = Recorder()
+    done = []
+    app._events.put(('log', "antes"))
+    app._events.put(('call', lambda: 1 / 0))
+    app._events.put(('call', lambda: done.append(True)))
+    app._events.put(('log', "depois"))
+    app._drain_events()
+
+    assert done == [True]
+    assert app.lines[0] == "antes" and app.lines[-1] == "depois"
+    assert any(line.startswith("[ERRO GUI] ZeroDivisionError") for line in app.lines)
+    assert len(app.scheduled) == 1
+
+
+def test_next_drain_is_scheduled_even_if_the_log_widget_fails():
+    app = Recorder()
+
+    def broken(lines):
+        raise RuntimeError("widget destruído")
+
+    app._append_anki_log = broken
+    app._events.put(('log', "linha"))
+    with pytest.raises(RuntimeError):
+        app._drain_events()
+    assert len(app.scheduled) == 1
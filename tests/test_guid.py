@@ -0,0 +1,56 @@
+import json
+
+import anky_studio
+from helpers import build, make_backend, read_package, write_csv
+
+
+def guids_by_word(output_pkg):
+    _, notes, _ = read_package(output_pkg)
+    return {fields[0]: guid for guid, fields in notes}
+
+
+def test_guid_follows_the_key_column_not_the_row_position(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("a", "Alpha."), ("b", "Beta.")])
+    assert build(csv_path, tmp_path / "first.apkg")
+    csv_path = write_csv(tmp_path / "vocab.csv", [("b", "Beta."), ("a", "Alpha."), ("c", "Gamma.")])
+    assert build(csv_path, tmp_path / "second.apkg")
+    first, second = guids_by_word(tmp_path / "first.apkg"), guids_by_word(tmp_path / "second.apkg")
+    assert second['a'] == first['a'] and second['b'] == first['b']
+    assert len(set(second.values())) == 3
+
+
+def test_key_collisions_warn_or_abort_with_strict_keys(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("a", "Alpha."), ("a", "Again."), ("", "Nothing.")])
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(logs=logs))
+    assert "[AVISO] Coluna-chave 'Word': 1 valores repetidos ('a' ×2)" in logs
+    assert "[AVISO] Coluna-chave 'Word': 1 linhas sem valor" in logs
+    _, notes, _ = read_package(tmp_path / "vocab.apkg")
+    assert len({guid for guid, _ in notes}) == 3
+
+    logs = []
+    assert not build(csv_path, tmp_path / "strict.apkg", backend=make_backend(logs=logs, strict_keys=True))
+    assert "[ERRO] Coluna-chave 'Word': 1 valores repetidos ('a' ×2)" in logs
+
+
+def test_generated_keys_never_collide_with_literal_keys(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("a", "Alpha."), ("a", "Again."), ("a#2", "Literal.")])
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(logs=logs))
+    assert "[AVISO] Coluna-chave 'Word': 2 valores repetidos ('a' ×2, 'a#2' ×2)" in logs
+    _, notes, _ = read_package(tmp_path / "vocab.apkg")
+    assert len({guid for guid, _ in notes}) == 3
+    with open(tmp_path / "vocab.manifest.json", encoding='utf-8') as f:
+        assert sorted(json.load(f)['rows']) == ['a', 'a#2', 'a#2#2']
+
+    # O rebuild encontra cada linha no manifesto
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(logs=logs))
+    assert any("0 novas, 0 alteradas, 3 inalteradas, 0 removidas" in line for line in logs)
+
+
+def test_row_keys_skip_every_key_already_taken():
+    keys = anky_studio.RowKeys()
+    assert [keys.assign(value, number) for number, value in enumerate(["a", "a#2", "a", "", "#linha4"], 1)] == \
+        ["a", "a#2", "a#3", "#linha4", "#linha4#2"]
+    assert keys.clashes == {'a#2': 1}
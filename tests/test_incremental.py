@@ -0,0 +1,34 @@
+import anky_studio
+from helpers import build, make_backend, read_package, write_csv
+
+
+def rebuild(tmp_path, rows):
+    """Gera vocab.apkg a partir de rows; devolve (logs, chamadas ao motor, pacote)"""
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    engine = anky_studio.FakeTTSEngine(latency=0.001)
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(engine=engine, logs=logs))
+    return logs, engine.calls, read_package(tmp_path / "vocab.apkg")
+
+
+def test_rebuild_reuses_unchanged_audio_and_keeps_guids(tmp_path):
+    _, calls, (_, notes, _) = rebuild(tmp_path, [("a", "Alpha."), ("b", "Beta."), ("c", "Gamma.")])
+    assert calls == 3
+    guids = {fields[0]: guid for guid, fields in notes}
+
+    logs, calls, (_, notes, media) = rebuild(tmp_path, [("a", "Alpha."), ("b", "Beta, revised."), ("d", "Delta.")])
+    assert calls == 2  # só o texto alterado e a linha nova
+    assert ("--- Incremental: 1 novas, 1 alteradas, 1 inalteradas, 1 removidas; "
+            "1 áudios reaproveitados do pacote anterior ---") in logs
+    assert {fields[0]: guid for guid, fields in notes}.items() >= {'a': guids['a'], 'b': guids['b']}.items()
+    assert len(media) == 3
+
+
+def test_unchanged_rebuild_synthesizes_nothing(tmp_path):
+    rows = [("a", "Alpha."), ("b", "Beta.")]
+    rebuild(tmp_path, rows)
+    logs, calls, (_, notes, media) = rebuild(tmp_path, rows)
+    assert calls == 0
+    assert len(notes) == 2 and len(media) == 2
+    assert any("0 novas, 0 alteradas, 2 inalteradas, 0 removidas" in line for line in logs)
+
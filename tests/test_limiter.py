@@ -0,0 +1,75 @@
+import asyncio
+
+import anky_studio
+
+
+def test_limit_grows_by_one_per_healthy_round():
+    limiter = anky_studio.AdaptiveLimiter(initial=4, minimum=1, maximum=6)
+    for _ in range(4):
+        limiter.record_success(0.1)
+    assert limiter.limit == 5
+    for _ in range(4):
+        limiter.record_success(0.1)
+    assert limiter.limit == 5  # a rodada agora é de 5 sucessos
+    limiter.record_success(0.1)
+    assert limiter.limit == 6
+    for _ in range(20):
+        limiter.record_success(0.1)
+    assert limiter.limit == 6  # teto
+
+
+def test_slow_round_does_not_grow():
+    limiter = anky_studio.AdaptiveLimiter(initial=4, minimum=1, maximum=10)
+    for _ in range(4):
+        limiter.record_success(0.1)
+    for _ in range(5):
+        limiter.record_success(1.0)
+    assert limiter.limit == 5
+
+
+def test_weighted_success_counts_its_chunks():
+    limiter = anky_studio.AdaptiveLimiter(initial=4, minimum=1, maximum=10)
+    limiter.record_success(0.1, weight=4)
+    assert limiter.limit == 5
+
+
+def test_errors_halve_once_per_wave(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(anky_studio.time, 'monotonic', lambda: clock[0])
+    logs = []
+    limiter = anky_studio.AdaptiveLimiter(initial=16, minimum=2, maximum=32, log=logs.append)
+    limiter.record_error("timeout")
+    limiter.record_error("timeout")
+    assert limiter.limit == 8 and limiter.errors == 2
+    clock[0] += 1.5
+    limiter.record_error("429")
+    assert limiter.limit == 4
+    for _ in range(3):
+        clock[0] += 1.5
+        limiter.record_error("429")
+    assert limiter.limit == 2  # piso
+    assert len(logs) == 3  # no piso não há corte a relatar
+
+
+def test_fixed_limit_never_moves(monkeypatch):
+    limiter = anky_studio.AdaptiveLimiter(fixed=3)
+    for _ in range(10):
+        limiter.record_success(0.1)
+    limiter.record_error("timeout")
+    assert limiter.limit == 3 and limiter.p50 == 0.1
+
+
+def test_in_flight_never_exceeds_the_limit():
+    limiter = anky_studio.AdaptiveLimiter(fixed=3)
+    peak = []
+
+    async def task():
+        async with limiter:
+            peak.append(limiter.in_flight)
+            await asyncio.sleep(0.001)
+
+    async def main():
+        await asyncio.gather(*(task() for _ in range(20)))
+
+    asyncio.run(main())
+    assert max(peak) == 3 and limiter.in_flight == 0
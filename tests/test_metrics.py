@@ -0,0 +1,41 @@
+import json
+
+import anky_studio
+from helpers import build, write_csv
+
+
+def read_metrics(output_pkg):
+    with open(anky_studio.metrics_path_for(str(output_pkg)), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_successful_build_reports_ok_and_package(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("hello", "Hello there."), ("world", "Hello world.")])
+    assert build(csv_path, tmp_path / "vocab.apkg", openmetrics=True)
+    report = read_metrics(tmp_path / "vocab.apkg")
+    assert report['status'] == 'ok'
+    assert report['package']['media_files'] == 2
+    assert report['stats']['success'] == 2
+    assert {'csv_parse', 'preflight', 'disk_check', 'synthesis', 'packaging'} <= set(report['phases_s'])
+    prom = open(anky_studio.metrics_path_for(str(tmp_path / "vocab.apkg"), "prom"), encoding='utf-8').read()
+    assert 'anki_studio_build_info{deck="vocab.apkg",status="ok"} 1' in prom
+
+
+def test_failed_build_still_writes_metrics(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("hello", "Hello there."), ("empty", "")])
+    assert not build(csv_path, tmp_path / "vocab.apkg", preflight='strict')
+    report = read_metrics(tmp_path / "vocab.apkg")
+    assert report['status'] == 'failed'
+    assert report['package'] is None
+    assert report['preflight']['issues']['empty']['count'] == 1
+    assert 'preflight' in report['phases_s']
+
+
+def test_service_outage_is_reported_as_failed(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [(f"w{i}", f"Sentence {i}.") for i in range(5)])
+    policy = anky_studio.RetryPolicy(max_attempts=1, breaker_threshold=2, final_pass_delay=0)
+    engine = anky_studio.FakeTTSEngine(latency=0.001, error_rate=1.0)
+    assert not build(csv_path, tmp_path / "vocab.apkg", engine=engine, retry_policy=policy, durable_jobs=False)
+    report = read_metrics(tmp_path / "vocab.apkg")
+    assert report['status'] == 'failed'
+    assert report['tts']['errors_by_type']
@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+import pytest
+
+import anky_studio
+
+
+class FlakyEngine(anky_studio.FakeTTSEngine):
+    """Falha na primeira tentativa de cada trecho com o erro dado"""
+
+    def __init__(self, error, **options):
+        super().__init__(latency=0.001, **options)
+        self.error = error
+        self.failed = set()
+
+    async def stream(self, text, voice, rate):
+        if self.error is not None and text not in self.failed:
+            self.failed.add(text)
+            self.calls += 1
+            raise self.error
+        async for chunk in super().stream(text, voice, rate):
+            yield chunk
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, 'sleep', lambda delay, *args: sleep(0, *args))
+
+
+@pytest.mark.parametrize('error', [asyncio.TimeoutError(), ConnectionResetError("reset"), RuntimeError("5xx")])
+def test_transient_chunk_errors_are_retried(tmp_path, no_backoff, error):
+    engine = FlakyEngine(error)
+    statuses = []
+    backend = anky_studio.NarratorBackend(statuses.append, engine=engine)
+    output = str(tmp_path / "story.mp3")
+    assert asyncio.run(backend.generate_long_audio("Once upon a time.", output, "en-US-ChristopherNeural", "+0%"))
+    assert engine.calls == 2
+    assert os.path.getsize(output) > 0
+
+
+def test_local_file_errors_are_not_retried(tmp_path, no_backoff):
+    engine = FlakyEngine(PermissionError("read-only"))
+    statuses = []
+    backend = anky_studio.NarratorBackend(statuses.append, engine=engine)
+    output = str(tmp_path / "story.mp3")
+    assert not asyncio.run(backend.generate_long_audio("Once upon a time.", output, "en-US-ChristopherNeural", "+0%"))
+    assert engine.calls == 1
+
+
+def test_interrupted_narration_resumes_only_missing_chunks(tmp_path):
+    text = " ".join(f"Sentence number {i} of the story." for i in range(40))
+    output = str(tmp_path / "story.mp3")
+    backend = anky_studio.NarratorBackend(lambda msg: None, engine=anky_studio.FakeTTSEngine(latency=0.001),
+                                          chunk_chars=200)
+    chunks = anky_studio.split_text_into_chunks(text, 200)
+    assert len(chunks) > 3
+
+    # Primeira execução: o último trecho falha de vez
+    failing = anky_studio.FakeTTSEngine(latency=0.001)
+    original = failing.stream
+
+    async def stream(chunk, voice, rate):
+        if chunk == chunks[-1]:
+            raise ValueError("texto recusado")
+        async for data in original(chunk, voice, rate):
+            yield data
+
+    failing.stream = stream
+    backend.engine = failing
+    assert not asyncio.run(backend.generate_long_audio(text, output, "en-US-ChristopherNeural", "+0%"))
+    assert not os.path.exists(output)
+
+    # Segunda execução: só o trecho que faltava é sintetizado
+    engine = anky_studio.FakeTTSEngine(latency=0.001)
+    backend.engine = engine
+    assert asyncio.run(backend.generate_long_audio(text, output, "en-US-ChristopherNeural", "+0%"))
+    assert engine.calls == 1
+    assert not os.path.exists(f"{output}.parts")
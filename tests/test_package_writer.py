@@ -0,0 +1,107 @@
+import asyncio
+
+import genanki
+import pytest
+
+import anky_studio
+from helpers import build, make_backend, read_package, write_csv
+
+MODEL = genanki.Model(1607392319, "Teste", fields=[{'name': 'Word'}],
+                      templates=[{'name': 'Card', 'qfmt': '{{Word}}', 'afmt': '{{Word}}'}])
+
+
+def test_reserved_ids_keep_a_late_note_in_its_place(tmp_path):
+    output_pkg = str(tmp_path / "deck.apkg")
+    deck = genanki.Deck(2059400110, "Deck")
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+
+    async def write():
+        with anky_studio.StreamingPackageWriter(output_pkg, str(work_dir)) as package:
+            package.add_note(genanki.Note(MODEL, ["first"]), deck.deck_id)
+            package.reserve("late", 2)
+            package.add_note(genanki.Note(MODEL, ["third"]), deck.deck_id)
+            package.add_note(genanki.Note(MODEL, ["second"]), deck.deck_id, reserved="late")
+            await package.finish(deck)
+
+    asyncio.run(write())
+    _, notes, _ = read_package(output_pkg)
+    assert [fields[0] for _, fields in notes] == ["first", "second", "third"]
+
+
+class RecordingEngine(anky_studio.FakeTTSEngine):
+    def __init__(self):
+        super().__init__(latency=0.001)
+        self.order = []
+
+    async def stream(self, text, voice, rate):
+        self.order.append(text)
+        async for chunk in super().stream(text, voice, rate):
+            yield chunk
+
+
+def test_longest_schedule_synthesizes_long_scripts_first_and_keeps_deck_order(tmp_path):
+    rows = [("a", "Hi."), ("b", "A much longer sentence here."), ("c", ""), ("d", "Medium one.")]
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    engine = RecordingEngine()
+    backend = make_backend(engine=engine, concurrency=1, schedule='longest')
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=backend)
+    assert engine.order == ["A much longer sentence here.", "Medium one.", "Hi."]
+    _, notes, media = read_package(tmp_path / "vocab.apkg")
+    # Linha sem script é ignorada, como no escalonamento 'csv'
+    assert [fields[0] for _, fields in notes] == ["a", "b", "d"]
+    assert len(media) == 3
+
+
+def test_reserving_the_same_key_twice_fails_at_once(tmp_path):
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    with anky_studio.StreamingPackageWriter(str(tmp_path / "deck.apkg"), str(work_dir)) as package:
+        package.reserve("a", 2)
+        with pytest.raises(ValueError):
+            package.reserve("a", 2)
+        with pytest.raises(KeyError):
+            package.add_note(genanki.Note(MODEL, ["b"]), 1, reserved="b")
+
+
+def test_longest_schedule_with_keys_like_generated_ones(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("a", "Alpha."), ("a", "Again, longer."), ("a#2", "Literal.")])
+    assert build(csv_path, tmp_path / "vocab.apkg", schedule='longest')
+    _, notes, _ = read_package(tmp_path / "vocab.apkg")
+    assert [fields[0] for _, fields in notes] == ["a", "a", "a#2"]
+    assert len({guid for guid, _ in notes}) == 3
+
+
+class StalledEngine(anky_studio.FakeTTSEngine):
+    """O primeiro script só termina depois de todos os outros"""
+
+    def __init__(self, stalled, total):
+        super().__init__(latency=0.001)
+        self.stalled = stalled
+        self.total = total
+
+    async def stream(self, text, voice, rate):
+        if text == self.stalled:
+            while self.calls < self.total:
+                await asyncio.sleep(0.001)
+        async for chunk in super().stream(text, voice, rate):
+            yield chunk
+
+
+def test_csv_schedule_writes_notes_behind_a_stalled_row(tmp_path, monkeypatch):
+    rows = [(f"w{i}", f"Sentence {i}.") for i in range(30)]
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    engine = StalledEngine("Sentence 0.", len(rows) - 1)
+    written = []
+    add_note = anky_studio.StreamingPackageWriter.add_note
+
+    def counted_add_note(self, note, deck_id, reserved=None):
+        written.append(engine.calls)
+        return add_note(self, note, deck_id, reserved)
+
+    monkeypatch.setattr(anky_studio.StreamingPackageWriter, 'add_note', counted_add_note)
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(engine=engine, concurrency=2))
+    # As notas de trás saíram antes do fim da linha parada, e o deck segue o CSV
+    assert sum(1 for calls in written if calls < len(rows)) >= 20
+    _, notes, _ = read_package(tmp_path / "vocab.apkg")
+    assert [fields[0] for _, fields in notes] == [word for word, _ in rows]
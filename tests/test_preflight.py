@@ -0,0 +1,75 @@
+import anky_studio
+from helpers import build, make_backend, write_csv
+
+
+def count_reads(monkeypatch):
+    """Registra cada leitura completa do arquivo: pelo csv.reader ou só para o hash"""
+    reads = []
+    records, fingerprint = anky_studio.CsvSchema._records, anky_studio.BuildJob.fingerprint
+
+    def counted_records(self, digest=None):
+        reads.append('records' if digest is None else 'records+hash')
+        return records(self, digest)
+
+    def counted_fingerprint(path):
+        reads.append('hash')
+        return fingerprint(path)
+
+    monkeypatch.setattr(anky_studio.CsvSchema, '_records', counted_records)
+    monkeypatch.setattr(anky_studio.BuildJob, 'fingerprint', staticmethod(counted_fingerprint))
+    # Com o pyarrow, rows() nem passa por _records
+    monkeypatch.setattr(anky_studio, 'CSV_READER', 'stdlib')
+    return reads
+
+
+def test_scan_collects_text_stats_and_fingerprint_in_one_pass(tmp_path, monkeypatch):
+    path = write_csv(tmp_path / "vocab.csv", [
+        ("a", "Hello there."), ("b", ""), ("c", "Hello there."), ("d", "<b>Bold</b>"), ("e", "?!"),
+    ])
+    schema = anky_studio.CsvSchema(path)
+    expected = anky_studio.BuildJob.fingerprint(path)
+    reads = count_reads(monkeypatch)
+    assert schema.scan("Word", "Script") == (5, {}, 0)
+    stats = schema.text_stats("Script")
+    assert schema.fingerprint == expected
+    assert reads == ['records+hash']
+    assert stats.rows == 5
+    assert sorted(stats.unique.values()) == [2, 11, 12]
+    assert sorted(stats.sample) == ["<b>Bold</b>", "?!", "Hello there."]
+    assert list(stats.lengths) == [12, 0, 12, 11, 2]
+    assert stats.issues['empty'] == [1, [2]]
+    assert stats.issues['markup'] == [1, [4]]
+    assert stats.issues['unspeakable'] == [1, [5]]
+
+
+def test_build_reads_the_csv_once_for_scan_and_once_for_rows(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "vocab.csv", [(f"w{i}", f"Sentence {i}.") for i in range(5)])
+    reads = count_reads(monkeypatch)
+    assert build(csv_path, tmp_path / "vocab.apkg", durable_jobs=True)
+    assert reads == ['records+hash', 'records']
+
+
+def test_preflight_flags_long_outliers(tmp_path):
+    rows = [(f"w{i}", "Short line.") for i in range(9)] + [("long", "word " * 200)]
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    backend = make_backend(preflight='only')
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=backend)
+    report = backend.metrics.preflight
+    assert report['rows'] == 10 and report['unique_scripts'] == 2
+    assert report['issues']['long'] == {'count': 1, 'lines': [10]}
+
+
+
+def test_unique_texts_beyond_the_sample_are_only_digests(tmp_path, monkeypatch):
+    monkeypatch.setattr(anky_studio, 'PREFLIGHT_SAMPLE_TEXTS', 10)
+    rows = [(f"w{i}", f"Sentence number {i:03d}.") for i in range(100)]
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    stats = anky_studio.CsvSchema(csv_path).text_stats("Script")
+    assert len(stats.unique) == 100 and len(stats.sample) == 10
+    assert all(len(digest) == 16 for digest in stats.unique)
+
+    backend = make_backend(preflight='only')
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=backend)
+    report = backend.metrics.preflight
+    assert report['unique_scripts'] == 100 and report['chars'] == 2000
+    assert report['to_synthesize']['scripts'] == 100 and report['to_synthesize']['chars'] == 2000
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import random
+
+import anky_studio
+from helpers import build, make_backend, read_package, write_csv
+
+
+def test_backoff_is_jittered_and_bounded():
+    policy = anky_studio.RetryPolicy(base_delay=0.5, max_delay=4.0)
+    random.seed(1)
+    delays = [policy.backoff(previous) for previous in (0.0, 0.5, 2.0, 10.0) for _ in range(50)]
+    assert all(0.5 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 100
+
+
+def test_budget_limits_retries_and_refills_with_requests():
+    policy = anky_studio.RetryPolicy(budget_ratio=0.5, min_budget=2, max_budget=3)
+    assert policy.try_retry() and policy.try_retry()
+    assert not policy.try_retry()
+    for _ in range(10):
+        policy.on_request()
+    assert policy.tokens == 3
+
+
+def test_breaker_trips_once_after_consecutive_failures():
+    policy = anky_studio.RetryPolicy(breaker_threshold=3)
+    assert [policy.record_failure() for _ in range(4)] == [False, False, True, False]
+    assert policy.tripped
+    policy.reset()
+    assert not policy.tripped and policy.consecutive_failures == 0
+    policy.record_failure()
+    policy.record_success()
+    assert policy.consecutive_failures == 0
+
+
+def test_error_classification():
+    transient = [asyncio.TimeoutError(), ConnectionResetError(), anky_studio.FakeTTSError("503"), OSError("net")]
+    permanent = [anky_studio.PermanentTTSError("voz"), ValueError("texto"), PermissionError("ro"),
+                 FileNotFoundError("x")]
+    assert all(anky_studio.RetryPolicy.is_transient(e) for e in transient)
+    assert not any(anky_studio.RetryPolicy.is_transient(e) for e in permanent)
+
+
+def test_batch_decks_get_their_own_budget_and_breaker():
+    parent = make_backend(retry_policy=anky_studio.RetryPolicy(max_attempts=2, breaker_threshold=5))
+    first = parent._child_backend(lambda msg: None, lambda curr, total: None)
+    second = parent._child_backend(lambda msg: None, lambda curr, total: None)
+    assert first.retry_policy is not second.retry_policy
+    assert first.retry_policy.max_attempts == 2
+    for _ in range(5):
+        first.retry_policy.record_failure()
+    first.retry_policy.tokens = 0
+    assert first.retry_policy.tripped and not second.retry_policy.tripped
+    assert second.retry_policy.try_retry()
+    # A passada final de um deck não mexe nos outros
+    second.retry_policy.reset()
+    assert first.retry_policy.tripped
+
+
+def test_final_pass_recovers_rows_in_order_without_recounting_dedup(tmp_path):
+    rows = [(f"w{i}", f"Sentence {i % 10}.") for i in range(20)]
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    policy = anky_studio.RetryPolicy(max_attempts=1, final_pass_delay=0.4)
+    engine = anky_studio.FakeTTSEngine(latency=0.001, outage=(0, 0.3))
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", engine=engine, retry_policy=policy, logs=logs)
+
+    with open(tmp_path / "vocab.metrics.json", encoding='utf-8') as f:
+        stats = json.load(f)['stats']
+    assert stats['deferred'] > 0 and stats['recovered'] == stats['deferred']
+    assert stats['success'] == 20 and stats['failed'] == 0
+    assert stats['deduplicated'] == 10
+    assert any("10 áudios únicos para 20" in msg for msg in logs)
+
+    _, notes, media = read_package(tmp_path / "vocab.apkg")
+    assert [fields[0] for _, fields in notes] == [word for word, _ in rows]
+    assert len(media) == 10
@@ -0,0 +1,19 @@
+from helpers import VOICE, build, make_backend, read_package, write_csv
+
+
+def test_dedup_log_counts_renders_and_rows_separately(tmp_path):
+    rows = [(f"w{i}", f"Sentence {i % 2}.") for i in range(4)]
+    csv_path = write_csv(tmp_path / "vocab.csv", rows)
+    logs = []
+    variants = [(VOICE, "-25%"), (VOICE, "+25%")]
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(logs=logs), variants=variants)
+    assert "--- Deduplicação: 6 áudios únicos para 12 renderizações (4 linhas) (50.0% sem nova síntese) ---" in logs
+    _, notes, media = read_package(tmp_path / "vocab.apkg")
+    assert len(notes) == 4 and len(media) == 6
+
+
+def test_dedup_log_without_variants_counts_rows(tmp_path):
+    csv_path = write_csv(tmp_path / "vocab.csv", [("a", "Same."), ("b", "Same.")])
+    logs = []
+    assert build(csv_path, tmp_path / "vocab.apkg", backend=make_backend(logs=logs))
+    assert "--- Deduplicação: 1 áudios únicos para 2 linhas (50.0% sem nova síntese) ---" in logs